@@ -1,7 +1,10 @@
+import os
 import sqlite3
 import random
 import string
+import hashlib
 import datetime
+import multiprocessing
 
 MEDICINE_LIST = [
     "Aspirin", "Ibuprofen", "Paracetamol", "Diclofenac", "Naproxen", "Metamizol",
@@ -262,67 +265,174 @@ def rand_treatment():
     return f"Treat_{letters}"
 
 
-def create_schema(conn):
+# Tabellen in Erzeugungsreihenfolge: (Spalte, Typ) — die UNIQUE-Bedingung läuft über alle Spalten
+TABLES = {
+    "Patient":     [("Name", "TEXT"), ("Age", "INTEGER"), ("Gender", "TEXT")],
+    "Illness":     [("PatientName", "TEXT NOT NULL"), ("Diagnosis", "TEXT NOT NULL")],
+    "Medicine":    [("PatientName", "TEXT NOT NULL"), ("MedName", "TEXT NOT NULL")],
+    "Allergy":     [("PatientName", "TEXT NOT NULL"), ("AllergyName", "TEXT NOT NULL")],
+    "Insurance":   [("PatientName", "TEXT NOT NULL"), ("InsuranceName", "TEXT NOT NULL")],
+    "LabResult":   [("PatientName", "TEXT NOT NULL"), ("TestName", "TEXT NOT NULL")],
+    "Appointment": [("PatientName", "TEXT NOT NULL"), ("AppointmentDate", "TEXT NOT NULL")],
+    "Hospital":    [("PatientName", "TEXT NOT NULL"), ("HospitalName", "TEXT NOT NULL")],
+    "Treatment":   [("PatientName", "TEXT NOT NULL"), ("TreatmentName", "TEXT NOT NULL")],
+}
+
+
+def create_schema(conn, unique=True):
+    """
+    Legt alle Tabellen an. unique=False lässt die UNIQUE-Bedingungen weg;
+    sie werden dann nach dem Bulk-Load mit create_unique_indexes() nachgezogen.
+    """
     cur = conn.cursor()
-    cur.executescript("""
-    CREATE TABLE IF NOT EXISTS Patient (
-        Name    TEXT,
-        Age     INTEGER,
-        Gender  TEXT,
-        UNIQUE(Name, Age, Gender)
-    );
-
-    CREATE TABLE IF NOT EXISTS Illness (
-        PatientName TEXT NOT NULL,
-        Diagnosis   TEXT NOT NULL,
-        UNIQUE(PatientName, Diagnosis)
-    );
-
-    CREATE TABLE IF NOT EXISTS Medicine (
-        PatientName TEXT NOT NULL,
-        MedName     TEXT NOT NULL,
-        UNIQUE(PatientName, MedName)
-    );
-
-    CREATE TABLE IF NOT EXISTS Allergy (
-        PatientName TEXT NOT NULL,
-        AllergyName TEXT NOT NULL,
-        UNIQUE(PatientName, AllergyName)
-    );
-
-    CREATE TABLE IF NOT EXISTS Insurance (
-        PatientName   TEXT NOT NULL,
-        InsuranceName TEXT NOT NULL,
-        UNIQUE(PatientName, InsuranceName)
-    );
-
-    CREATE TABLE IF NOT EXISTS LabResult (
-        PatientName TEXT NOT NULL,
-        TestName    TEXT NOT NULL,
-        UNIQUE(PatientName, TestName)
-    );
-
-    CREATE TABLE IF NOT EXISTS Appointment (
-        PatientName     TEXT NOT NULL,
-        AppointmentDate TEXT NOT NULL,
-        UNIQUE(PatientName, AppointmentDate)
-    );
-
-    CREATE TABLE IF NOT EXISTS Hospital (
-        PatientName TEXT NOT NULL,
-        HospitalName TEXT NOT NULL,
-        UNIQUE(PatientName, HospitalName)
-    );
-    CREATE TABLE IF NOT EXISTS Treatment (
-        PatientName   TEXT NOT NULL,
-        TreatmentName TEXT NOT NULL,
-        UNIQUE(PatientName, TreatmentName)
-    );
-
-                      
-    """)
+    for table, cols in TABLES.items():
+        col_defs = ",\n        ".join(f"{name} {typ}" for name, typ in cols)
+        if unique:
+            col_defs += f",\n        UNIQUE({', '.join(name for name, _ in cols)})"
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {table} (\n        {col_defs}\n    )")
     conn.commit()
 
+
+def create_unique_indexes(conn):
+    """
+    Zieht die UNIQUE-Bedingungen als Index nach dem Laden nach.
+    Doppelte Zeilen (z.B. bei zufällig gleichen Patientennamen) werden vorher entfernt,
+    die jeweils erste bleibt stehen — wie bei INSERT OR IGNORE.
+    """
+    cur = conn.cursor()
+    for table, cols in TABLES.items():
+        col_list = ", ".join(name for name, _ in cols)
+        sql = f"CREATE UNIQUE INDEX IF NOT EXISTS uq_{table} ON {table}({col_list})"
+        try:
+            cur.execute(sql)
+        except sqlite3.IntegrityError:
+            cur.execute(f"DELETE FROM {table} WHERE rowid NOT IN "
+                        f"(SELECT MIN(rowid) FROM {table} GROUP BY {col_list})")
+            cur.execute(sql)
+    conn.commit()
+
+# ---------- kompaktes Schema ----------
+# Interne Tabellen (Präfix cx_): Patientennamen als Integer-IDs (cx_names), TEXT-Konstanten
+# pro Relation in einem Wörterbuch (cx_dict_<Tabelle>), Daten als WITHOUT-ROWID-Integer-Tupel
+# (cx_<Tabelle>). Nach außen liegen Views mit den Namen und Spalten aus TABLES; INSTEAD-OF-
+# Trigger übersetzen INSERT und DELETE. a3–a8 und check_same_tbl arbeiten unverändert darauf.
+COMPACT_PREFIX = "cx_"
+
+
+def _compact_columns(cols):
+    """Teilt die Spalten in Patientenschlüssel, wörterbuchcodierte TEXT-Spalten und Rohspalten."""
+    (key, _), rest = cols[0], cols[1:]
+    encoded = [name for name, typ in rest if typ.split()[0] == "TEXT"]
+    raw = [(name, typ) for name, typ in rest if typ.split()[0] != "TEXT"]
+    return key, encoded, raw
+
+
+def _compact_table_sql(table, cols):
+    """CREATE-Anweisungen für Wörterbuch, Datentabelle, Indexe, View und Trigger einer Tabelle."""
+    key, encoded, raw = _compact_columns(cols)
+    data, dict_tbl = f"{COMPACT_PREFIX}{table}", f"{COMPACT_PREFIX}dict_{table}"
+
+    # interne Spalten: pid, <Spalte>_id für codierte, <Spalte> für Rohspalten
+    inner = {key: "pid"}
+    inner.update({name: f"{name}_id" for name in encoded})
+    inner.update({name: name for name, _ in raw})
+    inner_cols = [inner[name] for name, _ in cols]
+
+    col_defs = ["pid INTEGER NOT NULL"] + [f"{name}_id INTEGER NOT NULL" for name in encoded] \
+        + [f"{name} {typ.split()[0]}" for name, typ in raw]
+    stmts = []
+    if encoded:
+        stmts.append(f"CREATE TABLE IF NOT EXISTS {dict_tbl} (id INTEGER PRIMARY KEY, value TEXT NOT NULL UNIQUE)")
+    stmts.append(f"CREATE TABLE IF NOT EXISTS {data} ({', '.join(col_defs)}, "
+                 f"PRIMARY KEY ({', '.join(inner_cols)})) WITHOUT ROWID")
+    for name in encoded:
+        stmts.append(f"CREATE INDEX IF NOT EXISTS {data}_{name} ON {data}({name}_id)")
+
+    # View: Integer-IDs zurück auf Name und Konstanten
+    select = []
+    joins = [f"JOIN {COMPACT_PREFIX}names n ON n.id = x.pid"]
+    for i, (name, _) in enumerate(cols):
+        if name == key:
+            select.append(f"n.name AS {name}")
+        elif name in encoded:
+            select.append(f"d{i}.value AS {name}")
+            joins.append(f"JOIN {dict_tbl} d{i} ON d{i}.id = x.{name}_id")
+        else:
+            select.append(f"x.{name} AS {name}")
+    stmts.append(f"CREATE VIEW IF NOT EXISTS {table} AS SELECT {', '.join(select)} "
+                 f"FROM {data} x {' '.join(joins)}")
+
+    def lookup(row, name):
+        if name == key:
+            return f"(SELECT id FROM {COMPACT_PREFIX}names WHERE name = {row}.{name})"
+        if name in encoded:
+            return f"(SELECT id FROM {dict_tbl} WHERE value = {row}.{name})"
+        return f"{row}.{name}"
+
+    ins = [f"INSERT OR IGNORE INTO {COMPACT_PREFIX}names(name) VALUES (NEW.{key});"]
+    ins += [f"INSERT OR IGNORE INTO {dict_tbl}(value) VALUES (NEW.{name});" for name in encoded]
+    ins.append(f"INSERT OR IGNORE INTO {data}({', '.join(inner_cols)}) "
+               f"VALUES ({', '.join(lookup('NEW', name) for name, _ in cols)});")
+    stmts.append(f"CREATE TRIGGER IF NOT EXISTS {data}_insert INSTEAD OF INSERT ON {table} "
+                 f"BEGIN {' '.join(ins)} END")
+
+    where = " AND ".join(f"{inner[name]} IS {lookup('OLD', name)}" for name, _ in cols)
+    stmts.append(f"CREATE TRIGGER IF NOT EXISTS {data}_delete INSTEAD OF DELETE ON {table} "
+                 f"BEGIN DELETE FROM {data} WHERE {where}; END")
+    return stmts
+
+
+def create_compact_schema(conn):
+    """
+    Legt das kompakte Schema an: interne cx_-Tabellen plus Views/Trigger mit den Namen aus TABLES.
+    Doppelte Zeilen werden wie bei INSERT OR IGNORE stillschweigend verworfen.
+    """
+    cur = conn.cursor()
+    cur.execute(f"CREATE TABLE IF NOT EXISTS {COMPACT_PREFIX}names "
+                f"(id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE)")
+    for table, cols in TABLES.items():
+        for sql in _compact_table_sql(table, cols):
+            cur.execute(sql)
+    conn.commit()
+
+
+def convert_to_compact(src_db, dst_db):
+    """
+    Überträgt eine DB aus create_schema() mengenbasiert (ATTACH, INSERT ... SELECT) in das
+    kompakte Schema. IDs werden in rowid-Reihenfolge der Quelle vergeben.
+    """
+    conn = sqlite3.connect(dst_db)
+    try:
+        create_compact_schema(conn)
+        cur = conn.cursor()
+        journal_mode = cur.execute("PRAGMA journal_mode").fetchone()[0]
+        cur.execute("PRAGMA journal_mode=OFF")
+        cur.execute("PRAGMA synchronous=OFF")
+        cur.execute("ATTACH DATABASE ? AS src", (src_db,))
+        for table, cols in TABLES.items():
+            key, encoded, raw = _compact_columns(cols)
+            data, dict_tbl = f"{COMPACT_PREFIX}{table}", f"{COMPACT_PREFIX}dict_{table}"
+            cur.execute(f"INSERT OR IGNORE INTO {COMPACT_PREFIX}names(name) "
+                        f"SELECT {key} FROM src.{table} ORDER BY rowid")
+            for name in encoded:
+                cur.execute(f"INSERT OR IGNORE INTO {dict_tbl}(value) "
+                            f"SELECT {name} FROM src.{table} ORDER BY rowid")
+            inner_cols, select, joins = ["pid"], ["n.id"], [f"JOIN {COMPACT_PREFIX}names n ON n.name = s.{key}"]
+            for i, name in enumerate(encoded):
+                inner_cols.append(f"{name}_id")
+                select.append(f"d{i}.id")
+                joins.append(f"JOIN {dict_tbl} d{i} ON d{i}.value = s.{name}")
+            inner_cols += [name for name, _ in raw]
+            select += [f"s.{name}" for name, _ in raw]
+            cur.execute(f"INSERT OR IGNORE INTO {data}({', '.join(inner_cols)}) "
+                        f"SELECT {', '.join(select)} FROM src.{table} s {' '.join(joins)}")
+            conn.commit()
+        cur.execute("DETACH DATABASE src")
+        cur.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        conn.close()
+
+
 def populate(conn,
              num_patients=1000,
              min_illness=0, max_illness=3,
@@ -379,6 +489,212 @@ def populate(conn,
 
 
 
+def _draw_patients(num_patients):
+    """Zieht Patienten in derselben Reihenfolge wie populate()."""
+    return [(rand_string(8), random.randint(1, 90), rand_gender()) for _ in range(num_patients)]
+
+
+def _draw_rows(names, draw_values):
+    """
+    Ein Generator pro Tabelle: zieht für jeden Patienten die Werte (gleiche Zufallsfolge
+    wie populate()) und lässt Duplikate desselben Patienten weg.
+    """
+    for name in names:
+        values = draw_values()
+        if len(values) > 1:
+            values = dict.fromkeys(values)
+        for v in values:
+            yield (name, v)
+
+
+def _related_draws(min_illness=0, max_illness=3,
+                   min_meds=0, max_meds=3,
+                   min_allergy=0, max_allergy=2,
+                   min_insurance=0, max_insurance=1,
+                   min_lab=0, max_lab=3,
+                   min_appt=0, max_appt=2,
+                   min_hosp=0, max_hosp=2,
+                   min_treat=0, max_treat=2):
+    """(Tabelle, Ziehfunktion pro Patient) in der Reihenfolge von populate()."""
+    return [
+        ("Illness",     lambda: [rand_diagnosis() for _ in range(random.randint(min_illness, max_illness))]),
+        ("Medicine",    lambda: random.sample(MEDICINE_LIST, random.randint(min_meds, max_meds))),
+        ("Allergy",     lambda: [rand_allergy() for _ in range(random.randint(min_allergy, max_allergy))]),
+        ("Insurance",   lambda: [rand_insurance()]),
+        ("LabResult",   lambda: [rand_labresult() for _ in range(random.randint(min_lab, max_lab))]),
+        ("Appointment", lambda: [rand_appointment() for _ in range(random.randint(min_appt, max_appt))]),
+        ("Hospital",    lambda: [rand_hospital() for _ in range(random.randint(min_hosp, max_hosp))]),
+        ("Treatment",   lambda: [rand_treatment() for _ in range(random.randint(min_treat, max_treat))]),
+    ]
+
+
+def populate_bulk(conn,
+                  num_patients=1000,
+                  seed=None,
+                  min_illness=0, max_illness=3,
+                  min_meds=0, max_meds=3,
+                  min_allergy=0, max_allergy=2,
+                  min_insurance=0, max_insurance=1,
+                  min_lab=0, max_lab=3,
+                  min_appt=0, max_appt=2,
+                  min_hosp=0, max_hosp=2,
+                  min_treat=0, max_treat=2,
+                  unique_indexes=True):
+    """
+    Schnelle Variante von populate(): jede Tabelle wird als Generator per executemany
+    in einer einzigen Transaktion geladen (Bulk-Load-PRAGMAs), die UNIQUE-Indexe entstehen
+    erst danach. Die Zufallswerte werden in exakt derselben Reihenfolge gezogen wie in
+    populate(), mit gleichem seed entsteht also derselbe Datenbestand.
+    Erwartet Tabellen aus create_schema(conn, unique=False); unique_indexes=False überlässt
+    das Anlegen der Indexe dem Aufrufer (z.B. nach dem Zusammenführen von Shards).
+    """
+    if seed is not None:
+        random.seed(seed)
+
+    cur = conn.cursor()
+    journal_mode = cur.execute("PRAGMA journal_mode").fetchone()[0]
+    cur.execute("PRAGMA journal_mode=OFF")
+    cur.execute("PRAGMA synchronous=OFF")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.execute("PRAGMA cache_size=-200000")
+
+    patients = _draw_patients(num_patients)
+    cur.executemany("INSERT INTO Patient VALUES(?,?,?)", patients)
+    names = [p[0] for p in patients]
+    del patients
+
+    draws = _related_draws(min_illness, max_illness, min_meds, max_meds, min_allergy, max_allergy,
+                           min_insurance, max_insurance, min_lab, max_lab, min_appt, max_appt,
+                           min_hosp, max_hosp, min_treat, max_treat)
+    for table, draw_values in draws:
+        cur.executemany(f"INSERT INTO {table} VALUES(?,?)", _draw_rows(names, draw_values))
+
+    conn.commit()
+    if unique_indexes:
+        create_unique_indexes(conn)
+    cur.execute(f"PRAGMA journal_mode={journal_mode}")
+
+
+def append_seed(seed, existing_patients):
+    """Seed für eine Erweiterung, abgeleitet aus globalem Seed und bisheriger Patientenzahl."""
+    digest = hashlib.sha256(f"{seed}:append:{existing_patients}".encode("ascii")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _draw_new_patients(cur, num_patients):
+    """
+    Zieht num_patients Patienten, deren Namen weder in der DB noch in der Ziehung vorkommen.
+    Der Abgleich läuft per Index über Patient.Name (uq_Patient bzw. cx_names).
+    """
+    seen = set()
+    patients = []
+    while len(patients) < num_patients:
+        name = rand_string(8)
+        if name in seen or cur.execute("SELECT 1 FROM Patient WHERE Name = ? LIMIT 1", (name,)).fetchone():
+            continue
+        seen.add(name)
+        patients.append((name, random.randint(1, 90), rand_gender()))
+    return patients
+
+
+def append_patients(conn, num_patients, seed=None, **ranges):
+    """
+    Fügt einer bestehenden DB (Text- oder kompaktes Schema) num_patients neue Patienten
+    samt zugehöriger Zeilen hinzu, in einer Transaktion. Neue Namen kollidieren nie mit
+    vorhandenen. Mit seed wird der Zufallsgenerator auf append_seed(seed, vorhandene Patienten)
+    gesetzt: gleiche Ausgangs-DB und gleicher seed ergeben dieselbe Erweiterung.
+    ranges: min_/max_-Parameter wie bei populate_bulk().
+    Rückgabe: Anzahl neuer Patienten.
+    """
+    cur = conn.cursor()
+    existing = cur.execute("SELECT COUNT(*) FROM Patient").fetchone()[0]
+    if seed is not None:
+        random.seed(append_seed(seed, existing))
+
+    cur.execute("PRAGMA synchronous=OFF")
+    cur.execute("PRAGMA temp_store=MEMORY")
+
+    patients = _draw_new_patients(cur, num_patients)
+    cur.executemany("INSERT OR IGNORE INTO Patient VALUES(?,?,?)", patients)
+    names = [p[0] for p in patients]
+    del patients
+
+    for table, draw_values in _related_draws(**ranges):
+        cur.executemany(f"INSERT OR IGNORE INTO {table} VALUES(?,?)", _draw_rows(names, draw_values))
+    conn.commit()
+    return len(names)
+
+
+def shard_seed(seed, shard_index):
+    """Deterministischer Seed pro Shard, abgeleitet aus globalem Seed und Shard-Index."""
+    digest = hashlib.sha256(f"{seed}:{shard_index}".encode("ascii")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def shard_sizes(num_patients, shards):
+    """Teilt die Patienten in zusammenhängende, möglichst gleich große Bereiche auf."""
+    base, rest = divmod(num_patients, shards)
+    return [base + (1 if k < rest else 0) for k in range(shards)]
+
+
+def _generate_shard(task):
+    path, num_patients, seed, unique_indexes, ranges = task
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        create_schema(conn, unique=False)
+        populate_bulk(conn, num_patients=num_patients, seed=seed, unique_indexes=unique_indexes, **ranges)
+    finally:
+        conn.close()
+    return path
+
+
+def generate_sharded(db_path, num_patients, shards=4, seed=0, processes=None, keep_shards=False, **ranges):
+    """
+    Erzeugt die FS-DB in 'shards' Patientenbereichen, jeder Shard in einem eigenen Prozess
+    mit seed = shard_seed(seed, k). Das Ergebnis hängt nur von seed und shards ab, nicht von
+    der Anzahl der Prozesse.
+    keep_shards=False: Shards der Reihe nach per ATTACH in db_path zusammenführen
+    (UNIQUE-Indexe erst am Ende) und löschen. keep_shards=True: Shards als eigene
+    DB-Dateien mit Indexen behalten.
+    Rückgabe: Pfade der erzeugten DB-Dateien.
+    """
+    tasks = [
+        (f"{db_path}.shard{k}", n, shard_seed(seed, k), keep_shards, ranges)
+        for k, n in enumerate(shard_sizes(num_patients, shards))
+    ]
+    processes = processes or min(shards, os.cpu_count() or 1)
+    if processes > 1:
+        with multiprocessing.Pool(processes) as pool:
+            shard_paths = pool.map(_generate_shard, tasks)
+    else:
+        shard_paths = [_generate_shard(t) for t in tasks]
+
+    if keep_shards:
+        return shard_paths
+
+    conn = sqlite3.connect(db_path)
+    try:
+        create_schema(conn, unique=False)
+        cur = conn.cursor()
+        journal_mode = cur.execute("PRAGMA journal_mode").fetchone()[0]
+        cur.execute("PRAGMA journal_mode=OFF")
+        cur.execute("PRAGMA synchronous=OFF")
+        for path in shard_paths:
+            cur.execute("ATTACH DATABASE ? AS shard", (path,))
+            for table in TABLES:
+                cur.execute(f"INSERT INTO main.{table} SELECT * FROM shard.{table} ORDER BY rowid")
+            conn.commit()
+            cur.execute("DETACH DATABASE shard")
+            os.remove(path)
+        create_unique_indexes(conn)
+        cur.execute(f"PRAGMA journal_mode={journal_mode}")
+    finally:
+        conn.close()
+    return [db_path]
+
+
 def main():
     fs_db = 'fs_records.db'
     fo_db = 'fo_records.db'
@@ -388,10 +704,11 @@ def main():
     conn_fo = sqlite3.connect(fo_db)
     conn_chase = sqlite3.connect(chase_db)
 
-    for c in [conn_fs, conn_fo, conn_chase]:
+    for c in [conn_fo, conn_chase]:
         create_schema(c)
+    create_schema(conn_fs, unique=False)
 
-    populate(conn_fs, num_patients=1000)
+    populate_bulk(conn_fs, num_patients=1000)
 
     for db_name, c in [('FS', conn_fs), ('FO', conn_fo), ('Chase', conn_chase)]:
         print(f"\n{db_name}_DB:")
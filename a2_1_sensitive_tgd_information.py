@@ -1,4 +1,5 @@
 import random
+import itertools
 from typing import List, Dict, List as TList, Tuple, Set
 
 SEED = 48
@@ -250,24 +251,63 @@ def parse_atom(atom: str) -> Tuple[str, str]:
     const = rest.split("'")[1]
     return rel, const
 
-def path_exists(graph: Dict[Tuple[str,str], Set[Tuple[str,str]]],
-                start: Tuple[str,str],
-                target: Tuple[str,str],
-                visited=None) -> bool:
-    if visited is None:
-        visited = set()
-    if start == target:
-        return True
-    if start in visited:
-        return False
-    visited.add(start)
-    for nxt in graph.get(start, []):
-        if path_exists(graph, nxt, target, visited):
+class ReachabilityIndex:
+    """
+    Inkrementell gepflegte Erreichbarkeit im Abhängigkeitsgraphen Body -> Head.
+    Knoten (rel, const) werden auf fortlaufende IDs abgebildet; pro Knoten werden
+    Nachfahren und Vorfahren als Bitmenge (int, eigenes Bit gesetzt) gehalten.
+    reaches() ist damit ein einzelner Bittest statt einer Tiefensuche.
+    """
+
+    def __init__(self):
+        self.ids: Dict[Tuple[str, str], int] = {}
+        self.desc: List[int] = []
+        self.anc: List[int] = []
+        self.edges = 0
+
+    def _intern(self, node: Tuple[str, str]) -> int:
+        i = self.ids.get(node)
+        if i is None:
+            i = len(self.desc)
+            self.ids[node] = i
+            self.desc.append(1 << i)
+            self.anc.append(1 << i)
+        return i
+
+    @staticmethod
+    def _bits(x: int):
+        while x:
+            low = x & -x
+            yield low.bit_length() - 1
+            x ^= low
+
+    def reaches(self, start: Tuple[str, str], target: Tuple[str, str]) -> bool:
+        """Gibt es einen Pfad start -> target? True auch bei start == target."""
+        if start == target:
             return True
-    return False
-
-def generate_rule(graph: Dict[Tuple[str,str], Set[Tuple[str,str]]]) -> Tuple[str, Tuple[str,str]]:
+        s, t = self.ids.get(start), self.ids.get(target)
+        if s is None or t is None:
+            return False
+        return (self.desc[s] >> t) & 1 == 1
+
+    def add_edge(self, src: Tuple[str, str], dst: Tuple[str, str]) -> None:
+        s, d = self._intern(src), self._intern(dst)
+        if (self.desc[s] >> d) & 1:
+            return
+        self.edges += 1
+        # alle Vorfahren von src erreichen jetzt alle Nachfahren von dst und umgekehrt
+        desc_d, anc_s = self.desc[d], self.anc[s]
+        for a in self._bits(anc_s):
+            self.desc[a] |= desc_d
+        for b in self._bits(desc_d):
+            self.anc[b] |= anc_s
+
+
+def generate_rule(index: ReachabilityIndex, stats: Dict[str, int] = None) -> Tuple[str, Tuple[str,str]]:
+    if stats is None:
+        stats = {}
     while True:
+        stats['candidates'] = stats.get('candidates', 0) + 1
         head_rel = random.choice(RELATIONS)
         head = random_atom([head_rel])
         head_rel, head_const = parse_atom(head)
@@ -282,37 +322,148 @@ def generate_rule(graph: Dict[Tuple[str,str], Set[Tuple[str,str]]]) -> Tuple[str
             if atom not in used and atom != head:
                 used.add(atom)
                 body_atoms.append(atom)
-
-        ok = True
-        for atom in body_atoms:
-            b_rel, b_const = parse_atom(atom)
-            src = (b_rel, b_const)
-            dst = (head_rel, head_const)
-            if src == dst or path_exists(graph, dst, src):
-                ok = False
-                break
-
-        if ok:
-            for atom in body_atoms:
-                b_rel, b_const = parse_atom(atom)
-                src = (b_rel, b_const)
-                dst = (head_rel, head_const)
-                graph.setdefault(src, set()).add(dst)
-            return " ∧ ".join(body_atoms) + " -> " + f"{head_rel}(n,'{head_const}')", (head_rel, head_const)
-
-def generate_tgds(num_rules: int = NUM_RULES, seed: int = SEED) -> Tuple[List[str], Set[Tuple[str,str]]]:
+            else:
+                stats['atom_redraws'] = stats.get('atom_redraws', 0) + 1
+
+        dst = (head_rel, head_const)
+        srcs = [parse_atom(atom) for atom in body_atoms]
+        # Zyklus, falls der Head schon ein Body-Atom erreicht (oder gleich ist)
+        if any(index.reaches(dst, src) for src in srcs):
+            stats['cycle_rejections'] = stats.get('cycle_rejections', 0) + 1
+            continue
+
+        for src in srcs:
+            index.add_edge(src, dst)
+        return " ∧ ".join(body_atoms) + " -> " + f"{head_rel}(n,'{head_const}')", (head_rel, head_const)
+
+def generate_tgds(num_rules: int = NUM_RULES, seed: int = SEED,
+                  stats: Dict[str, int] = None) -> Tuple[List[str], Set[Tuple[str,str]]]:
+    """
+    Erzeugt num_rules azyklische TGDs. Ist stats ein dict, werden dort Kandidaten,
+    Zyklus-Ablehnungen, neu gezogene Body-Atome sowie Knoten und Kanten des Graphen eingetragen.
+    """
     random.seed(seed)
+    if stats is None:
+        stats = {}
+    stats.update({'rules': 0, 'candidates': 0, 'cycle_rejections': 0, 'atom_redraws': 0})
     tgds: List[str] = []
-    graph: Dict[Tuple[str,str], Set[Tuple[str,str]]] = {}
+    index = ReachabilityIndex()
     heads: Set[Tuple[str,str]] = set()
     for _ in range(num_rules):
-        rule, head = generate_rule(graph)
+        rule, head = generate_rule(index, stats)
         tgds.append(rule)
         heads.add(head)
+    stats['rules'] = len(tgds)
+    stats['nodes'] = len(index.ids)
+    stats['edges'] = index.edges
     return tgds, heads
 
+def _constant_universe() -> Tuple[List[Tuple[str, str]], List[Tuple[str, str]]]:
+    """Alle (rel, const)-Atome: Treatment (Treat_AAA..Treat_ZZZ) und die übrigen Relationen."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    treatments = [("Treatment", "Treat_" + "".join(p)) for p in itertools.product(letters, repeat=3)]
+    others = list(dict.fromkeys(
+        (rel, c) for rel, pool in REL_TO_POOL.items() if rel != "Treatment" for c in pool
+    ))
+    return treatments, others
+
+def generate_structured_tgds(filepath: str, num_rules: int, seed: int = SEED,
+                             depth: int = 3, fan_in: int = 1,
+                             body_reuse: float = 0.5, treatment_share: float = 0.5,
+                             body_min: int = BODY_MIN, body_max: int = BODY_MAX,
+                             stats: Dict[str, int] = None) -> Set[Tuple[str, str]]:
+    """
+    Erzeugt num_rules TGDs mit steuerbarer Struktur und schreibt sie zeilenweise nach filepath.
+      depth:           Anzahl Schichten; die Heads der Schicht L haben ein Body-Atom aus den Heads
+                       der Schicht L-1, Ableitungsketten sind also depth Regeln lang
+      fan_in:          Regeln pro Head
+      body_reuse:      Wahrscheinlichkeit, dass ein weiteres Body-Atom ein schon benutztes Atom
+                       aus tieferen Schichten ist (sonst ein neues Basis-Atom)
+      treatment_share: Anteil der Treatment-Konstanten an neu gezogenen Atomen
+    Ist der Vorrat an Konstanten erschöpft, werden Body-Atome wiederverwendet.
+    Body-Atome stammen nur aus tieferen Schichten, die Regeln sind daher ohne Zyklustest
+    azyklisch (statt der Relationen-Ebenen aus LEVELS). Jedes Atom wird höchstens einmal als neues
+    Atom vergeben; reicht der Vorrat (17 821 Konstanten) nicht für die Heads aller Schichten und
+    body_min Basis-Atome, gibt es einen ValueError: num_rules / fan_in + body_min <= 17 821, für
+    100 000 Regeln also fan_in >= 6.
+    Rückgabe: Menge der Heads (rel, const).
+    """
+    random.seed(seed)
+    treatments, others = _constant_universe()
+    random.shuffle(treatments)
+    random.shuffle(others)
+
+    def fresh():
+        use_treatment = random.random() < treatment_share
+        pool = treatments if (use_treatment and treatments) or not others else others
+        return pool.pop() if pool else None
+
+    if stats is None:
+        stats = {}
+    stats.update({'rules': 0, 'heads': 0, 'fresh_atoms': 0, 'reused_atoms': 0, 'short_bodies': 0})
+    heads: Set[Tuple[str, str]] = set()
+    below: List[Tuple[str, str]] = []       # Atome aus tieferen Schichten (Wiederverwendung)
+    prev_heads: List[Tuple[str, str]] = []
+    base, rest = divmod(num_rules, depth)
+    layer_sizes = [base + (1 if layer < rest else 0) for layer in range(depth)]
+
+    # Heads aller Schichten zuerst reservieren, Body-Atome bekommen den Rest des Vorrats.
+    # Mindestens body_min Basis-Atome müssen übrig bleiben: Schicht 0 hat keine Heads darunter
+    # und endete sonst mit leerem Body.
+    universe = len(treatments) + len(others)
+    n_heads = sum(-(-n // fan_in) for n in layer_sizes)
+    if n_heads + max(body_min, 1) > universe:
+        raise ValueError(
+            f"Zu wenige Konstanten für {num_rules} Regeln mit fan_in={fan_in}: jeder Head ist eine "
+            f"eigene Konstante, nötig ist num_rules / fan_in + body_min <= {universe} "
+            f"(fan_in >= {-(-num_rules // max(universe - max(body_min, 1), 1))})")
+    all_heads = [[fresh() for _ in range(-(-n // fan_in))] for n in layer_sizes]
+
+    with open(filepath, "w", encoding="utf-8", newline="\n") as f:
+        for n_rules, layer_heads in zip(layer_sizes, all_heads):
+            for j in range(n_rules):
+                head = layer_heads[j // fan_in]
+                k = random.randint(body_min, body_max)
+                body: Dict[Tuple[str, str], None] = {}
+                if prev_heads:
+                    body[random.choice(prev_heads)] = None
+                attempts = 0
+                while len(body) < k and attempts < 10 * k:
+                    attempts += 1
+                    atom = None
+                    if below and random.random() < body_reuse:
+                        atom = random.choice(below)
+                        stats['reused_atoms'] += 1
+                    else:
+                        atom = fresh()
+                        if atom is None:
+                            if not below:
+                                break
+                            atom = random.choice(below)
+                            stats['reused_atoms'] += 1
+                        else:
+                            below.append(atom)
+                            stats['fresh_atoms'] += 1
+                    body[atom] = None
+                if len(body) < k:
+                    stats['short_bodies'] += 1
+
+                f.write(" ∧ ".join(f"{r}(n,'{c}')" for r, c in body)
+                        + f" -> {head[0]}(n,'{head[1]}')\n")
+                heads.add(head)
+                stats['rules'] += 1
+
+            below.extend(layer_heads)
+            prev_heads = layer_heads
+
+    stats['heads'] = len(heads)
+    return heads
+
 def main():
-    tgds, heads = generate_tgds()
+    stats: Dict[str, int] = {}
+    tgds, heads = generate_tgds(stats=stats)
+    print(f"{stats['rules']} rules from {stats['candidates']} candidates "
+          f"({stats['cycle_rejections']} cycle rejections, {stats['atom_redraws']} atom redraws)")
 
     # schreibe rules.txt
     with open("rules.txt", "w", encoding="utf-8", newline="\n") as f:
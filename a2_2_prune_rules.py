@@ -0,0 +1,149 @@
+import re
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+# Statische Analyse von rules.txt gegen C.txt:
+#  - doppelte Regeln (gleicher Head, gleiche Body-Menge) entfernen
+#  - subsumierte Regeln entfernen (gleicher Head, Body echte Obermenge einer anderen Regel)
+#  - Regeln entfernen, deren Head nicht in der Rückwärtshülle der Wurzeln liegt
+# Was der Chase für die Wurzeln ableitet, bleibt gleich: doppelte und subsumierte Regeln leiten
+# nichts Neues ab, Regeln außerhalb der Rückwärtshülle erreichen keine Wurzel.
+# Graphen und Pfade bleiben nur beim Entfernen irrelevanter Regeln gleich (a5 expandiert nur die
+# Rückwärtshülle). a5 erzeugt pro passendem Body einen Graphen; ohne doppelte und subsumierte Regeln
+# fallen diese Graphen und ihre Pfade weg, und die Greedy-Union kann kleiner oder anders ausfallen.
+
+Atom = Tuple[str, str]
+
+atom_re = re.compile(r"^(?P<table>\w+)\(n,\s*'(?P<const>[^']+)'\)$")
+root_re = re.compile(r"^(?P<table>\w+)\['(?P<const>[^']+)'\]$")
+
+
+def parse_rule(line: str) -> Optional[Tuple[Atom, FrozenSet[Atom]]]:
+    """'B1 ∧ B2 -> H' → (Head, Body-Menge); None bei unbekanntem Format."""
+    if '->' not in line:
+        return None
+    body_s, head_s = [p.strip() for p in line.split('->', 1)]
+    m = atom_re.match(head_s)
+    if not m:
+        return None
+    body: Set[Atom] = set()
+    for part in re.split(r'∧|&|\bAND\b', body_s):
+        part = part.strip()
+        if not part:
+            continue
+        mb = atom_re.match(part)
+        if not mb:
+            return None
+        body.add((mb.group('table'), mb.group('const')))
+    if not body:
+        return None
+    return (m.group('table'), m.group('const')), frozenset(body)
+
+
+def load_roots(path: str) -> List[Atom]:
+    roots: List[Atom] = []
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for raw in f:
+            m = root_re.match(raw.strip())
+            if m:
+                roots.append((m.group('table'), m.group('const')))
+    return roots
+
+
+def backward_closure(rules: Iterable[Tuple[Atom, FrozenSet[Atom]]], roots: Iterable[Atom]) -> Set[Atom]:
+    """Alle Atome, aus denen über die Regeln eine Wurzel ableitbar sein kann (inkl. Wurzeln)."""
+    by_head: Dict[Atom, List[FrozenSet[Atom]]] = {}
+    for head, body in rules:
+        by_head.setdefault(head, []).append(body)
+    closure: Set[Atom] = set(roots)
+    todo = list(closure)
+    while todo:
+        atom = todo.pop()
+        for body in by_head.get(atom, ()):
+            for b in body:
+                if b not in closure:
+                    closure.add(b)
+                    todo.append(b)
+    return closure
+
+
+def prune_rules(lines: Iterable[str], roots: Iterable[Atom],
+                drop_subsumed: bool = True, drop_irrelevant: bool = True,
+                stats: Optional[Dict[str, int]] = None) -> List[str]:
+    """
+    Gibt die verbleibenden Regelzeilen in ursprünglicher Reihenfolge zurück.
+    Nicht erkannte Zeilen bleiben unverändert erhalten.
+    Ist stats ein dict, werden dort die Zählungen der Analyse eingetragen.
+    """
+    if stats is None:
+        stats = {}
+    parsed: List[Tuple[str, Optional[Tuple[Atom, FrozenSet[Atom]]]]] = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            parsed.append((line, parse_rule(line)))
+
+    rules = [r for _, r in parsed if r is not None]
+    relevant = backward_closure(rules, roots) if drop_irrelevant else None
+
+    # pro Head: Duplikate und (optional) Obermengen verwerfen, kleinste Bodies zuerst prüfen
+    by_head: Dict[Atom, List[FrozenSet[Atom]]] = {}
+    for head, body in rules:
+        by_head.setdefault(head, []).append(body)
+    kept: Dict[Atom, Set[FrozenSet[Atom]]] = {}
+    for head, bodies in by_head.items():
+        minimal: List[FrozenSet[Atom]] = []
+        for body in sorted(set(bodies), key=len):
+            if drop_subsumed and any(m < body for m in minimal):
+                continue
+            minimal.append(body)
+        kept[head] = set(minimal)
+
+    out: List[str] = []
+    counts = {'rules_in': len(parsed), 'unparsed': 0, 'duplicates': 0, 'subsumed': 0, 'irrelevant': 0}
+    seen: Set[Tuple[Atom, FrozenSet[Atom]]] = set()
+    for line, rule in parsed:
+        if rule is None:
+            counts['unparsed'] += 1
+            out.append(line)
+            continue
+        head, body = rule
+        if relevant is not None and head not in relevant:
+            counts['irrelevant'] += 1
+        elif rule in seen:
+            counts['duplicates'] += 1
+        elif body not in kept[head]:
+            counts['subsumed'] += 1
+        else:
+            seen.add(rule)
+            out.append(line)
+
+    counts['rules_out'] = len(out)
+    counts['relevant_atoms'] = len(relevant) if relevant is not None else 0
+    stats.update(counts)
+    return out
+
+
+def prune_file(rules_file: str, roots_file: str, out_file: str, **kwargs) -> Dict[str, int]:
+    """Liest rules_file und roots_file, schreibt die reduzierte Regelmenge nach out_file."""
+    with open(rules_file, 'r', encoding='utf-8') as f:
+        lines = f.readlines()
+    stats: Dict[str, int] = {}
+    pruned = prune_rules(lines, load_roots(roots_file), stats=stats, **kwargs)
+    with open(out_file, 'w', encoding='utf-8', newline='\n') as f:
+        for line in pruned:
+            f.write(line + '\n')
+    return stats
+
+
+def format_report(stats: Dict[str, int]) -> str:
+    removed = stats['rules_in'] - stats['rules_out']
+    share = 100.0 * removed / stats['rules_in'] if stats['rules_in'] else 0.0
+    return (f"{stats['rules_in']} → {stats['rules_out']} rules (-{removed}, {share:.1f}%): "
+            f"{stats['duplicates']} duplicate, {stats['subsumed']} subsumed, "
+            f"{stats['irrelevant']} irrelevant to roots")
+
+
+if __name__ == '__main__':
+    stats = prune_file('rules.txt', 'C.txt', 'rules_pruned.txt')
+    print(format_report(stats))
+    print("rules_pruned.txt written ✅")
@@ -1,5 +1,6 @@
 import sqlite3
 import re
+import time
 from typing import List, Tuple, Dict, Any, Optional
 
 class SecurityExtractor:
@@ -11,36 +12,54 @@ class SecurityExtractor:
 
     root_re = re.compile(r"^(?P<table>\w+)\['(?P<const>[^']+)'\]$")
 
+    # Zeilen pro Batch beim gestreamten Verschieben einer einzelnen Wurzel (_move_one)
+    BATCH_SIZE = 5000
+
     def __init__(self,
                  main_db_path: str,
                  fo_db_path: str,
-                 roots_file: str = 'C.txt'):
+                 roots_file: str = 'C.txt',
+                 roots: Optional[List[Tuple[str, str]]] = None,
+                 plan_only: bool = False):
+        """
+        roots: Wurzeln (Table, Const) direkt übergeben, C.txt wird dann nicht gelesen.
+        plan_only: nur für plan(); kein Umschalten auf WAL und kein Checkpoint beim Schließen,
+        die DB-Dateien bleiben unverändert (Trockenlauf direkt auf den Basis-DBs).
+        """
         # Zwei getrennte Verbindungen
         self.main_conn = sqlite3.connect(main_db_path, isolation_level=None)
         self.fo_conn   = sqlite3.connect(fo_db_path,   isolation_level=None)
+        self.plan_only = plan_only
 
         # Performance-PRAGMAs
         for conn in (self.main_conn, self.fo_conn):
             cur = conn.cursor()
-            cur.execute("PRAGMA journal_mode=WAL;")
+            if not plan_only:
+                cur.execute("PRAGMA journal_mode=WAL;")
             cur.execute("PRAGMA synchronous=OFF;")
             cur.execute("PRAGMA temp_store=MEMORY;")
             cur.execute("PRAGMA cache_size=-800000;")
 
         self.main_cur = self.main_conn.cursor()
         self.fo_cur   = self.fo_conn.cursor()
+        self.fo_db_path = fo_db_path
         self.roots_file = roots_file
+        self.roots = list(roots) if roots is not None else None
+        self._fo_attached = False
 
     # ---------- Hilfsfunktionen ----------
 
     def list_tables(self) -> List[str]:
         self.main_cur.execute("""
             SELECT name FROM sqlite_master
-            WHERE type='table' AND name NOT LIKE 'sqlite_%'
+            WHERE type IN ('table', 'view') AND name NOT LIKE 'sqlite_%'
+              AND substr(name, 1, 3) != 'cx_'
         """)
         return [r[0] for r in self.main_cur.fetchall()]
 
     def load_roots(self) -> List[Tuple[str, str]]:
+        if self.roots is not None:
+            return self.roots
         roots: List[Tuple[str, str]] = []
         with open(self.roots_file, 'r', encoding='utf-8', errors='ignore') as f:
             for raw in f:
@@ -61,6 +80,11 @@ class SecurityExtractor:
         sql = self._table_sql(table).lower()
         return "without rowid" in sql
 
+    def _is_view(self, table: str) -> bool:
+        """Views (z.B. kompaktes Schema aus a1) haben weder rowid noch eigene Indexe."""
+        self.main_cur.execute("SELECT 1 FROM sqlite_master WHERE type='view' AND name=?", (table,))
+        return self.main_cur.fetchone() is not None
+
     def _get_schema(self, table: str) -> Tuple[List[Tuple[str, str, int]], List[str], List[str]]:
         """
         Liefert:
@@ -78,13 +102,32 @@ class SecurityExtractor:
         return schema_rows, cols, pk_cols
 
     def _ensure_index(self, table: str, col: str):
+        if self._is_view(table):
+            return
         idx_name = f"idx_{table}_{col}"
         self.main_cur.execute(f"CREATE INDEX IF NOT EXISTS {idx_name} ON {table}({col});")
 
-    def _ensure_fo_table(self, table: str, schema_rows: List[Tuple[str, str, int]]):
+    def _ensure_fo_table(self, table: str, schema_rows: List[Tuple[str, str, int]], attached: bool = False):
         """Legt in der FO-DB die Tabelle mit gleichen Spalten (Namen & Typen) an."""
         cols_def = ", ".join(f"{name} {typ or 'TEXT'}" for (name, typ, _pk) in schema_rows)
-        self.fo_cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols_def});")
+        if attached:
+            self.main_cur.execute(f"CREATE TABLE IF NOT EXISTS fo.{table} ({cols_def});")
+        else:
+            self.fo_cur.execute(f"CREATE TABLE IF NOT EXISTS {table} ({cols_def});")
+
+    def _attach_fo(self):
+        """Hängt die FO-DB einmalig als Schema 'fo' an die Main-Verbindung an."""
+        if self._fo_attached:
+            return
+        self.main_cur.execute("ATTACH DATABASE ? AS fo", (self.fo_db_path,))
+        self.main_cur.execute("PRAGMA fo.synchronous=OFF;")
+        self._fo_attached = True
+
+    def _candidate_cols(self, table: str) -> Tuple[List[Tuple[str, str, int]], List[str]]:
+        """Schema und Kandidatenspalten (alle Nicht-PK-Spalten, sonst alle Spalten)."""
+        schema_rows, cols, _pk_cols = self._get_schema(table)
+        non_pk_cols = [name for (name, _typ, pk) in schema_rows if pk == 0]
+        return schema_rows, (non_pk_cols if non_pk_cols else cols)
 
     # ---------- Kern: verschieben ----------
 
@@ -92,6 +135,9 @@ class SecurityExtractor:
         """
         Verschiebt alle Zeilen aus 'table' (Main-DB) in die FO-DB,
         deren irgendeine Nicht-PK-Spalte == const ist. Jede Zeile wird nur 1× verschoben.
+        Die Treffer werden spaltenweise in Batches von BATCH_SIZE Zeilen gestreamt
+        (Keyset über rowid bzw. Primärschlüssel), der Speicherbedarf bleibt dadurch
+        unabhängig von der Trefferanzahl.
         Rückgabe: Anzahl verschobener Zeilen.
         """
         schema_rows, cols, pk_cols = self._get_schema(table)
@@ -105,82 +151,305 @@ class SecurityExtractor:
         for c in candidate_cols:
             self._ensure_index(table, c)
 
-        # WHERE-Klausel: (c1=? OR c2=? OR ...)
-        where_or = " OR ".join([f"{c} = ?" for c in candidate_cols])
-        params = tuple([const] * len(candidate_cols))
-
-        # 1) Kandidaten einmalig identifizieren
-        rows_to_move = []
-        rowids = []
-        without_rowid = self._is_without_rowid(table)
-
-        if not without_rowid:
-            self.main_cur.execute(f"SELECT rowid, {', '.join(cols)} FROM {table} WHERE {where_or}", params)
-            fetched = self.main_cur.fetchall()
-            if not fetched:
-                return 0
-            rowids = [r[0] for r in fetched]
-            rows_to_move = [tuple(r[1:]) for r in fetched]
-        else:
-            if not pk_cols:
-                self.main_cur.execute(f"SELECT {', '.join(cols)} FROM {table} WHERE {where_or}", params)
-                rows_to_move = self.main_cur.fetchall()
-                if not rows_to_move:
-                    return 0
-            else:
-                self.main_cur.execute(f"SELECT {', '.join(pk_cols)} FROM {table} WHERE {where_or}", params)
-                pks = list(dict.fromkeys(self.main_cur.fetchall()))
-                if not pks:
-                    return 0
-                where_pk = " AND ".join([f"{k} = ?" for k in pk_cols])
-                for chunk_start in range(0, len(pks), 500):
-                    chunk = pks[chunk_start:chunk_start+500]
-                    for pk_vals in chunk:
-                        self.main_cur.execute(
-                            f"SELECT {', '.join(cols)} FROM {table} WHERE {where_pk}",
-                            tuple(pk_vals) if isinstance(pk_vals, tuple) else (pk_vals,)
-                        )
-                        r = self.main_cur.fetchone()
-                        if r:
-                            rows_to_move.append(r)
-
-        if not rows_to_move:
-            return 0
-
-        # 2) In FO-DB einfügen
         placeholders = ",".join(["?"] * len(cols))
         insert_sql = f"INSERT OR IGNORE INTO {table}({', '.join(cols)}) VALUES ({placeholders})"
-        self.fo_cur.executemany(insert_sql, rows_to_move)
-
-        # 3) In Main-DB löschen
-        if not without_rowid and rowids:
-            for i in range(0, len(rowids), 1000):
-                chunk = rowids[i:i+1000]
-                qmarks = ",".join(["?"] * len(chunk))
-                self.main_cur.execute(f"DELETE FROM {table} WHERE rowid IN ({qmarks})", tuple(chunk))
-        else:
-            if pk_cols:
-                where_pk = " AND ".join([f"{k} = ?" for k in pk_cols])
-                col_index: Dict[str, int] = {name: idx for idx, name in enumerate(cols)}
-                pk_indices = [col_index[k] for k in pk_cols]
-                pk_rows = []
-                for r in rows_to_move:
-                    pk_rows.append(tuple(r[i] for i in pk_indices))
-                pk_rows = list(dict.fromkeys(pk_rows))
-                for t in pk_rows:
-                    self.main_cur.execute(f"DELETE FROM {table} WHERE {where_pk}", t)
+        without_rowid = self._is_without_rowid(table) or self._is_view(table)
+        moved = 0
+
+        # Spalte für Spalte: eine Zeile, die schon über c1 verschoben wurde, ist bei c2 bereits gelöscht
+        for c in candidate_cols:
+            if not without_rowid:
+                moved += self._stream_by_rowid(table, cols, c, const, insert_sql)
+            elif pk_cols:
+                moved += self._stream_by_pk(table, cols, pk_cols, c, const, insert_sql)
+            else:
+                moved += self._stream_without_key(table, cols, c, const, insert_sql)
+
+        return moved
+
+    def _stream_by_rowid(self, table: str, cols: List[str], col: str, const: str, insert_sql: str) -> int:
+        """Keyset über rowid (Index auf col liefert rowid-Reihenfolge), Löschen per rowid-Bereich."""
+        select_sql = (f"SELECT rowid, {', '.join(cols)} FROM {table} "
+                      f"WHERE {col} = ? AND rowid > ? ORDER BY rowid LIMIT {self.BATCH_SIZE}")
+        delete_sql = f"DELETE FROM {table} WHERE {col} = ? AND rowid BETWEEN ? AND ?"
+        moved = 0
+        last = -(1 << 63)
+        while True:
+            self.main_cur.execute(select_sql, (const, last))
+            batch = self.main_cur.fetchmany(self.BATCH_SIZE)
+            if not batch:
+                return moved
+            self.fo_cur.executemany(insert_sql, (r[1:] for r in batch))
+            first, last = batch[0][0], batch[-1][0]
+            self.main_cur.execute(delete_sql, (const, first, last))
+            moved += self.main_cur.rowcount
+
+    def _stream_by_pk(self, table: str, cols: List[str], pk_cols: List[str],
+                      col: str, const: str, insert_sql: str) -> int:
+        """Keyset über den Primärschlüssel (WITHOUT ROWID), Löschen per PK-Bereich."""
+        pk = f"({', '.join(pk_cols)})"
+        pk_params = "(" + ", ".join(["?"] * len(pk_cols)) + ")"
+        col_index: Dict[str, int] = {name: idx for idx, name in enumerate(cols)}
+        pk_indices = [col_index[k] for k in pk_cols]
+        order = ", ".join(pk_cols)
+        first_sql = (f"SELECT {', '.join(cols)} FROM {table} "
+                     f"WHERE {col} = ? ORDER BY {order} LIMIT {self.BATCH_SIZE}")
+        next_sql = (f"SELECT {', '.join(cols)} FROM {table} "
+                    f"WHERE {col} = ? AND {pk} > {pk_params} ORDER BY {order} LIMIT {self.BATCH_SIZE}")
+        delete_sql = f"DELETE FROM {table} WHERE {col} = ? AND {pk} BETWEEN {pk_params} AND {pk_params}"
+        moved = 0
+        last = None
+        while True:
+            if last is None:
+                self.main_cur.execute(first_sql, (const,))
             else:
-                where_full = " AND ".join([f"{c} IS ?" for c in cols])  # null-sicher
-                for r in rows_to_move:
-                    self.main_cur.execute(f"DELETE FROM {table} WHERE {where_full}", r)
+                self.main_cur.execute(next_sql, (const, *last))
+            batch = self.main_cur.fetchmany(self.BATCH_SIZE)
+            if not batch:
+                return moved
+            self.fo_cur.executemany(insert_sql, batch)
+            first = tuple(batch[0][i] for i in pk_indices)
+            last = tuple(batch[-1][i] for i in pk_indices)
+            self.main_cur.execute(delete_sql, (const, *first, *last))
+            moved += self.main_cur.rowcount
+
+    def _stream_without_key(self, table: str, cols: List[str], col: str, const: str, insert_sql: str) -> int:
+        """Ohne rowid und PK: Batch lesen, per Vollvergleich löschen, bis keine Treffer mehr übrig sind."""
+        select_sql = f"SELECT {', '.join(cols)} FROM {table} WHERE {col} = ? LIMIT {self.BATCH_SIZE}"
+        where_full = " AND ".join([f"{c} IS ?" for c in cols])  # null-sicher
+        delete_sql = f"DELETE FROM {table} WHERE {where_full}"
+        moved = 0
+        previous = None
+        while True:
+            self.main_cur.execute(select_sql, (const,))
+            batch = self.main_cur.fetchmany(self.BATCH_SIZE)
+            if not batch:
+                return moved
+            if batch == previous:
+                raise sqlite3.OperationalError(f"Zeilen in {table} lassen sich nicht löschen")
+            previous = batch
+            self.fo_cur.executemany(insert_sql, batch)
+            for r in dict.fromkeys(batch):
+                self.main_cur.execute(delete_sql, r)
+            moved += len(batch)
+
+    def _copy_table(self, table: str, batch: bool = False) -> Tuple[str, Tuple[str, ...]]:
+        """
+        Kopiert in einem Durchgang alle Zeilen aus 'table', deren irgendeine Nicht-PK-Spalte
+        einer der Konstanten in temp._root_consts entspricht, per INSERT ... SELECT in die
+        angehängte FO-DB. Schema- und Indexarbeit fällt einmal pro Tabelle an.
+        batch=True: nur Zeilen der Patienten in temp._batch_patients (erste Spalte = Patient).
+        Rückgabe: mengenbasiertes DELETE für dieselben Zeilen und seine Parameter.
+        """
+        schema_rows, candidate_cols = self._candidate_cols(table)
+        cols = [name for (name, _typ, _pk) in schema_rows]
+        self._ensure_fo_table(table, schema_rows, attached=True)
 
-        return len(rows_to_move)
+        for c in candidate_cols:
+            self._ensure_index(table, c)
+
+        where, params = self._roots_where(table, candidate_cols)
+        if batch:
+            where += f" AND {cols[0]} IN (SELECT n FROM temp._batch_patients)"
+        insert_sql, delete_sql = self._table_statements(table, cols, where)
+        self.main_cur.execute(insert_sql, params)
+        return delete_sql, params
+
+    @staticmethod
+    def _roots_where(table: str, candidate_cols: List[str]) -> Tuple[str, Tuple[str, ...]]:
+        """WHERE-Klausel (c1 IN consts OR c2 IN consts OR ...) gegen temp._root_consts."""
+        where_or = " OR ".join(
+            [f"{c} IN (SELECT const FROM temp._root_consts WHERE tbl = ?)" for c in candidate_cols]
+        )
+        return f"({where_or})", tuple([table] * len(candidate_cols))
+
+    @staticmethod
+    def _table_statements(table: str, cols: List[str], where: str) -> Tuple[str, str]:
+        """INSERT ... SELECT in die FO-DB und DELETE in der Main-DB für dieselbe WHERE-Klausel."""
+        col_list = ", ".join(cols)
+        insert_sql = f"INSERT OR IGNORE INTO fo.{table}({col_list}) SELECT {col_list} FROM main.{table} WHERE {where}"
+        delete_sql = f"DELETE FROM main.{table} WHERE {where}"
+        return insert_sql, delete_sql
+
+    @staticmethod
+    def _group_roots(roots: List[Tuple[str, str]], known: set) -> Dict[str, List[str]]:
+        by_table: Dict[str, List[str]] = {}
+        for table, const in roots:
+            if table in known:
+                by_table.setdefault(table, []).append(const)
+        return by_table
+
+    def _load_root_consts(self, by_table: Dict[str, List[str]]):
+        """Schreibt alle Wurzel-Konstanten in temp._root_consts (innerhalb der laufenden Transaktion)."""
+        self.main_cur.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS _root_consts (tbl TEXT, const, PRIMARY KEY (tbl, const))"
+        )
+        self.main_cur.execute("DELETE FROM temp._root_consts")
+        self.main_cur.executemany(
+            "INSERT OR IGNORE INTO temp._root_consts VALUES (?, ?)",
+            ((table, const) for table, consts in by_table.items() for const in consts)
+        )
+
+    def _load_batch_patients(self, patients: List[str]):
+        """Schreibt die Patienten eines Batches in temp._batch_patients (laufende Transaktion)."""
+        self.main_cur.execute("CREATE TEMP TABLE IF NOT EXISTS _batch_patients (n PRIMARY KEY) WITHOUT ROWID")
+        self.main_cur.execute("DELETE FROM temp._batch_patients")
+        self.main_cur.executemany("INSERT OR IGNORE INTO temp._batch_patients VALUES (?)",
+                                  ((p,) for p in patients))
+
+    def _extract_single_pass(self, roots: List[Tuple[str, str]], known: set,
+                             patients: Optional[List[str]] = None) -> int:
+        by_table = self._group_roots(roots, known)
+        if not by_table:
+            return 0
+
+        self._attach_fo()
+        total_moved = 0
+        # Zwei Transaktionen: im WAL-Modus ist ein COMMIT über main und fo nicht atomar (erst
+        # main-wal, dann fo-wal). Erst die FO-Inserts festschreiben, dann aus FS löschen; ein
+        # Abbruch dazwischen lässt die Zeilen nur doppelt stehen, ein erneuter Lauf (INSERT OR
+        # IGNORE) schließt das Verschieben ab.
+        deletes: List[Tuple[str, str, Tuple[str, ...]]] = []
+        self.main_cur.execute("BEGIN")
+        try:
+            self._load_root_consts(by_table)
+            if patients is not None:
+                self._load_batch_patients(patients)
+
+            for table in by_table:
+                # Savepoint pro Tabelle: ein Fehler verwirft nur diese Tabelle
+                self.main_cur.execute("SAVEPOINT move_table")
+                try:
+                    delete_sql, params = self._copy_table(table, batch=patients is not None)
+                    deletes.append((table, delete_sql, params))
+                except (sqlite3.OperationalError, ValueError) as e:
+                    self.main_cur.execute("ROLLBACK TO move_table")
+                self.main_cur.execute("RELEASE move_table")
+            self.main_cur.execute("COMMIT")
+
+            self.main_cur.execute("BEGIN")
+            for table, delete_sql, params in deletes:
+                self.main_cur.execute("SAVEPOINT move_table")
+                try:
+                    # total_changes zählt auch Löschungen über INSTEAD-OF-Trigger (Views), rowcount nicht
+                    before = self.main_conn.total_changes
+                    self.main_cur.execute(delete_sql, params)
+                    total_moved += self.main_conn.total_changes - before
+                except (sqlite3.OperationalError, ValueError) as e:
+                    self.main_cur.execute("ROLLBACK TO move_table")
+                self.main_cur.execute("RELEASE move_table")
+            self.main_cur.execute("COMMIT")
+        except Exception:
+            if self.main_conn.in_transaction:
+                self.main_cur.execute("ROLLBACK")
+            raise
+        return total_moved
+
+    # ---------- Trockenlauf ----------
+
+    def _query_plan(self, sql: str, params: Tuple = ()) -> List[str]:
+        self.main_cur.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[3] for row in self.main_cur.fetchall()]
+
+    def _plan_table(self, table: str, sample_size: int) -> Dict[str, Any]:
+        schema_rows, candidate_cols = self._candidate_cols(table)
+        cols = [name for (name, _typ, _pk) in schema_rows]
+
+        # Indexe wirklich anlegen (wird zurückgerollt), damit Pläne und Zeiten stimmen
+        self.main_cur.execute(
+            "SELECT name FROM sqlite_master WHERE type='index' AND tbl_name=?", (table,)
+        )
+        existing = {r[0] for r in self.main_cur.fetchall()}
+        is_view = self._is_view(table)
+        new_indexes = [f"idx_{table}_{c}" for c in candidate_cols
+                       if f"idx_{table}_{c}" not in existing and not is_view]
+        t0 = time.perf_counter()
+        for c in candidate_cols:
+            self._ensure_index(table, c)
+        index_seconds = time.perf_counter() - t0
+        self._ensure_fo_table(table, schema_rows, attached=True)
+
+        where, params = self._roots_where(table, candidate_cols)
+        insert_sql, delete_sql = self._table_statements(table, cols, where)
+        self.main_cur.execute(f"SELECT COUNT(*) FROM main.{table} WHERE {where}", params)
+        rows = self.main_cur.fetchone()[0]
+
+        # Kalibrierung: dieselben Anweisungen auf höchstens sample_size Treffern
+        sample_rows, sample_seconds = 0, 0.0
+        if rows and not is_view and not self._is_without_rowid(table):
+            self.main_cur.execute("CREATE TEMP TABLE IF NOT EXISTS _plan_sample (rid INTEGER PRIMARY KEY)")
+            self.main_cur.execute("DELETE FROM temp._plan_sample")
+            self.main_cur.execute(
+                f"INSERT INTO temp._plan_sample SELECT rowid FROM main.{table} WHERE {where} LIMIT {int(sample_size)}",
+                params
+            )
+            sample_rows = self.main_cur.rowcount
+            s_insert, s_delete = self._table_statements(
+                table, cols, f"{where} AND rowid IN (SELECT rid FROM temp._plan_sample)"
+            )
+            t0 = time.perf_counter()
+            self.main_cur.execute(s_insert, params)
+            self.main_cur.execute(s_delete, params)
+            sample_seconds = time.perf_counter() - t0
+
+        projected = index_seconds
+        if sample_rows:
+            projected += sample_seconds / sample_rows * rows
+        return {
+            'rows': rows,
+            'indexes': new_indexes,
+            'index_seconds': index_seconds,
+            'query_plans': {
+                'insert': self._query_plan(insert_sql, params),
+                'delete': self._query_plan(delete_sql, params),
+            },
+            'sample_rows': sample_rows,
+            'sample_seconds': sample_seconds,
+            'projected_seconds': projected,
+        }
+
+    def plan(self, sample_size: int = 1000) -> Dict[str, Any]:
+        """
+        Trockenlauf von extract(): verschiebt nichts.
+        Liefert pro Tabelle die Anzahl zu verschiebender Zeilen, die anzulegenden Indexe,
+        die erwarteten Query-Pläne (EXPLAIN QUERY PLAN) und eine Laufzeitprognose,
+        hochgerechnet aus einer Stichprobe von höchstens sample_size Zeilen.
+        Alles läuft in einer Transaktion, die am Ende zurückgerollt wird.
+        """
+        by_table = self._group_roots(self.load_roots(), set(self.list_tables()))
+        report: Dict[str, Any] = {'tables': {}, 'rows': 0, 'projected_seconds': 0.0}
+        if not by_table:
+            return report
+
+        self._attach_fo()
+        self.main_cur.execute("BEGIN")
+        try:
+            self._load_root_consts(by_table)
+            for table in by_table:
+                try:
+                    entry = self._plan_table(table, sample_size)
+                except (sqlite3.OperationalError, ValueError) as e:
+                    entry = {'error': str(e), 'rows': 0, 'projected_seconds': 0.0}
+                report['tables'][table] = entry
+                report['rows'] += entry['rows']
+                report['projected_seconds'] += entry['projected_seconds']
+        finally:
+            self.main_cur.execute("ROLLBACK")
+        return report
 
     # ---------- öffentlich ----------
 
-    def extract(self) -> int:
+    def extract(self, single_pass: bool = True, patients: Optional[List[str]] = None) -> int:
+        """
+        single_pass=True: Wurzeln nach Tabelle gruppieren und jede Tabelle in einem Durchgang
+        verschieben. single_pass=False: wie bisher eine Wurzel nach der anderen (_move_one).
+        patients: nur die Zeilen dieser Patienten verschieben (Batch-Betrieb, immer single_pass).
+        """
         roots = self.load_roots()
         known = set(self.list_tables())
+        if single_pass or patients is not None:
+            return self._extract_single_pass(roots, known, patients)
+
         total_moved = 0
 
         for table, const in roots:
@@ -200,14 +469,11 @@ class SecurityExtractor:
         return total_moved
 
     def close(self):
-        try:
-            self.main_conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
-        except Exception:
-            pass
-        try:
-            self.fo_conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
-        except Exception:
-            pass
+        for conn in (() if self.plan_only else (self.main_conn, self.fo_conn)):
+            try:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+            except Exception:
+                pass
         self.main_conn.close()
         self.fo_conn.close()
 
@@ -1,14 +1,60 @@
 import sqlite3
 import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+
+from a2_2_prune_rules import backward_closure, parse_rule
 
 class TGDDslSimulator:
-    def __init__(self, conn: sqlite3.Connection, rules: List[str]):
+    def __init__(self, conn: sqlite3.Connection, rules: List[str],
+                 roots: Optional[Iterable[Tuple[str, str]]] = None,
+                 restrict_patients: bool = False):
+        """
+        roots=None: klassischer Chase über alle Regeln.
+        roots (Table, Const) aus C.txt: zielgerichteter Chase, nur Regeln, deren Head in der
+        Rückwärtshülle der Wurzeln liegt, werden übernommen. restrict_patients=True beschränkt
+        das Feuern zusätzlich auf Patienten mit mindestens einem Fakt aus der Hülle; nur diese
+        können ein Atom der Hülle ableiten. Für die Atome der Hülle ist das Ergebnis gleich.
+        """
         self.conn = conn
         self.cur = conn.cursor()
+        self.goal_stats: Dict[str, int] = {'rules_total': len(rules)}
+        self.restrict_patients = False
+        if roots is not None:
+            rules, closure = self._goal_rules(rules, roots)
+            self.goal_stats['closure_atoms'] = len(closure)
+            if restrict_patients:
+                self.goal_stats['candidate_patients'] = self._load_goal_patients(closure)
+                self.restrict_patients = True
+        self.goal_stats['rules_used'] = len(rules)
         self.rules = rules
         self.tgds = [self._compile_rule(r) for r in rules]
 
+    @staticmethod
+    def _goal_rules(rules: List[str], roots: Iterable[Tuple[str, str]]) -> Tuple[List[str], set]:
+        """Regeln, deren Head in der Rückwärtshülle der Wurzeln liegt, und die Hülle selbst."""
+        parsed = [(r, parse_rule(r)) for r in rules]
+        closure = backward_closure((p for _, p in parsed if p is not None), roots)
+        return [r for r, p in parsed if p is None or p[0] in closure], closure
+
+    def _load_goal_patients(self, closure: set) -> int:
+        """Kandidaten-Patienten (pk) mit mindestens einem Fakt aus der Hülle → temp._goal_patients."""
+        self.cur.execute("CREATE TEMP TABLE IF NOT EXISTS _goal_patients (n PRIMARY KEY) WITHOUT ROWID")
+        self.cur.execute("DELETE FROM temp._goal_patients")
+        by_table: Dict[str, List[str]] = {}
+        for table, const in closure:
+            by_table.setdefault(table, []).append(const)
+        for table, consts in by_table.items():
+            try:
+                pk_col, const_col = self._get_pk_and_const_col(table)
+            except ValueError:
+                continue
+            self.cur.executemany(
+                f"INSERT OR IGNORE INTO temp._goal_patients SELECT {pk_col} FROM {table} WHERE {const_col} = ?",
+                ((c,) for c in consts)
+            )
+        self.conn.commit()
+        return self.cur.execute("SELECT COUNT(*) FROM temp._goal_patients").fetchone()[0]
+
     def _get_pk_and_const_col(self, table: str) -> (str, str):
         self.cur.execute(f"PRAGMA table_info({table})")
         info = self.cur.fetchall()
@@ -40,7 +86,11 @@ class TGDDslSimulator:
         select_params: List[Any] = []
         for atom in atoms:
             tbl, pk_col, const_col, const = parse(atom)
-            select_clauses.append(f"SELECT {pk_col} FROM {tbl} WHERE {const_col} = ?")
+            where = f"{const_col} = ?"
+            if self.restrict_patients:
+                # '+' hält den Index auf der Konstanten als Zugriffspfad, die Kandidaten sind nur Filter
+                where += f" AND +{pk_col} IN (SELECT n FROM temp._goal_patients)"
+            select_clauses.append(f"SELECT {pk_col} FROM {tbl} WHERE {where}")
             select_params.append(const)
         select_sql = ' INTERSECT '.join(select_clauses)
 
@@ -83,7 +133,8 @@ class TGDDslSimulator:
                 """
                 self.cur.execute(insert_sql, clean_vals)
                 self.conn.commit()  # sofort speichern, um Query darunter konsistent zu haben
-                count += self.cur.rowcount
+                # Zeile existierte nicht → genau eine neue (rowcount ist bei Views mit Trigger 0)
+                count += 1
 
                 # Nochmals auslesen, um den kompletten neuen Datensatz zu zeigen
                 sel_all = f"SELECT * FROM {t['head_tbl']} WHERE {' AND '.join(where_clauses)}"
@@ -3,7 +3,7 @@
 
 import sqlite3
 import re
-from typing import List, Tuple, Dict, Set
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
 from itertools import product
 import sys
 import logging
@@ -35,11 +35,20 @@ class RootsTGDSubgraphExtractor:
     def __init__(self,
                  chase_db: str = 'ChaseTable.db',
                  rules_file: str = 'rules.txt',
-                 roots_file: str = 'C.txt'):
+                 roots_file: str = 'C.txt',
+                 rules: Optional[Iterable[str]] = None,
+                 roots: Optional[List[Tuple[str, str]]] = None):
+        """
+        rules / roots: pass the rule lines and (Table, Const) roots directly;
+        the corresponding files are then not read.
+        """
         self.conn = sqlite3.connect(chase_db)
         self.cur = self.conn.cursor()
-        self.head_map = self._load_and_index_rules(rules_file)
-        self.roots = self._load_roots(roots_file)
+        if rules is None:
+            self.head_map = self._load_and_index_rules(rules_file)
+        else:
+            self.head_map = self._index_rules(rules)
+        self.roots = list(roots) if roots is not None else self._load_roots(roots_file)
         logging.info(f"Loaded {len(self.head_map)} distinct heads")
         logging.info(f"Loaded {len(self.roots)} roots: {self.roots}")
 
@@ -48,31 +57,37 @@ class RootsTGDSubgraphExtractor:
         """
         Reads TGDs from rules.txt and indexes them by head.
         """
-        head_map: Dict[Tuple[str, str], List[List[Tuple[str, str]]]] = {}
         with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-            for i, line in enumerate(f, 1):
-                text = line.strip()
-                if not text or '->' not in text:
-                    continue
-                body_s, head_s = [p.strip() for p in text.split('->', 1)]
-                m2 = self.atom_re.match(head_s)
-                if not m2:
-                    logging.warning(f"Line {i}: head not recognized: {head_s}")
+            return self._index_rules(f)
+
+    def _index_rules(self, lines: Iterable[str]) -> Dict[Tuple[str, str], List[List[Tuple[str, str]]]]:
+        """
+        Indexes TGD lines by head.
+        """
+        head_map: Dict[Tuple[str, str], List[List[Tuple[str, str]]]] = {}
+        for i, line in enumerate(lines, 1):
+            text = line.strip()
+            if not text or '->' not in text:
+                continue
+            body_s, head_s = [p.strip() for p in text.split('->', 1)]
+            m2 = self.atom_re.match(head_s)
+            if not m2:
+                logging.warning(f"Line {i}: head not recognized: {head_s}")
+                continue
+            head = (m2.group('table'), m2.group('const'))
+            parts = re.split(r'∧|AND', body_s)
+            body: List[Tuple[str, str]] = []
+            for atom in parts:
+                atom_clean = atom.strip()
+                if not atom_clean:
                     continue
-                head = (m2.group('table'), m2.group('const'))
-                parts = re.split(r'∧|AND', body_s)
-                body: List[Tuple[str, str]] = []
-                for atom in parts:
-                    atom_clean = atom.strip()
-                    if not atom_clean:
-                        continue
-                    m = self.atom_re.match(atom_clean)
-                    if m:
-                        body.append((m.group('table'), m.group('const')))
-                    else:
-                        logging.warning(f"Line {i}: body atom not recognized: {atom_clean}")
-                if body:
-                    head_map.setdefault(head, []).append(body)
+                m = self.atom_re.match(atom_clean)
+                if m:
+                    body.append((m.group('table'), m.group('const')))
+                else:
+                    logging.warning(f"Line {i}: body atom not recognized: {atom_clean}")
+            if body:
+                head_map.setdefault(head, []).append(body)
         return head_map
 
     # ----------------------------------------------------------
@@ -191,50 +206,71 @@ class RootsTGDSubgraphExtractor:
         return result
 
     # ----------------------------------------------------------
-    def save(self, out_file: str = 'graphs.txt') -> None:
-        total_written = 0
-        with open(out_file, 'w', encoding='utf-8') as f:
-            for idx, (tbl, const) in enumerate(self.roots, 1):
-                pk, constcol = self._get_pk_const(tbl)
-                self.cur.execute(f"SELECT {pk} FROM {tbl} WHERE {constcol} = ?", (const,))
-                rows = self.cur.fetchall()
-
-                root_written = 0
-                #logging.info(f"[{idx}/{len(self.roots)}] Root {tbl}:{const} → {len(rows)} DB matches")
-                #logging.info(f"Head ({tbl},{const}) has {len(self.head_map.get((tbl,const), []))} rules")
-
-                for row_idx, (key,) in enumerate(rows, 1):
-                    root = f"{tbl}:{key}:{const}"
-                    logging.debug(f"  -> Expand {root} ({row_idx}/{len(rows)})")
-
-                    try:
-                        subs = self._expand_full(root)
-                    except RecursionError:
-                        logging.error(f"RecursionError at {root} – expansion too deep")
-                        continue
-                    except Exception as e:
-                        logging.error(f"Error during expansion {root}: {e}")
-                        logging.error(traceback.format_exc())
-                        continue
-
-                    if not subs:
-                        logging.info(f"  {root} → no subgraphs expanded")
-
-                    for sg in subs:
-                        f.write('graph = {\n')
-                        for n, vs in sg.items():
-                            entries = ', '.join(f"'{x}'" for x in vs)
-                            f.write(f"  '{n}': [{entries}],\n")
-                        f.write('}\n\n')
-                        f.flush()
-                        os.fsync(f.fileno())
-
-                        root_written += 1
-                        total_written += 1
-
-                logging.info(f"Root {tbl}:{const} → wrote {root_written} graphs")
+    def iter_graphs(self) -> Iterator[Dict[str, List[str]]]:
+        """
+        Yields the subgraphs of all roots one by one (node -> sorted parent nodes),
+        the in-memory counterpart of save().
+        """
+        total = 0
+        for idx, (tbl, const) in enumerate(self.roots, 1):
+            pk, constcol = self._get_pk_const(tbl)
+            self.cur.execute(f"SELECT {pk} FROM {tbl} WHERE {constcol} = ?", (const,))
+            rows = self.cur.fetchall()
+
+            root_count = 0
+            #logging.info(f"[{idx}/{len(self.roots)}] Root {tbl}:{const} → {len(rows)} DB matches")
+            #logging.info(f"Head ({tbl},{const}) has {len(self.head_map.get((tbl,const), []))} rules")
+
+            for row_idx, (key,) in enumerate(rows, 1):
+                root = f"{tbl}:{key}:{const}"
+                logging.debug(f"  -> Expand {root} ({row_idx}/{len(rows)})")
+
+                try:
+                    subs = self._expand_full(root)
+                except RecursionError:
+                    logging.error(f"RecursionError at {root} – expansion too deep")
+                    continue
+                except Exception as e:
+                    logging.error(f"Error during expansion {root}: {e}")
+                    logging.error(traceback.format_exc())
+                    continue
+
+                if not subs:
+                    logging.info(f"  {root} → no subgraphs expanded")
+
+                for sg in subs:
+                    root_count += 1
+                    total += 1
+                    yield sg
 
+            logging.info(f"Root {tbl}:{const} → {root_count} graphs")
+
+        logging.info(f"DONE: {total} graphs")
+
+    @staticmethod
+    def write_graphs(graphs: Iterable[Dict[str, List[str]]], out_file: str, fsync: bool = True) -> int:
+        """
+        Writes graphs in the graphs.txt format and returns their number.
+        fsync=True syncs after every graph (crash-safe, as before).
+        """
+        written = 0
+        with open(out_file, 'w', encoding='utf-8') as f:
+            for sg in graphs:
+                f.write('graph = {\n')
+                for n, vs in sg.items():
+                    entries = ', '.join(f"'{x}'" for x in vs)
+                    f.write(f"  '{n}': [{entries}],\n")
+                f.write('}\n\n')
+                if fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                written += 1
+        return written
+
+    def save(self, out_file: str = 'graphs.txt') -> int:
+        total_written = self.write_graphs(self.iter_graphs(), out_file)
         logging.info(f"DONE: wrote {total_written} graphs to '{out_file}'")
+        return total_written
 
 
 # ----------------------------------------------------------
@@ -3,7 +3,8 @@
 
 import sqlite3
 import re
-from typing import List, Dict, Tuple, Set
+import json
+from typing import Iterable, List, Dict, Optional, Tuple, Set
 
 class GraphTraversal:
     """
@@ -38,13 +39,23 @@ class GraphTraversal:
         return graphs
 
     @staticmethod
-    def _extract_nodes(conn: sqlite3.Connection) -> Set[str]:
-        """Reads all tables and builds nodes in the form 'Table:pk:const' from (pk, text column)."""
+    def _extract_nodes(conn: sqlite3.Connection, patients: Optional[Iterable[str]] = None) -> Set[str]:
+        """
+        Reads all tables and builds nodes in the form 'Table:pk:const' from (pk, text column).
+        patients: only rows whose pk is one of these patients (batch mode).
+        """
         cur = conn.cursor()
         nodes: Set[str] = set()
+        where = ""
+        if patients is not None:
+            cur.execute("CREATE TEMP TABLE IF NOT EXISTS _batch_patients (n PRIMARY KEY) WITHOUT ROWID")
+            cur.execute("DELETE FROM temp._batch_patients")
+            cur.executemany("INSERT OR IGNORE INTO temp._batch_patients VALUES (?)", ((p,) for p in patients))
 
         # Get table names
-        cur.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        # Tabellen und Views (kompaktes Schema), ohne interne cx_-Tabellen
+        cur.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+                    "AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 3) != 'cx_'")
         tables = [row[0] for row in cur.fetchall()]
 
         for table in tables:
@@ -61,8 +72,11 @@ class GraphTraversal:
             if not text_cols:
                 continue
 
+            if patients is not None:
+                where = f" WHERE {pk_col} IN (SELECT n FROM temp._batch_patients)"
+
             # Read all rows
-            cur.execute(f"SELECT {pk_col}, {', '.join(text_cols)} FROM {table}")
+            cur.execute(f"SELECT {pk_col}, {', '.join(text_cols)} FROM {table}{where}")
             for row in cur.fetchall():
                 pk_val = row[0]
                 for val in row[1:]:
@@ -71,13 +85,17 @@ class GraphTraversal:
         return nodes
 
     @staticmethod
-    def load_C_I(chase_db: str, fs_db: str) -> Tuple[Set[str], Set[str]]:
+    def load_C_I(chase_db: str, fs_db: str,
+                 patients: Optional[Iterable[str]] = None) -> Tuple[Set[str], Set[str]]:
+        """patients: restrict C and I to the rows of these patients."""
+        if patients is not None:
+            patients = list(patients)
         conn_c = sqlite3.connect(chase_db)
-        C = GraphTraversal._extract_nodes(conn_c)
+        C = GraphTraversal._extract_nodes(conn_c, patients)
         conn_c.close()
 
         conn_i = sqlite3.connect(fs_db)
-        I = GraphTraversal._extract_nodes(conn_i)
+        I = GraphTraversal._extract_nodes(conn_i, patients)
         conn_i.close()
 
         return C, I
@@ -122,29 +140,39 @@ class GraphTraversal:
 
         return unique_paths
 
+    @staticmethod
+    def save_paths(grouped_paths: Iterable[List[List[str]]], filepath: str) -> int:
+        """
+        Writes path groups line-delimited: one JSON array (the paths of one graph) per line.
+        Groups are written as they arrive, so the caller never has to hold all of them.
+        Returns the number of groups written.
+        """
+        written = 0
+        with open(filepath, 'w', encoding='utf-8') as f:
+            for group in grouped_paths:
+                f.write(json.dumps(group, ensure_ascii=False))
+                f.write('\n')
+                written += 1
+        return written
+
 
 if __name__ == '__main__':
     # Load graph components
     graphs = GraphTraversal.load_graphs('graphs.txt')
     # Load C and I (now sets)
     C, I = GraphTraversal.load_C_I('ChaseTable.db', 'fs_records.db')
-    # Traverse each component
-    grouped_paths: List[List[List[str]]] = []
-    for idx, g in enumerate(graphs, start=1):
-        paths = GraphTraversal.traverse_graph(g, C, I)
-        if paths:  # add only if non-empty
-            grouped_paths.append(paths)
-
-    # Remove exact duplicate groups
-    unique_grouped_paths: List[List[List[str]]] = []
-    seen_groups = set()
-    for group in grouped_paths:
-        tup = tuple(tuple(p) for p in group)  # represent each group as a tuple of tuples
-        if tup not in seen_groups:
-            seen_groups.add(tup)
-            unique_grouped_paths.append(group)
-
-    # Save results
-    with open('paths.txt', 'w', encoding='utf-8') as f:
-        f.write(repr(unique_grouped_paths))
+    # Traverse each component and drop exact duplicate groups on the fly
+    def unique_grouped_paths():
+        seen_groups = set()
+        for g in graphs:
+            group = GraphTraversal.traverse_graph(g, C, I)
+            if not group:  # add only if non-empty
+                continue
+            tup = tuple(tuple(p) for p in group)  # represent each group as a tuple of tuples
+            if tup not in seen_groups:
+                seen_groups.add(tup)
+                yield group
+
+    # Save results (one group per line)
+    GraphTraversal.save_paths(unique_grouped_paths(), 'paths.txt')
     print("All unique path groups per graph have been saved to 'paths.txt'.")
@@ -1,13 +1,78 @@
 import ast
-from typing import List, Set
+import json
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+
+class CostModel:
+    """
+    Kosten für das Verschieben eines Knotens 'Table:key:const' in die FO-DB.
+    Reihenfolge: Knoten-Kosten vor Tabellen-Kosten vor dem Default.
+    Erwartetes JSON-Format:  {"tables": {"Treatment": 0.2}, "nodes": {...}, "default": 1.0}
+    """
+
+    def __init__(self,
+                 table_costs: Optional[Dict[str, float]] = None,
+                 node_costs: Optional[Dict[str, float]] = None,
+                 default: float = 1.0):
+        self.table_costs = dict(table_costs or {})
+        self.node_costs = dict(node_costs or {})
+        self.default = float(default)
+        self._cache: Dict[str, float] = {}
+
+    @staticmethod
+    def load(filepath: str) -> 'CostModel':
+        with open(filepath, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return CostModel(data.get('tables'), data.get('nodes'), data.get('default', 1.0))
+
+    def cost(self, node: str) -> float:
+        c = self._cache.get(node)
+        if c is None:
+            c = self.node_costs.get(node)
+            if c is None:
+                c = self.table_costs.get(node.split(':', 1)[0], self.default)
+            c = float(c)
+            self._cache[node] = c
+        return c
+
+    def summarize(self, nodes: Iterable[str]) -> Dict[str, object]:
+        """Gesamtkosten und Knoten/Kosten pro Tabelle für eine gewählte Union."""
+        per_table: Dict[str, Dict[str, float]] = {}
+        total = 0.0
+        count = 0
+        for node in nodes:
+            c = self.cost(node)
+            entry = per_table.setdefault(node.split(':', 1)[0], {'nodes': 0, 'cost': 0.0})
+            entry['nodes'] += 1
+            entry['cost'] += c
+            total += c
+            count += 1
+        return {'total_cost': total, 'nodes': count, 'per_table': per_table}
 
 
 class PathCombinator:
     @staticmethod
-    def load_paths(filepath: str) -> List[List[List[str]]]:
-        """Lädt die gruppierten Pfade (Liste von Pfad-Listen) aus der Datei."""
+    def iter_paths(filepath: str) -> Iterator[List[List[str]]]:
+        """
+        Liest die gruppierten Pfade zeilenweise: eine JSON-Gruppe (Liste von Pfaden) pro Zeile.
+        Es liegt immer nur eine Gruppe im Speicher.
+        Alte paths.txt im repr-Format (eine einzige Python-Literal-Zeile) werden weiterhin gelesen.
+        """
         with open(filepath, 'r', encoding='utf-8') as f:
-            return ast.literal_eval(f.read())
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # Altformat: die ganze Datei ist ein repr() aller Gruppen
+                    yield from ast.literal_eval(line)
+
+    @staticmethod
+    def load_paths(filepath: str) -> List[List[List[str]]]:
+        """Lädt die gruppierten Pfade (Liste von Pfad-Listen) vollständig aus der Datei."""
+        return list(PathCombinator.iter_paths(filepath))
 
     @staticmethod
     def generate_optimal_union(groups: List[List[List[str]]]) -> List[str]:
@@ -39,10 +104,12 @@ class PathCombinator:
         return list(best_union)
 
     @staticmethod
-    def generate_greedy_union(groups: List[List[List[str]]]) -> List[str]:
+    def generate_greedy_union(groups: Iterable[List[List[str]]]) -> List[str]:
         """
         Greedy-Heuristik: pro Gruppe die Unterliste wählen,
         die die aktuelle Union minimal vergrößert.
+        Die Gruppen werden nur einmal durchlaufen und können daher direkt
+        aus iter_paths() gestreamt werden.
         """
         current_union: Set[str] = set()
 
@@ -52,27 +119,114 @@ class PathCombinator:
                 continue
 
             # wähle die beste Menge bzgl. Union-Vergrößerung
-            best = min(non_empty, key=lambda s: len(current_union.union(s)))
+            # (|U ∪ s| = |U| + |s \ U|, daher genügt der Zuwachs)
+            best = min(non_empty, key=lambda s: len(set(s).difference(current_union)))
             current_union.update(best)
 
         return list(current_union)
 
+    @staticmethod
+    def generate_optimal_weighted_union(groups: List[List[List[str]]],
+                                        costs: CostModel) -> Tuple[List[str], Dict[str, object]]:
+        """
+        Exakte gewichtete Lösung (nur bei kleinen Instanzen praktikabel):
+        Tiefensuche über die Gruppen, Äste oberhalb der besten Kosten werden abgeschnitten.
+        Gibt die Union mit minimalen Gesamtkosten und deren Kostenübersicht zurück.
+        """
+        filtered_groups = []
+        for group in groups:
+            non_empty = [sub for sub in group if sub]
+            if non_empty:
+                filtered_groups.append(non_empty)
+
+        best: Dict[str, object] = {'cost': None, 'union': set()}
+        current: Set[str] = set()
+
+        def search(i: int, cost: float) -> None:
+            if best['cost'] is not None and cost >= best['cost']:
+                return
+            if i == len(filtered_groups):
+                best['cost'] = cost
+                best['union'] = set(current)
+                return
+            # günstigste Erweiterungen zuerst, damit die Schranke früh greift
+            options = []
+            for sub in filtered_groups[i]:
+                added = set(sub).difference(current)
+                options.append((sum(costs.cost(n) for n in added), added))
+            options.sort(key=lambda o: o[0])
+            for gain, added in options:
+                current.update(added)
+                search(i + 1, cost + gain)
+                current.difference_update(added)
+
+        search(0, 0.0)
+        union = list(best['union'])
+        return union, costs.summarize(union)
+
+    @staticmethod
+    def generate_weighted_greedy_union(groups: Iterable[List[List[str]]],
+                                       costs: CostModel) -> Tuple[List[str], Dict[str, object]]:
+        """
+        Gewichtete Greedy-Heuristik: pro Gruppe die Unterliste wählen,
+        deren noch nicht gewählte Knoten die geringsten Zusatzkosten verursachen
+        (bei Gleichstand: weniger neue Knoten).
+        Nur der Kostenzuwachs gegenüber der aktuellen Union wird berechnet; Knotenkosten
+        werden im CostModel zwischengespeichert. Die Gruppen werden gestreamt.
+        """
+        current_union: Set[str] = set()
+
+        for group in groups:
+            best_key = None
+            best_added: Set[str] = set()
+            for sub in group:
+                if not sub:
+                    continue
+                added = set(sub).difference(current_union)
+                key = (sum(costs.cost(n) for n in added), len(added))
+                if best_key is None or key < best_key:
+                    best_key = key
+                    best_added = added
+            current_union.update(best_added)
+
+        union = list(current_union)
+        return union, costs.summarize(union)
+
+    @staticmethod
+    def save_union(filepath: str, union: List[str],
+                   cost_summary: Optional[Dict[str, object]] = None) -> None:
+        """
+        Speichert die Union. Ohne Kostenmodell als Liste (bisheriges Format),
+        sonst als {'nodes': [...], 'cost_summary': {...}}.
+        """
+        with open(filepath, 'w', encoding='utf-8') as f:
+            if cost_summary is None:
+                f.write(repr(union))
+            else:
+                f.write(repr({'nodes': union, 'cost_summary': cost_summary}))
+
 
 if __name__ == '__main__':
-    # Gruppierte Pfade laden
-    groups = PathCombinator.load_paths('paths.txt')
+    import os
+
+    # Gruppierte Pfade zeilenweise streamen
+    groups = PathCombinator.iter_paths('paths.txt')
 
     # Exakte Lösung (nur kleine Instanzen!)
-    # optimal_set = PathCombinator.generate_optimal_union(groups)
+    # optimal_set = PathCombinator.generate_optimal_union(PathCombinator.load_paths('paths.txt'))
     # print('Optimales Hitting Set:', optimal_set)
 
-    # Greedy Lösung (skalierbarer)
-    greedy_set = PathCombinator.generate_greedy_union(groups)
-    print('Minimal Union Set:', greedy_set)
+    if os.path.exists('costs.json'):
+        # Gewichtete Greedy Lösung mit Kosten pro Tabelle/Knoten
+        greedy_set, summary = PathCombinator.generate_weighted_greedy_union(groups, CostModel.load('costs.json'))
+        print('Minimal Cost Union Set:', greedy_set)
+        print('Total cost:', summary['total_cost'])
+    else:
+        # Greedy Lösung (skalierbarer)
+        greedy_set, summary = PathCombinator.generate_greedy_union(groups), None
+        print('Minimal Union Set:', greedy_set)
 
     # Ergebnisse speichern
     # with open('union_optimal.txt', 'w', encoding='utf-8') as f:
     #     f.write(repr(optimal_set))
-    with open('union_greedy.txt', 'w', encoding='utf-8') as f:
-        f.write(repr(greedy_set))
-
+    PathCombinator.save_union('union_greedy.txt', greedy_set, summary)
@@ -1,18 +1,33 @@
 import sqlite3
 import ast
-from typing import List, Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 class TransferAndDelete:
 
-    def __init__(self, main_db: str, fo_db: str, hs_file: str):
+    def __init__(self, main_db: str, fo_db: str, hs_file: Optional[str] = None, bulk: bool = False):
         self.main_db = main_db
         self.fo_db = fo_db
         self.hs_file = hs_file
+        # bulk=True: FO-DB per ATTACH anbinden und pro Tabelle ein INSERT ... SELECT + ein DELETE
+        self.bulk = bulk
+        self.cost_summary: Optional[Dict[str, Any]] = None
 
     @staticmethod
-    def load_minimal_union(filepath: str) -> List[str]:
+    def load_union_with_costs(filepath: str) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+        """
+        Returns the union nodes and, for a weighted union, its cost summary.
+        Accepts a plain node list or {'nodes': [...], 'cost_summary': {...}}.
+        """
         with open(filepath, 'r', encoding='utf-8') as f:
-            return ast.literal_eval(f.read())
+            data = ast.literal_eval(f.read())
+        if isinstance(data, dict):
+            return list(data.get('nodes', [])), data.get('cost_summary')
+        return data, None
+
+    @staticmethod
+    def load_minimal_union(filepath: str) -> List[str]:
+        return TransferAndDelete.load_union_with_costs(filepath)[0]
 
     @staticmethod
     def _get_table_info(cur: sqlite3.Cursor, table: str) -> List[str]:
@@ -25,8 +40,200 @@ class TransferAndDelete:
         return cols
 
 
-    def process(self) -> int:
-        nodes = self.load_minimal_union(self.hs_file)
+    def _print_cost_summary(self) -> None:
+        s = self.cost_summary
+        if not s:
+            return
+        print(f"Union cost: {s.get('total_cost', 0.0):.2f} for {s.get('nodes', 0)} nodes")
+        for table, entry in sorted(s.get('per_table', {}).items()):
+            print(f"  {table}: {entry['nodes']} nodes, cost {entry['cost']:.2f}")
+
+    @staticmethod
+    def _group_nodes(nodes: List[str]) -> Dict[str, List[Tuple[str, str]]]:
+        """
+        Splits 'Table:val1:val2' nodes and groups the key pairs by table.
+        """
+        by_table: Dict[str, List[Tuple[str, str]]] = {}
+        for node in nodes:
+            try:
+                table, val1, val2 = node.split(':', 2)
+            except ValueError:
+                print(f"Invalid format: {node}")
+                continue
+            by_table.setdefault(table, []).append((val1, val2))
+        return by_table
+
+    @staticmethod
+    def _bulk_statements(table: str, cols: List[str],
+                         nodes_table: str = "temp._union_nodes") -> Tuple[str, str, str]:
+        """
+        CREATE for the FO table, INSERT ... SELECT ... JOIN into FO and DELETE from FS
+        for all nodes of one table (first two columns are the node key).
+        """
+        key1, key2 = cols[0], cols[1]
+        col_list = ", ".join(cols)
+        col_defs = ", ".join(f"{c} TEXT" for c in cols)
+        create_sql = f"CREATE TABLE IF NOT EXISTS fo.{table} ({col_defs})"
+        insert_sql = (
+            f"INSERT OR IGNORE INTO fo.{table}({col_list}) "
+            f"SELECT {', '.join('t.' + c for c in cols)} FROM main.{table} t "
+            f"JOIN {nodes_table} n ON n.tbl = ? AND t.{key1} = n.k1 AND t.{key2} = n.k2"
+        )
+        delete_sql = (
+            f"DELETE FROM main.{table} WHERE ({key1}, {key2}) IN "
+            f"(SELECT k1, k2 FROM {nodes_table} WHERE tbl = ?)"
+        )
+        return create_sql, insert_sql, delete_sql
+
+    def _open_bulk(self, by_table: Dict[str, List[Tuple[str, str]]]) -> sqlite3.Connection:
+        """
+        Opens FS in autocommit mode, attaches FO, begins a transaction
+        and loads the union nodes into temp._union_nodes.
+        """
+        conn = sqlite3.connect(self.main_db, isolation_level=None)
+        cur = conn.cursor()
+        cur.execute("ATTACH DATABASE ? AS fo", (self.fo_db,))
+        cur.execute("BEGIN")
+        cur.execute("CREATE TEMP TABLE _union_nodes (tbl, k1, k2, PRIMARY KEY (tbl, k1, k2))")
+        cur.executemany(
+            "INSERT OR IGNORE INTO temp._union_nodes VALUES (?, ?, ?)",
+            ((table, v1, v2) for table, pairs in by_table.items() for v1, v2 in pairs)
+        )
+        return conn
+
+    def _process_bulk(self, nodes: List[str]) -> int:
+        """
+        Set-based transfer: the union nodes go into a temp table, the FO DB is attached,
+        and every table is moved with one INSERT ... SELECT ... JOIN and one DELETE.
+        FS and FO run in WAL mode (a3), where a transaction over attached DBs is not atomic
+        across the files. The FO inserts are therefore committed first, the FS deletes in a
+        second transaction: a crash in between only leaves rows in both DBs, and repeating
+        the transfer (INSERT OR IGNORE) completes it.
+        """
+        by_table = self._group_nodes(nodes)
+        conn = self._open_bulk(by_table)
+        cur = conn.cursor()
+
+        total_inserted = 0
+        total_deleted = 0
+
+        try:
+            statements = []
+            for table in by_table:
+                cur.execute(f"PRAGMA main.table_info({table})")
+                cols = [row[1] for row in cur.fetchall()]
+                if not cols:
+                    print(f"Table not found: {table}")
+                    continue
+                if len(cols) < 2:
+                    print(f"Not enough columns in table {table} (need at least 2)")
+                    continue
+
+                create_sql, insert_sql, delete_sql = self._bulk_statements(table, cols)
+                cur.execute(create_sql)
+                cur.execute(insert_sql, (table,))
+                total_inserted += cur.rowcount
+                statements.append((table, delete_sql))
+            cur.execute("COMMIT")
+
+            cur.execute("BEGIN")
+            for table, delete_sql in statements:
+                # total_changes counts deletes done by INSTEAD OF triggers on views, rowcount does not
+                before = conn.total_changes
+                cur.execute(delete_sql, (table,))
+                total_deleted += conn.total_changes - before
+            cur.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                cur.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+        print(f"Total inserted into FO: {total_inserted}")
+        print(f"Total deleted from FS: {total_deleted}")
+
+        return total_deleted
+
+    def plan(self, sample_size: int = 1000) -> Dict[str, Any]:
+        """
+        Dry run of the bulk transfer: nothing is moved.
+        Reports per table the union nodes, the rows that would move, the expected query plans
+        (EXPLAIN QUERY PLAN) and a projected runtime extrapolated from running the real
+        statements on at most sample_size nodes. Everything is rolled back at the end.
+        """
+        nodes, self.cost_summary = self.load_union_with_costs(self.hs_file)
+        by_table = self._group_nodes(nodes)
+        report: Dict[str, Any] = {'tables': {}, 'rows': 0, 'projected_seconds': 0.0}
+        if not by_table:
+            return report
+
+        conn = self._open_bulk(by_table)
+        cur = conn.cursor()
+        try:
+            cur.execute("CREATE TEMP TABLE _plan_nodes (tbl, k1, k2, PRIMARY KEY (tbl, k1, k2))")
+            for table, pairs in by_table.items():
+                cur.execute(f"PRAGMA main.table_info({table})")
+                cols = [row[1] for row in cur.fetchall()]
+                if len(cols) < 2:
+                    report['tables'][table] = {'error': f"table {table} missing or has fewer than 2 columns",
+                                               'rows': 0, 'projected_seconds': 0.0}
+                    continue
+
+                create_sql, insert_sql, delete_sql = self._bulk_statements(table, cols)
+                cur.execute(create_sql)
+                cur.execute(
+                    f"SELECT COUNT(*) FROM main.{table} t JOIN temp._union_nodes n "
+                    f"ON n.tbl = ? AND t.{cols[0]} = n.k1 AND t.{cols[1]} = n.k2", (table,)
+                )
+                rows = cur.fetchone()[0]
+                query_plans = {}
+                for name, sql in (('insert', insert_sql), ('delete', delete_sql)):
+                    cur.execute(f"EXPLAIN QUERY PLAN {sql}", (table,))
+                    query_plans[name] = [r[3] for r in cur.fetchall()]
+
+                # Calibration: the same statements on a sample of the nodes
+                cur.execute(
+                    "INSERT INTO temp._plan_nodes SELECT tbl, k1, k2 FROM temp._union_nodes "
+                    f"WHERE tbl = ? LIMIT {int(sample_size)}", (table,)
+                )
+                sample_nodes = cur.rowcount
+                _, s_insert, s_delete = self._bulk_statements(table, cols, "temp._plan_nodes")
+                t0 = time.perf_counter()
+                cur.execute(s_insert, (table,))
+                cur.execute(s_delete, (table,))
+                sample_seconds = time.perf_counter() - t0
+
+                projected = sample_seconds / sample_nodes * len(pairs) if sample_nodes else 0.0
+                report['tables'][table] = {
+                    'nodes': len(pairs),
+                    'rows': rows,
+                    'indexes': [],
+                    'query_plans': query_plans,
+                    'sample_nodes': sample_nodes,
+                    'sample_seconds': sample_seconds,
+                    'projected_seconds': projected,
+                }
+                report['rows'] += rows
+                report['projected_seconds'] += projected
+        finally:
+            cur.execute("ROLLBACK")
+            conn.close()
+        return report
+
+    def process(self, nodes: Optional[List[str]] = None,
+                cost_summary: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Moves the union nodes from FS to FO and returns the number of deleted rows.
+        Without nodes, the union is read from hs_file.
+        """
+        if nodes is None:
+            nodes, cost_summary = self.load_union_with_costs(self.hs_file)
+        self.cost_summary = cost_summary
+        self._print_cost_summary()
+        if self.bulk:
+            return self._process_bulk(nodes)
+
         conn_main = sqlite3.connect(self.main_db)
         cur_main = conn_main.cursor()
         conn_fo = sqlite3.connect(self.fo_db)
@@ -79,11 +286,12 @@ class TransferAndDelete:
             total_inserted += len(rows)
 
             # Delete from main DB and count
+            before = conn_main.total_changes
             cur_main.execute(
                 f"DELETE FROM {table} WHERE {key1} = ? AND {key2} = ?",
                 (val1, val2)
             )
-            total_deleted += cur_main.rowcount
+            total_deleted += conn_main.total_changes - before
 
         conn_fo.commit()
         conn_main.commit()
@@ -101,6 +309,7 @@ if __name__ == '__main__':
     mover = TransferAndDelete(
         main_db='fs_records.db',
         fo_db='fo_records.db',
-        hs_file='union_greedy.txt'
+        hs_file='union_greedy.txt',
+        bulk=True
     )
     mover.process()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Content-addressed artifact cache for bench_runner steps.
+
+A step's key is the sha256 of its name, the source of the modules it runs, its configuration and
+the versions of its input artifacts. Base DBs are versioned by their content hash (kept next to
+the file as <db>.sha256 and reused while size and mtime are unchanged); every output of a step
+is versioned as "<step key>:<artifact>". Keys therefore chain like a derivation: changing
+a7_minimal_union changes the key of paths_union and, through greedy_union.txt, of transfer_delete,
+while all earlier steps keep their keys.
+
+Layout: <root>/<key[:2]>/<key>/ holds the output files and meta.json (step, runtime, result,
+files, size, created, last_used). Entries are written to a temporary directory and renamed, so
+concurrent cells never see partial entries. evict() removes least recently used entries until
+the cache fits into max_bytes.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import fastcopy
+
+_CHUNK = 1 << 20
+_source_digests: Dict[str, str] = {}
+
+
+def file_digest(path: Path) -> str:
+    """sha256 des Dateiinhalts, zwischengespeichert in <path>.sha256 (gültig bei gleicher Größe/mtime)."""
+    st = os.stat(path)
+    stamp = f"{st.st_size} {st.st_mtime_ns}"
+    sidecar = Path(f"{path}.sha256")
+    try:
+        saved_stamp, digest = sidecar.read_text(encoding="utf-8").rsplit(" ", 1)
+        if saved_stamp == stamp:
+            return digest
+    except (OSError, ValueError):
+        pass
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_CHUNK), b""):
+            h.update(chunk)
+    digest = h.hexdigest()
+    try:
+        sidecar.write_text(f"{stamp} {digest}", encoding="utf-8")
+    except OSError:
+        pass
+    return digest
+
+
+def source_digest(modules: Iterable[object]) -> str:
+    """Hash der Quelltexte der Module (Code-Version eines Schritts)."""
+    h = hashlib.sha256()
+    for module in modules:
+        path = module.__file__
+        if path not in _source_digests:
+            with open(path, "rb") as f:
+                _source_digests[path] = hashlib.sha256(f.read()).hexdigest()
+        h.update(f"{module.__name__}={_source_digests[path]}\n".encode())
+    return h.hexdigest()
+
+
+def step_key(step: str, code: str, config: Dict[str, object], inputs: Dict[str, str]) -> str:
+    payload = json.dumps({"step": step, "code": code, "config": config, "inputs": inputs},
+                         sort_keys=True, default=repr)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ArtifactCache:
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _dir(self, key: str) -> Path:
+        return self.root / key[:2] / key
+
+    def _write_meta(self, entry: Path, meta: Dict[str, object]) -> None:
+        tmp = entry / f"meta.json.{uuid.uuid4().hex}"
+        tmp.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+        os.replace(tmp, entry / "meta.json")
+
+    def lookup(self, key: str) -> Optional[Dict[str, object]]:
+        """meta.json des Eintrags (last_used wird aktualisiert) oder None."""
+        entry = self._dir(key)
+        try:
+            meta = json.loads((entry / "meta.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        meta["last_used"] = time.time()
+        try:
+            self._write_meta(entry, meta)
+        except OSError:
+            pass
+        return meta
+
+    def restore(self, key: str, name: str, dest: Path) -> None:
+        """Klont eine Ausgabe ins Arbeitsverzeichnis (kein Hardlink, da die Schritte Dateien ändern)."""
+        fastcopy.clone_file(self._dir(key) / name, dest)
+
+    def store(self, key: str, files: Dict[str, Path], runtime: float, result: str, step: str) -> bool:
+        """Legt die Ausgaben ab; False, wenn der Eintrag schon existiert (z.B. parallele Zelle)."""
+        entry = self._dir(key)
+        if entry.exists():
+            return False
+        tmp = self.root / f".tmp-{key}-{uuid.uuid4().hex}"
+        tmp.mkdir(parents=True)
+        try:
+            sizes = {}
+            for name, src in files.items():
+                fastcopy.clone_file(src, tmp / name)
+                sizes[name] = os.path.getsize(tmp / name)
+            now = time.time()
+            self._write_meta(tmp, {"step": step, "runtime": runtime, "result": result, "files": sizes,
+                                   "size": sum(sizes.values()), "created": now, "last_used": now})
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            os.rename(tmp, entry)
+            return True
+        except OSError:
+            return False
+        finally:
+            if tmp.exists():
+                shutil.rmtree(tmp, ignore_errors=True)
+
+    def entries(self) -> List[Dict[str, object]]:
+        out = []
+        for meta_file in self.root.glob("*/*/meta.json"):
+            try:
+                meta = json.loads(meta_file.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            meta["key"] = meta_file.parent.name
+            out.append(meta)
+        return out
+
+    def evict(self, protect: Iterable[str] = ()) -> int:
+        """Entfernt die am längsten ungenutzten Einträge bis max_bytes eingehalten ist; Rückgabe: Anzahl."""
+        protect = set(protect)
+        entries = sorted(self.entries(), key=lambda m: m.get("last_used", 0))
+        total = sum(m.get("size", 0) for m in entries)
+        removed = 0
+        for meta in entries:
+            if total <= self.max_bytes:
+                break
+            if meta["key"] in protect:
+                continue
+            shutil.rmtree(self._dir(meta["key"]), ignore_errors=True)
+            total -= meta.get("size", 0)
+            removed += 1
+        return removed
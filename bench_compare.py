@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark comparison: baseline vs. candidate result set (bench_results.csv of two code revisions).
+
+Examples:
+  python bench_compare.py base/bench_results.csv cand/bench_results.csv
+  python bench_compare.py base.csv cand.csv --threshold 0.10 --drop-outliers --csv compare.csv
+  python bench_compare.py single_runs.csv trials.csv --cache warm
+
+- Cells are matched by (patients, tgds) and, for trial runs, by cache mode (cold/warm);
+  --cache MODE keeps only that mode and treats rows without cache mode (TRIALS = 1) as MODE.
+- Per cell and step: ratio of medians candidate / baseline with a bootstrap interval (descriptive)
+  and a two-sided Mann-Whitney rank test. The p-values of all cell × step tests are corrected with
+  Holm-Bonferroni at --alpha. A change is significant when its test is rejected; it is reported as
+  a regression or improvement when it is also larger than --threshold. With fewer than
+  --min-trials runs on either side there is no test, only a tentative verdict (slower? / faster?).
+- Per step: scaling exponents b_p, b_t of t ≈ c · patients^b_p · tgds^b_t (log-log least squares
+  over the common cells) for both sides; a change above --exp-threshold is flagged (e.g. a step
+  that goes from linear, b_p ≈ 1, to quadratic, b_p ≈ 2). It is confirmed when the bootstrap
+  interval of the difference (Bonferroni over all exponents) excludes 0 and every cell has at
+  least --min-trials runs per side, otherwise it is tentative (changed?).
+Exit code 1 if a significant regression or a confirmed exponent increase was found, otherwise 0.
+"""
+
+import argparse
+import csv
+import random
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import bench_stats
+from check_same_tbl import make_styles, tabline
+
+STEP_NAMES = ["generate_tgds", "extract_to_fo", "core_chase", "build_graphs", "paths_union",
+              "transfer_delete", "total_runtime"]
+FACTORS = ("patients", "tgds")
+
+Cell = Tuple[int, int, str]
+
+
+# ---------- loading ----------
+
+def load_results(path: str, drop_outliers: bool = False,
+                 cache: Optional[str] = None) -> Dict[Cell, Dict[str, List[float]]]:
+    """
+    bench_results.csv → {(patients, tgds, cache): {step: [Laufzeiten]}}.
+    Leere Werte (fehlgeschlagene Schritte) fehlen; mit drop_outliers auch die als Ausreißer
+    markierten Schritte eines Versuchs (Spalte 'outlier'). Mit cache nur Zeilen dieses Modus
+    bzw. ohne Modus, zusammengefasst unter "".
+    Schritte aus den Spalten 'cached' und 'resumed' fehlen immer: ihre Zeit stammt aus einem früheren
+    Lauf und ist keine Messung; total_runtime fehlt dann ebenfalls ("run": alle Zeiten der Zeile).
+    """
+    cells: Dict[Cell, Dict[str, List[float]]] = {}
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            mode = (row.get("cache") or "").split(":")[0]
+            if cache:
+                if mode and mode != cache:
+                    continue
+                mode = ""
+            try:
+                key = (int(row["patients"]), int(row["tgds"]), mode)
+            except (KeyError, ValueError):
+                continue
+            flagged = set((row.get("outlier") or "").split(";")) if drop_outliers else set()
+            replayed = {step for col in ("cached", "resumed") for step in (row.get(col) or "").split(";") if step}
+            if replayed:
+                flagged |= set(STEP_NAMES) if "run" in replayed else replayed | {"total_runtime"}
+            steps = cells.setdefault(key, {})
+            for step in STEP_NAMES:
+                value = row.get(step)
+                if value in (None, "") or step in flagged:
+                    continue
+                steps.setdefault(step, []).append(float(value))
+    return cells
+
+
+# ---------- comparison ----------
+
+def compare_cells(base: Dict[Cell, Dict[str, List[float]]], cand: Dict[Cell, Dict[str, List[float]]],
+                  threshold: float, alpha: float, boot: int, rng: random.Random,
+                  min_trials: int = 5) -> List[Dict[str, object]]:
+    out = []
+    for cell in sorted(set(base) & set(cand)):
+        for step in STEP_NAMES:
+            b, c = base[cell].get(step), cand[cell].get(step)
+            if not b or not c or bench_stats.median(b) <= 0:
+                continue
+            ratio, lo, hi = bench_stats.bootstrap_ratio_ci(b, c, boot, alpha, rng)
+            tested = min(len(b), len(c)) >= min_trials
+            out.append({"patients": cell[0], "tgds": cell[1], "cache": cell[2], "step": step,
+                        "n_base": len(b), "n_cand": len(c),
+                        "base_median": bench_stats.median(b), "cand_median": bench_stats.median(c),
+                        "ratio": ratio, "ci_low": lo, "ci_high": hi,
+                        "p_value": bench_stats.mann_whitney_p(b, c) if tested else None})
+    # Holm über alle getesteten Zellen × Schritte (sonst ~5 % Fehlalarme pro Test)
+    for r, rejected in zip(out, bench_stats.holm([r["p_value"] for r in out], alpha)):
+        r["significant"] = rejected
+        if r["ratio"] > 1 + threshold:
+            r["verdict"] = "regression" if rejected else "slower?"
+        elif r["ratio"] < 1 - threshold:
+            r["verdict"] = "improvement" if rejected else "faster?"
+        else:
+            r["verdict"] = "same"
+    return out
+
+
+def _varying(cells: List[Cell]) -> List[int]:
+    """Indizes der Faktoren (patients, tgds), die über die Zellen variieren."""
+    return [i for i in range(len(FACTORS)) if len({cell[i] for cell in cells}) > 1]
+
+
+def _fit(samples: Dict[Cell, List[float]], factors: List[int], resample: Optional[random.Random] = None):
+    points = []
+    for cell, values in samples.items():
+        if resample is not None:
+            values = resample.choices(values, k=len(values))
+        points.append(([cell[i] for i in factors], bench_stats.median(values)))
+    fit = bench_stats.power_law_fit(points)
+    return fit["exponents"] if fit else None, fit
+
+
+def compare_scaling(base: Dict[Cell, Dict[str, List[float]]], cand: Dict[Cell, Dict[str, List[float]]],
+                    exp_threshold: float, alpha: float, boot: int, rng: random.Random,
+                    min_trials: int = 5) -> List[Dict[str, object]]:
+    """
+    Exponenten pro Schritt und Cache-Modus über die gemeinsamen Zellen. Das Intervall für die
+    Differenz entsteht durch Neuziehen der Versuche pro Zelle (nur bei Wiederholungen); das Niveau
+    wird nach Bonferroni auf alle Exponenten aufgeteilt.
+    """
+    out = []
+    for mode in sorted({cell[2] for cell in base} & {cell[2] for cell in cand}):
+        cells = [c for c in sorted(set(base) & set(cand)) if c[2] == mode]
+        factors = _varying(cells)
+        if not factors:
+            continue
+        for step in STEP_NAMES:
+            b = {c: base[c][step] for c in cells if base[c].get(step)}
+            k = {c: cand[c][step] for c in cells if cand[c].get(step)}
+            common = set(b) & set(k)
+            b = {c: v for c, v in b.items() if c in common}
+            k = {c: v for c, v in k.items() if c in common}
+            exp_b, fit_b = _fit(b, factors)
+            exp_c, fit_c = _fit(k, factors)
+            if exp_b is None or exp_c is None:
+                continue
+            deltas: List[List[float]] = [[] for _ in factors]
+            if any(len(v) > 1 for v in list(b.values()) + list(k.values())):
+                for _ in range(boot):
+                    eb, _ = _fit(b, factors, rng)
+                    ec, _ = _fit(k, factors, rng)
+                    if eb is not None and ec is not None:
+                        for j in range(len(factors)):
+                            deltas[j].append(ec[j] - eb[j])
+            tested = min(len(v) for v in list(b.values()) + list(k.values())) >= min_trials
+            for j, i in enumerate(factors):
+                out.append({"cache": mode, "step": step, "factor": FACTORS[i], "cells": len(common),
+                            "base_exp": exp_b[j], "cand_exp": exp_c[j], "delta": exp_c[j] - exp_b[j],
+                            "ci_low": None, "ci_high": None,
+                            "base_r2": fit_b["r2"], "cand_r2": fit_c["r2"],
+                            "_deltas": sorted(deltas[j]) if tested else []})
+    level = alpha / max(len(out), 1)
+    for r in out:
+        ds = r.pop("_deltas")
+        if ds:
+            r["ci_low"], r["ci_high"] = bench_stats.quantile(ds, level / 2), bench_stats.quantile(ds, 1 - level / 2)
+        large = abs(r["delta"]) > exp_threshold
+        confirmed = ds and (r["ci_low"] > 0 or r["ci_high"] < 0)
+        r["changed"] = bool(large and confirmed)
+        r["tentative"] = bool(large and not confirmed)
+    return out
+
+
+# ---------- output ----------
+
+def _ci(lo: Optional[float], hi: Optional[float], fmt: str = "{:.2f}") -> str:
+    return "n/a" if lo is None else f"[{fmt.format(lo)}, {fmt.format(hi)}]"
+
+
+def print_cells(rows: List[Dict[str, object]], S, show_all: bool) -> None:
+    print(S.b("Per cell and step (candidate / baseline, median)"))
+    print(S.SEP)
+    print(tabline([("cell", 22), ("step", 16), ("base s", 9), ("cand s", 9), ("ratio", 7), ("CI", 16),
+                   ("p", 7), ("", 12)]))
+    print(S.SEP)
+    for r in rows:
+        if not show_all and r["verdict"] == "same":
+            continue
+        cell = f"p={r['patients']} t={r['tgds']}" + (f" {r['cache']}" if r["cache"] else "")
+        verdict = r["verdict"]
+        if verdict == "regression":
+            verdict = S.r(S.BAD + verdict)
+        elif verdict == "improvement":
+            verdict = S.g(S.OK + verdict)
+        print(tabline([(cell, 22), (r["step"], 16), (f"{r['base_median']:.3f}", 9),
+                       (f"{r['cand_median']:.3f}", 9), (f"x{r['ratio']:.2f}", 7),
+                       (_ci(r["ci_low"], r["ci_high"]), 16),
+                       ("n/a" if r["p_value"] is None else f"{r['p_value']:.4f}", 7), (verdict, 12)]))
+    print(S.SEP)
+
+
+def print_scaling(rows: List[Dict[str, object]], S) -> None:
+    print(S.b("Scaling exponents  t ≈ c · patients^b_p · tgds^b_t"))
+    print(S.SEP)
+    print(tabline([("step", 16), ("factor", 9), ("cache", 6), ("base", 6), ("cand", 6), ("Δ", 6),
+                   ("CI Δ", 16), ("R² b/c", 11), ("", 10)]))
+    print(S.SEP)
+    for r in rows:
+        flag = ""
+        if r["changed"]:
+            flag = S.r(S.BAD + "changed") if r["delta"] > 0 else S.g(S.OK + "changed")
+        elif r["tentative"]:
+            flag = "changed?"
+        print(tabline([(r["step"], 16), (r["factor"], 9), (r["cache"] or "-", 6),
+                       (f"{r['base_exp']:.2f}", 6), (f"{r['cand_exp']:.2f}", 6), (f"{r['delta']:+.2f}", 6),
+                       (_ci(r["ci_low"], r["ci_high"], "{:+.2f}"), 16),
+                       (f"{r['base_r2']:.2f}/{r['cand_r2']:.2f}", 11), (flag, 10)]))
+    print(S.SEP)
+
+
+def write_csv(path: str, cells: List[Dict[str, object]], scaling: List[Dict[str, object]]) -> None:
+    """Beide Tabellen in eine Datei; Spalte 'kind' = cell | scaling."""
+    rows = [{"kind": "cell", **r} for r in cells] + [{"kind": "scaling", **r} for r in scaling]
+    fields: List[str] = []
+    for r in rows:
+        fields += [k for k in r if k not in fields]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields, restval="")
+        w.writeheader()
+        w.writerows({k: ("" if v is None else v) for k, v in r.items()} for r in rows)
+
+
+# ---------- CLI ----------
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Compare two benchmark result sets (baseline vs. candidate)")
+    ap.add_argument("baseline", help="bench_results.csv of the baseline revision")
+    ap.add_argument("candidate", help="bench_results.csv of the candidate revision")
+    ap.add_argument("--threshold", type=float, default=0.05, help="relative change reported (default 0.05)")
+    ap.add_argument("--exp-threshold", type=float, default=0.25, help="exponent change flagged (default 0.25)")
+    ap.add_argument("--alpha", type=float, default=0.05, help="1 - confidence level (default 0.05)")
+    ap.add_argument("--boot", type=int, default=2000, help="bootstrap resamples (default 2000)")
+    ap.add_argument("--min-trials", type=int, default=5,
+                    help="runs per side needed before a change can be significant (default 5)")
+    ap.add_argument("--seed", type=int, default=0, help="bootstrap seed")
+    ap.add_argument("--cache", choices=("cold", "warm"),
+                    help="compare only this cache mode; rows without cache mode count as it")
+    ap.add_argument("--drop-outliers", action="store_true", help="ignore steps flagged in the 'outlier' column")
+    ap.add_argument("--all", action="store_true", help="also list unchanged cells")
+    ap.add_argument("--csv", help="write both tables to this CSV file")
+    ap.add_argument("--no-color", action="store_true", help="disable ANSI colors")
+    ap.add_argument("--no-emoji", action="store_true", help="disable emojis")
+    args = ap.parse_args()
+    S = make_styles(enable_color=not args.no_color, enable_emoji=not args.no_emoji)
+
+    base = load_results(args.baseline, args.drop_outliers, args.cache)
+    cand = load_results(args.candidate, args.drop_outliers, args.cache)
+    common = set(base) & set(cand)
+    print(S.b(f"{len(common)} common cells") + f" (baseline {len(base)}, candidate {len(cand)})")
+    if not common:
+        if {c[2] for c in base} != {c[2] for c in cand}:
+            print(S.d("Cache modes differ between the result sets; select one with --cache cold|warm."))
+        return 0
+
+    rng = random.Random(args.seed)
+    cells = compare_cells(base, cand, args.threshold, args.alpha, args.boot, rng, args.min_trials)
+    scaling = compare_scaling(base, cand, args.exp_threshold, args.alpha, args.boot, rng, args.min_trials)
+    print_cells(cells, S, args.all)
+    if scaling:
+        print_scaling(scaling, S)
+    else:
+        print(S.d("No scaling fit: needs at least 3 common cells varying in patients or tgds "
+                  "(4 when both vary)."))
+    if args.csv:
+        write_csv(args.csv, cells, scaling)
+
+    if cells and not any(r["p_value"] is not None for r in cells):
+        print(S.d(f"No cell has {args.min_trials} runs per side: all verdicts are tentative (TRIALS >= "
+                  f"{args.min_trials} or --min-trials)."))
+    regressions = [r for r in cells if r["verdict"] == "regression"]
+    exp_up = [r for r in scaling if r["changed"] and r["delta"] > 0]
+    print(f"{len(regressions)} significant regression(s), {len(exp_up)} confirmed exponent increase(s), "
+          f"{sum(r['verdict'] == 'improvement' for r in cells)} significant improvement(s)")
+    return 1 if regressions or exp_up else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
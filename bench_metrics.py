@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Per-step resource metrics for bench_runner (Linux; missing sources are skipped):
+- rss_peak_mb:   peak resident set size of the step (VmHWM, reset per step via /proc/self/clear_refs;
+                 otherwise ru_maxrss, which is the peak since process start); never below the RSS
+                 at step start, since freed memory usually stays with the process
+- py_peak_mb:    tracemalloc peak of the step (only with trace_malloc=True, slows Python code)
+- read_mb / write_mb:            bytes read/written by syscalls (/proc/self/io rchar/wchar)
+- disk_read_mb / disk_write_mb:  bytes that reached the storage layer (read_bytes/write_bytes)
+- cache_hit / cache_miss:        SQLite page-cache hits/misses of all connections used in the step
+SQLite counters are per connection (sqlite3_db_status) and not exposed by the sqlite3 module:
+install_sqlite_tracking() makes sqlite3.connect create TrackedConnection objects, whose counters
+are read through ctypes when they are closed and at the end of every step.
+evict_page_cache() drops files from the OS page cache for cold-cache trials.
+"""
+
+import ctypes
+import os
+import resource
+import sqlite3
+import tracemalloc
+import weakref
+from typing import Dict, Iterable, Optional
+
+MB = 1024 * 1024
+
+# ---------- SQLite page cache ----------
+_DBSTATUS_CACHE_HIT = 7
+_DBSTATUS_CACHE_MISS = 8
+
+_lib = None
+_totals = {'cache_hit': 0, 'cache_miss': 0}
+_live: 'weakref.WeakSet[TrackedConnection]' = weakref.WeakSet()
+
+
+def _load_lib():
+    """sqlite3_db_status aus der vom sqlite3-Modul geladenen Bibliothek, sonst None."""
+    try:
+        import _sqlite3
+        lib = ctypes.CDLL(_sqlite3.__file__)
+        lib.sqlite3_db_status.argtypes = [ctypes.c_void_p, ctypes.c_int, ctypes.POINTER(ctypes.c_int),
+                                          ctypes.POINTER(ctypes.c_int), ctypes.c_int]
+        lib.sqlite3_db_filename.argtypes = [ctypes.c_void_p, ctypes.c_char_p]
+        lib.sqlite3_db_filename.restype = ctypes.c_char_p
+        return lib
+    except (ImportError, OSError, AttributeError):
+        return None
+
+
+def _handle(conn: sqlite3.Connection) -> Optional[int]:
+    """sqlite3*-Zeiger: erstes Feld nach dem Objekt-Header der Connection (CPython)."""
+    return ctypes.c_void_p.from_address(id(conn) + object.__basicsize__).value
+
+
+class TrackedConnection(sqlite3.Connection):
+    """Connection, die ihre Page-Cache-Zähler beim Schließen in die Summen übernimmt."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._seen = {'cache_hit': 0, 'cache_miss': 0}
+        _live.add(self)
+
+    def _collect(self) -> None:
+        handle = _handle(self)
+        if not handle:
+            return
+        cur, hiwtr = ctypes.c_int(), ctypes.c_int()
+        for key, op in (('cache_hit', _DBSTATUS_CACHE_HIT), ('cache_miss', _DBSTATUS_CACHE_MISS)):
+            if _lib.sqlite3_db_status(handle, op, ctypes.byref(cur), ctypes.byref(hiwtr), 0) == 0:
+                _totals[key] += cur.value - self._seen[key]
+                self._seen[key] = cur.value
+
+    def close(self) -> None:
+        self._collect()
+        _live.discard(self)
+        super().close()
+
+
+def _handle_valid() -> bool:
+    """Prüft den Zeiger-Zugriff an einer Datei-DB (Dateiname muss übereinstimmen)."""
+    import tempfile
+    fd, path = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        conn = sqlite3.Connection(path)
+        try:
+            name = _lib.sqlite3_db_filename(_handle(conn), b"main")
+            return name is not None and os.path.realpath(name.decode()) == os.path.realpath(path)
+        finally:
+            conn.close()
+    finally:
+        os.remove(path)
+
+
+def install_sqlite_tracking() -> bool:
+    """
+    Ersetzt sqlite3.connect, sodass Connections ohne eigene factory TrackedConnection sind.
+    Gibt False zurück (und ändert nichts), wenn die Zähler nicht lesbar sind.
+    """
+    global _lib
+    if getattr(sqlite3.connect, '_tracked', False):
+        return True
+    _lib = _load_lib()
+    if _lib is None or not _handle_valid():
+        _lib = None
+        return False
+    original = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        kwargs.setdefault('factory', TrackedConnection)
+        return original(*args, **kwargs)
+
+    connect._tracked = True
+    sqlite3.connect = connect
+    return True
+
+
+def _cache_totals() -> Dict[str, int]:
+    for conn in list(_live):
+        try:
+            conn._collect()
+        except sqlite3.ProgrammingError:
+            _live.discard(conn)
+    return dict(_totals)
+
+
+# ---------- process ----------
+def _read_proc_io() -> Dict[str, int]:
+    try:
+        with open('/proc/self/io', 'r') as f:
+            return {k: int(v) for k, v in (line.split(':') for line in f if ':' in line)}
+    except OSError:
+        return {}
+
+
+def _reset_peak_rss() -> bool:
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_bytes() -> int:
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def file_sizes(paths: Iterable[os.PathLike]) -> int:
+    """Summe der Dateigrößen inkl. -wal/-shm/-journal, fehlende Dateien zählen 0."""
+    total = 0
+    for p in paths:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            try:
+                total += os.path.getsize(f"{p}{suffix}")
+            except OSError:
+                pass
+    return total
+
+
+def evict_page_cache(paths: Iterable[os.PathLike]) -> str:
+    """
+    Entfernt die Dateien aus dem OS-Page-Cache (für Kaltstart-Messungen). Rückgabe der Methode:
+    'drop_caches' (systemweit, nur als root), 'fadvise' (POSIX_FADV_DONTNEED pro Datei nach fsync)
+    oder 'none', wenn beides nicht verfügbar ist.
+    """
+    os.sync()
+    try:
+        with open('/proc/sys/vm/drop_caches', 'w') as f:
+            f.write('3')
+        return 'drop_caches'
+    except OSError:
+        pass
+    if not hasattr(os, 'posix_fadvise'):
+        return 'none'
+    for p in paths:
+        for suffix in ('', '-wal', '-shm', '-journal'):
+            try:
+                fd = os.open(f"{p}{suffix}", os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                os.fsync(fd)
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+            finally:
+                os.close(fd)
+    return 'fadvise'
+
+
+class StepMeter:
+    """
+    meter = StepMeter(); meter.start(); ...; metrics = meter.stop()
+    stop() liefert die Deltas bzw. Spitzenwerte seit start() (Schlüssel siehe Modulkopf).
+    """
+
+    def __init__(self, trace_malloc: bool = False):
+        self.trace_malloc = trace_malloc
+        self.sqlite_tracking = install_sqlite_tracking()
+        self._io: Dict[str, int] = {}
+        self._cache: Dict[str, int] = {}
+
+    def start(self) -> None:
+        if self.trace_malloc:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        _reset_peak_rss()
+        self._io = _read_proc_io()
+        if self.sqlite_tracking:
+            self._cache = _cache_totals()
+
+    def stop(self) -> Dict[str, float]:
+        io = _read_proc_io()
+        metrics: Dict[str, float] = {'rss_peak_mb': _peak_rss_bytes() / MB}
+        if self.trace_malloc:
+            metrics['py_peak_mb'] = tracemalloc.get_traced_memory()[1] / MB
+        for key, name in (('rchar', 'read_mb'), ('wchar', 'write_mb'),
+                          ('read_bytes', 'disk_read_mb'), ('write_bytes', 'disk_write_mb')):
+            if key in io and key in self._io:
+                metrics[name] = (io[key] - self._io[key]) / MB
+        if self.sqlite_tracking:
+            cache = _cache_totals()
+            metrics['cache_hit'] = cache['cache_hit'] - self._cache['cache_hit']
+            metrics['cache_miss'] = cache['cache_miss'] - self._cache['cache_miss']
+        return metrics
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in profiling of bench_runner steps; files are written to <run dir>/profile/:
+- <step>.prof      cProfile data (mode 'cprofile'; pstats, snakeviz)
+- <step>.folded    collapsed stacks of the sampling profiler (mode 'sample'; flamegraph.pl, speedscope)
+- <step>_top.txt   top-N Python hotspots and top-N SQL statements
+- <step>_sql.csv   all traced SQL statements (literals replaced by ?): calls, vm_ops, seconds
+SQL statements are traced on connections opened while a profiled step runs (sqlite3.connect is
+wrapped): set_trace_callback marks the start of a statement, set_progress_handler fires every
+`sql_ops` VM instructions and adds the elapsed time to that connection's current statement.
+Python time between two fetches of the same statement is therefore counted for the statement.
+"""
+
+import cProfile
+import csv
+import io
+import pstats
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional
+
+# ---------- SQL statements ----------
+_literal_re = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_space_re = re.compile(r"\s+")
+
+
+def normalize_sql(sql: str) -> str:
+    """Literale → ?, Leerraum zusammengefasst (der Trace enthält die gebundenen Werte)."""
+    return _space_re.sub(" ", _literal_re.sub("?", sql)).strip()
+
+
+class SqlTracer:
+    """Statistik pro normalisierter Anweisung: [Aufrufe, VM-Operationen, Sekunden]."""
+
+    def __init__(self, ops: int = 1000):
+        self.ops = ops
+        self.stats: Dict[str, List[float]] = {}
+        self._conns: List[sqlite3.Connection] = []
+
+    def attach(self, conn: sqlite3.Connection) -> None:
+        state = {'raw': None, 'entry': None, 'last': 0.0}
+
+        def on_statement(sql: str) -> None:
+            if sql != state['raw']:
+                # executemany meldet jede Zeile einzeln, meist mit gleichem Text
+                state['raw'] = sql
+                state['entry'] = self.stats.setdefault(normalize_sql(sql), [0, 0, 0.0])
+            state['entry'][0] += 1
+            state['last'] = time.perf_counter()
+
+        def on_progress() -> int:
+            now = time.perf_counter()
+            entry = state['entry']
+            if entry is not None:
+                entry[1] += self.ops
+                entry[2] += now - state['last']
+            state['last'] = now
+            return 0
+
+        conn.set_trace_callback(on_statement)
+        conn.set_progress_handler(on_progress, self.ops)
+        self._conns.append(conn)
+
+    def detach(self) -> None:
+        for conn in self._conns:
+            try:
+                conn.set_trace_callback(None)
+                conn.set_progress_handler(None, 0)
+            except sqlite3.ProgrammingError:   # bereits geschlossen
+                pass
+        self._conns = []
+
+    def top(self, n: int) -> List[tuple]:
+        rows = [(sql, int(c), int(o), s) for sql, (c, o, s) in self.stats.items()]
+        rows.sort(key=lambda r: (-r[3], -r[2], -r[1]))
+        return rows[:n] if n else rows
+
+
+_active_tracer: Optional[SqlTracer] = None
+_connect_wrapped = False
+
+
+def _wrap_connect() -> None:
+    """sqlite3.connect einmal pro Prozess umhüllen; neue Connections erhalten den aktiven Tracer."""
+    global _connect_wrapped
+    if _connect_wrapped:
+        return
+    original = sqlite3.connect
+
+    def connect(*args, **kwargs):
+        conn = original(*args, **kwargs)
+        if _active_tracer is not None:
+            _active_tracer.attach(conn)
+        return conn
+
+    # bench_metrics erkennt seine eigene Hülle an _tracked
+    connect._tracked = getattr(original, '_tracked', False)
+    sqlite3.connect = connect
+    _connect_wrapped = True
+
+
+# ---------- sampling profiler ----------
+class StackSampler:
+    """Tastet den Stack des startenden Threads alle `interval` Sekunden ab (collapsed stacks)."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self._target = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._target = threading.get_ident()
+        self._stop.clear()
+        self.stacks = Counter()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{Path(code.co_filename).stem}:{code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def hotspots(self, n: int) -> str:
+        total = sum(self.stacks.values()) or 1
+        own: Counter = Counter()
+        incl: Counter = Counter()
+        for stack, count in self.stacks.items():
+            funcs = stack.split(';')
+            own[funcs[-1]] += count
+            for func in set(funcs):
+                incl[func] += count
+        lines = [f"{total} samples à {self.interval * 1000:.1f} ms", "", "self:"]
+        lines += [f"{c:>9} {100.0 * c / total:6.1f}%  {f}" for f, c in own.most_common(n)]
+        lines += ["", "inclusive:"]
+        lines += [f"{c:>9} {100.0 * c / total:6.1f}%  {f}" for f, c in incl.most_common(n)]
+        return "\n".join(lines)
+
+
+# ---------- step profiler ----------
+class StepProfiler:
+    """
+    prof = StepProfiler(out_dir); prof.start("core_chase"); ...; files = prof.stop()
+    mode: 'cprofile' (deterministisch, alle Aufrufe) oder 'sample' (Stack-Sampling, geringer Overhead).
+    """
+
+    def __init__(self, out_dir: Path, mode: str = 'cprofile', top: int = 25,
+                 sql: bool = True, sql_ops: int = 1000, interval: float = 0.005):
+        if mode not in ('cprofile', 'sample'):
+            raise ValueError(f"unknown profiler mode {mode!r} (cprofile|sample)")
+        self.out_dir = Path(out_dir)
+        self.mode = mode
+        self.top = top
+        self.sql = sql
+        self.sql_ops = sql_ops
+        self.interval = interval
+        self.step: Optional[str] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[StackSampler] = None
+        self._tracer: Optional[SqlTracer] = None
+
+    def start(self, step: str) -> None:
+        global _active_tracer
+        self.step = step
+        if self.sql:
+            _wrap_connect()
+            self._tracer = _active_tracer = SqlTracer(self.sql_ops)
+        if self.mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._sampler = StackSampler(self.interval)
+            self._sampler.start()
+
+    def stop(self) -> List[Path]:
+        """Beendet die Messung und schreibt die Dateien; Rückgabe: geschriebene Pfade."""
+        global _active_tracer
+        if self._profile is not None:
+            self._profile.disable()
+        if self._sampler is not None:
+            self._sampler.stop()
+        if self._tracer is not None:
+            self._tracer.detach()
+            _active_tracer = None
+
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        written: List[Path] = []
+        report = [f"# {self.step} ({self.mode})", ""]
+        if self._profile is not None:
+            prof_file = self.out_dir / f"{self.step}.prof"
+            self._profile.dump_stats(str(prof_file))
+            written.append(prof_file)
+            for sort in ('cumulative', 'tottime'):
+                buf = io.StringIO()
+                pstats.Stats(self._profile, stream=buf).sort_stats(sort).print_stats(self.top)
+                report += [f"## Python, sorted by {sort}", buf.getvalue().strip(), ""]
+        if self._sampler is not None:
+            folded = self.out_dir / f"{self.step}.folded"
+            with folded.open('w', encoding='utf-8') as f:
+                for stack, count in self._sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            written.append(folded)
+            report += ["## Python, sampled", self._sampler.hotspots(self.top), ""]
+        if self._tracer is not None:
+            sql_csv = self.out_dir / f"{self.step}_sql.csv"
+            with sql_csv.open('w', newline='', encoding='utf-8') as f:
+                w = csv.writer(f)
+                w.writerow(['sql', 'calls', 'vm_ops', 'seconds'])
+                w.writerows(self._tracer.top(0))
+            written.append(sql_csv)
+            report.append(f"## SQL, top {self.top} by time (vm_ops in steps of {self.sql_ops})")
+            for sql, calls, ops, seconds in self._tracer.top(self.top):
+                text = sql if len(sql) <= 160 else sql[:157] + '...'
+                report.append(f"{seconds:10.3f}s {calls:>10} calls {ops:>14} ops  {text}")
+        top_file = self.out_dir / f"{self.step}_top.txt"
+        top_file.write_text("\n".join(report) + "\n", encoding='utf-8')
+        written.append(top_file)
+
+        self._profile = self._sampler = self._tracer = None
+        return written
@@ -8,20 +8,31 @@ Benchmark orchestrator for a1..a8:
         ->a7 (minimal union)->a8 (move/delete)
 - Tracks per-step runtimes in bench_results.csv (breites Format, eine Zeile pro Run)
 - After fragmentation: performs union check (fs ∪ fo == fs_copy)
+- Optionally runs the grid cells in parallel processes (PARALLEL_CELLS, PIN_CPUS)
+- Optionally profiles selected steps (PROFILE_STEPS) into runs/pX/tY/profile/
+- Optionally repeats each cell (TRIALS, cold/warm page cache) and writes median/IQR/min
+  per step to bench_summary.csv, flagging outlier trials
+- Optionally reuses step outputs from a content-addressed cache (USE_CACHE, runs/cache/)
+- Optionally resumes an interrupted grid from per-cell checkpoint manifests (RESUME)
+- Working copies are reflink clones where the filesystem supports it (fastcopy), fs_copy is shared
 """
 
 import os
 import csv
+import hashlib
+import json
+import multiprocessing
+import tempfile
 import time
-import shutil
 import traceback
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # ---- your modules ----
 import a1_0_create_fill_db as a1
 import a2_1_sensitive_tgd_information as a2
+import a2_2_prune_rules as a2p
 import a3_0_move_to_fo as a3
 import a4_core_chase as a4
 import a5_graph as a5
@@ -29,16 +40,101 @@ import a6_0_traversal as a6
 import a7_minimal_union as a7
 import a8_fragmentation as a8
 import check_same_tbl as chk   # <-- Union-Check
+import fastcopy
+import bench_cache
+import bench_metrics
+import bench_profile
+import bench_stats
+import pipeline
 import sqlite3
-import random
 
 
 PATIENTS_LIST = [10_000,25_000,50_000,100_000,250_000,500_000,1_000_000]
 TGDS_LIST     = [100, 200, 400]
 MAX_ITER_CHASE = 100
+BASE_SEED = 123   # Basis-DB pro Patientenzahl mit seed = BASE_SEED + patients (reproduzierbar)
+# Ab SHARD_THRESHOLD Patienten wird die Basis-DB in SHARDS Prozessen erzeugt und zusammengeführt.
+# Die Daten hängen nur von SHARDS ab (nicht von der CPU-Anzahl).
+SHARD_THRESHOLD = 2_000_000
+SHARDS = 8
+# Strukturierte Regelmengen (große TGD-Anzahlen, z.B. 10_000..100_000) statt a2.generate_tgds:
+# z.B. {"depth": 4, "fan_in": 2, "body_reuse": 0.5, "treatment_share": 0.5}  (None = generate_tgds)
+# Jeder Head ist eine eigene Konstante (17 821 insgesamt): tgds / fan_in + body_min <= 17 821,
+# für 100_000 Regeln also fan_in >= 6, sonst ValueError
+TGD_STRUCTURE = None
+# True: rules.txt nach der Erzeugung statisch reduzieren (Duplikate, subsumierte und für C.txt
+# irrelevante Regeln); die vollständige Regelmenge bleibt als rules_<t>_all.txt erhalten
+PRUNE_RULES = False
+# True: zielgerichteter Chase, nur Regeln der Rückwärtshülle der C.txt-Wurzeln
+GOAL_DIRECTED_CHASE = False
+# True: zusätzlich nur Patienten mit einem Fakt aus der Hülle (lohnt nur bei kleiner Hülle)
+GOAL_RESTRICT_PATIENTS = False
+# Kosten pro Tabelle für die gewichtete Union (None = ungewichtet, minimiert Knotenanzahl)
+# z.B. {"Treatment": 0.2, "Illness": 5.0}
+TABLE_COSTS = None
+# True: fehlt die Basis-DB, wird die größte vorhandene kleinere Basis kopiert und per
+# a1.append_patients um die Differenz erweitert (statt Neuaufbau; Daten ≠ Neuaufbau)
+GROW_BASES = False
+# True: Basis-DBs im kompakten Schema (Integer-IDs, Wörterbuch pro Relation, Views als Abbildung)
+COMPACT_SCHEMA = False
+# True: a2..a8 in einem Prozess über pipeline.run, Zwischenergebnisse bleiben im Speicher
+IN_PROCESS = False
+# Mit IN_PROCESS trotzdem rules/C/graphs/paths/union als Dateien schreiben (nur zur Kontrolle)
+IN_PROCESS_ARTIFACTS = False
+# Patienten pro Batch: a3..a8 batchweise über pipeline.run_streaming (None = ganze DB pro Schritt);
+# Fortschritt in fo_progress.db, ein Abbruch verliert nur den laufenden Batch
+STREAM_BATCH = None
+# Anzahl gleichzeitig laufender Grid-Zellen (Prozesse); 1 = seriell wie bisher
+PARALLEL_CELLS = 1
+# True: jede Zelle auf einen eigenen CPU-Kern pinnen, höchstens eine Zelle pro Kern
+PIN_CPUS = False
+# True: Messprobe allein vor dem Grid und in jeder Zelle; Spalte 'interference' = Zelle / allein
+INTERFERENCE_CHECK = False
+INTERFERENCE_WARN = 1.25
+# Pro Schritt zusätzlich Spitzen-RSS, I/O (/proc/self/io), SQLite-Cache-Treffer/-Fehlzugriffe und
+# Größe der Ausgabedateien als Spalten <schritt>_<metrik> in bench_results.csv
+MEASURE_RESOURCES = True
+# Zusätzlich tracemalloc-Spitze pro Schritt (<schritt>_py_peak_mb); verlangsamt Python-Code deutlich
+TRACE_MALLOC = False
+# Schritte mit Profiler, z.B. {"core_chase", "build_graphs"}; bei IN_PROCESS/STREAM_BATCH wird der
+# ganze Lauf als "run" profiliert. Dateien in runs/pX/tY/profile/ (None = aus)
+PROFILE_STEPS = None
+# "cprofile" (jeder Aufruf, .prof) oder "sample" (Stack-Sampling, kaum Overhead, .folded)
+PROFILER = "cprofile"
+PROFILE_TOP = 25
+# SQL-Anweisungen der profilierten Schritte erfassen (Aufrufe, VM-Operationen, Zeit)
+PROFILE_SQL = True
+# Wiederholungen pro Zelle; ab 2 je Zeile 'trial'/'cache'/'outlier' und Kennzahlen in SUMMARY_CSV
+TRIALS = 1
+# "cold": Page-Cache vor jedem Versuch leeren (drop_caches als root, sonst fadvise auf die Kopien),
+# "warm": Dateien bleiben im Cache, "both": abwechselnd kalt und warm (getrennt ausgewertet)
+TRIAL_CACHE = "warm"
+# Nicht gewertete Aufwärmläufe vor den Versuchen einer Zelle
+TRIAL_WARMUP = 0
+# Ausreißer: außerhalb q1 - k*IQR .. q3 + k*IQR und mehr als REL vom Median entfernt
+TRIAL_OUTLIER_K = 1.5
+TRIAL_OUTLIER_REL = 0.05
+# True: Ausgaben jedes Schritts unter dem Hash von Eingaben, Code und Konfiguration in runs/cache/
+# ablegen und bei gleichem Hash wiederverwenden (nur Schritt-Modus, nicht IN_PROCESS/STREAM_BATCH);
+# übernommene Schritte stehen in der Spalte 'cached', ihre Laufzeit ist die des ursprünglichen Laufs.
+# Bei TRIALS > 1 oder TRIAL_WARMUP > 0 aus: jeder Versuch muss wirklich laufen
+USE_CACHE = False
+CACHE_MAX_GB = 50
+# Erhöhen, wenn sich die Schrittfunktionen hier in bench_runner ändern (ihr Code fließt nicht in den Hash)
+CACHE_VERSION = 1
+# True: pro Zelle runs/pX/tY/manifest.json mit abgeschlossenen Schritten und sha256 ihrer Ausgaben;
+# ein erneuter Start überspringt geschriebene Zellen und setzt nach dem letzten fertigen Schritt fort
+# (Schritt-Modus mit TRIALS = 1; sonst nur ganze Zellen). Kostet das Hashen der Ausgaben pro Schritt.
+RESUME = False
+# True: nur Trockenlauf (plan()) für extract_to_fo und transfer_delete, nichts wird verschoben
+DRY_RUN = False
+# Union-Check nach jeder Zelle: "sql" (Differenz in SQLite über ATTACH, beschränkter Speicher)
+# oder "python" (alle Zeilen als Counter im Speicher)
+UNION_BACKEND = "sql"
 
 ROOT = Path("runs")
 RESULTS_CSV = Path("bench_results.csv")
+SUMMARY_CSV = Path("bench_summary.csv")
 
 # ---------- helpers ----------
 def ensure_dir(p: Path) -> Path:
@@ -64,53 +160,112 @@ def build_base_db(patients: int) -> Tuple[Path, Path]:
         print(f"🟡 Base DBs exist for patients={patients} → reuse")
         return fs_base, fo_base
 
+    smaller = find_smaller_base(patients) if GROW_BASES else None
+    if smaller is not None:
+        grow_base_db(smaller, patients, fs_base, fo_base)
+        return fs_base, fo_base
+
     print(f"🟢 Create base DBs for patients={patients}")
-    conn = sqlite3.connect(str(fs_base))
-    a1.create_schema(conn)
-    a1.populate(conn, num_patients=patients)
-    conn.close()
+    # Im kompakten Modus zuerst die gleiche Text-DB erzeugen, dann umcodieren
+    text_base = base_dir / "fs_text.db" if COMPACT_SCHEMA else fs_base
+    if patients >= SHARD_THRESHOLD:
+        a1.generate_sharded(str(text_base), patients, shards=SHARDS, seed=BASE_SEED + patients)
+    else:
+        conn = sqlite3.connect(str(text_base))
+        a1.create_schema(conn, unique=False)
+        a1.populate_bulk(conn, num_patients=patients, seed=BASE_SEED + patients)
+        conn.close()
 
     conn = sqlite3.connect(str(fo_base))
-    a1.create_schema(conn)
+    if COMPACT_SCHEMA:
+        a1.convert_to_compact(str(text_base), str(fs_base))
+        text_base.unlink()
+        a1.create_compact_schema(conn)
+    else:
+        a1.create_schema(conn)
     conn.close()
 
     return fs_base, fo_base
 
+def find_smaller_base(patients: int) -> Optional[Tuple[int, Path]]:
+    """Größte vorhandene Basis-DB mit weniger Patienten (aus den Verzeichnissen runs/p<N>)."""
+    best = None
+    for d in ROOT.glob("p*"):
+        try:
+            n = int(d.name[1:])
+        except ValueError:
+            continue
+        if n < patients and (d / "fs_base.db").exists() and (d / "fo_base.db").exists() \
+                and (best is None or n > best[0]):
+            best = (n, d / "fs_base.db")
+    return best
+
+def grow_base_db(smaller: Tuple[int, Path], patients: int, fs_base: Path, fo_base: Path) -> None:
+    n, src = smaller
+    print(f"🟢 Grow base DB p={n} → p={patients}")
+    t = timeit()
+    fastcopy.clone_file(src, fs_base)
+    conn = sqlite3.connect(str(fs_base))
+    try:
+        added = a1.append_patients(conn, patients - n, seed=BASE_SEED + patients)
+    finally:
+        conn.close()
+    print(f"   +{added} patients in {t():.2f}s")
+
+    # FO-Basis: leer, im selben Schema wie die kopierte FS-Basis
+    fastcopy.clone_file(src.with_name("fo_base.db"), fo_base)
+
 # ---------- per-run working set ----------
-def make_working_set(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> Dict[str, Path]:
+def run_paths(patients: int, tgds: int) -> Dict[str, Path]:
     run_dir = ensure_dir(ROOT / f"p{patients}" / f"t{tgds}")
     fs = run_dir / "fs.db"
     fo = run_dir / "fo.db"
     chase = run_dir / "chase.db"
     fs_copy = run_dir / "fs_copy.db"   # Kopie für späteren Union-Check
     rules = run_dir / f"rules_{tgds}.txt"
+    rules_all = run_dir / f"rules_{tgds}_all.txt"   # vollständige Regeln bei PRUNE_RULES
     cfile = run_dir / f"C_{tgds}.txt"
     graphs = run_dir / "graphs.txt"
     paths = run_dir / "paths.txt"
     hit = run_dir / "greedy_union.txt"
 
-    shutil.copyfile(fs_base, fs)   # FS initial
-    shutil.copyfile(fo_base, fo)   # FO leer
-    shutil.copyfile(fs, fs_copy)   # Backup von FS vor Extract (für Union-Check)
-
     return {
         "dir": run_dir, "fs": fs, "fo": fo, "chase": chase, "fs_copy": fs_copy,
-        "rules": rules, "c": cfile, "graphs": graphs, "paths": paths, "hit": hit
+        "rules": rules, "rules_all": rules_all, "c": cfile, "graphs": graphs, "paths": paths, "hit": hit
     }
 
+def make_working_set(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> Dict[str, Path]:
+    paths = run_paths(patients, tgds)
+
+    # Reflink-Klone teilen die Blöcke mit der Basis, bis ein Schritt schreibt (sonst echte Kopie)
+    fastcopy.clone_file(fs_base, paths["fs"])      # FS initial
+    fastcopy.clone_file(fo_base, paths["fo"])      # FO leer
+    # Stand von FS vor Extract (für Union-Check), wird nur gelesen: Reflink oder Hardlink auf die Basis
+    fastcopy.share_file(fs_base, paths["fs_copy"])
+
+    return paths
+
 # ---------- steps ----------
 def step_generate_tgds(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
     seed = 124 + patients + tgds
-    tgds_list, heads = a2.generate_tgds(num_rules=tgds, seed=seed)
-    paths["rules"].write_text("\n".join(tgds_list) + "\n", encoding="utf-8")
-    heads_sorted = sorted(heads)
-    random.seed(seed)
-    k = max(1, tgds // 10)
-    selection = random.sample(heads_sorted, min(k, len(heads_sorted)))
+    stats: Dict[str, int] = {}
+    if TGD_STRUCTURE:
+        heads = a2.generate_structured_tgds(str(paths["rules"]), tgds, seed=seed, stats=stats, **TGD_STRUCTURE)
+    else:
+        tgds_list, heads = a2.generate_tgds(num_rules=tgds, seed=seed, stats=stats)
+        paths["rules"].write_text("\n".join(tgds_list) + "\n", encoding="utf-8")
+    selection = pipeline.select_roots(heads, tgds, seed)
     with paths["c"].open("w", encoding="utf-8") as f:
         for rel, const in selection:
             f.write(f"{rel}['{const}']\n")
-    return f"C={len(selection)}"
+    if PRUNE_RULES:
+        full = paths["rules_all"]
+        paths["rules"].replace(full)
+        prune_stats = a2p.prune_file(str(full), str(paths["c"]), str(paths["rules"]))
+        print(f"   pruned: {a2p.format_report(prune_stats)}")
+    if TGD_STRUCTURE:
+        return f"C={len(selection)};heads={stats['heads']};reused_atoms={stats['reused_atoms']}"
+    return f"C={len(selection)};candidates={stats['candidates']};cycle_rejections={stats['cycle_rejections']}"
 
 def step_extract_to_fo(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
     extractor = a3.SecurityExtractor(str(paths["fs"]), str(paths["fo"]), str(paths["c"]))
@@ -120,7 +275,7 @@ def step_extract_to_fo(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
         extractor.close()
 
     # Jetzt den extrahierten Stand von FS nach Chase kopieren
-    shutil.copyfile(paths["fs"], paths["chase"])
+    fastcopy.clone_file(paths["fs"], paths["chase"])
 
     return f"moved={moved}"
 
@@ -129,10 +284,18 @@ def step_core_chase(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
     rules = a4.load_lines(str(paths["rules"]))
     conn = sqlite3.connect(str(paths["chase"]))
     try:
-        sim = a4.TGDDslSimulator(conn, rules)
+        if GOAL_DIRECTED_CHASE:
+            roots = a2p.load_roots(str(paths["c"]))
+            sim = a4.TGDDslSimulator(conn, rules, roots=roots, restrict_patients=GOAL_RESTRICT_PATIENTS)
+        else:
+            sim = a4.TGDDslSimulator(conn, rules)
         sim.chase(max_iter=MAX_ITER_CHASE)
     finally:
         conn.close()
+    if GOAL_DIRECTED_CHASE:
+        st = sim.goal_stats
+        return (f"chase_completed;rules={st['rules_used']}/{st['rules_total']};"
+                f"candidates={st.get('candidate_patients', 0)}")
     return "chase_completed"
 
 def step_build_graphs(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
@@ -149,80 +312,743 @@ def step_build_graphs(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
 def step_paths_and_union(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
     graphs = a6.GraphTraversal.load_graphs(str(paths["graphs"]))
     C, I = a6.GraphTraversal.load_C_I(str(paths["chase"]), str(paths["fs"]))
-    grouped_paths: List[List[List[str]]] = []
-    for g in graphs:
-        grouped_paths.append(a6.GraphTraversal.traverse_graph(g, C, I))
-    paths["paths"].write_text(repr(grouped_paths), encoding="utf-8")
-    greedy = a7.PathCombinator.generate_greedy_union(grouped_paths)
-    paths["hit"].write_text(repr(greedy), encoding="utf-8")
-    return f"groups={len(grouped_paths)};HS={len(greedy)}"
+    # Gruppen zeilenweise schreiben und für die Union wieder streamen
+    n_groups = a6.GraphTraversal.save_paths(
+        (a6.GraphTraversal.traverse_graph(g, C, I) for g in graphs), str(paths["paths"])
+    )
+    groups = a7.PathCombinator.iter_paths(str(paths["paths"]))
+    if TABLE_COSTS:
+        greedy, summary = a7.PathCombinator.generate_weighted_greedy_union(groups, a7.CostModel(TABLE_COSTS))
+        a7.PathCombinator.save_union(str(paths["hit"]), greedy, summary)
+        return f"groups={n_groups};HS={len(greedy)};cost={summary['total_cost']:.2f}"
+    greedy = a7.PathCombinator.generate_greedy_union(groups)
+    a7.PathCombinator.save_union(str(paths["hit"]), greedy)
+    return f"groups={n_groups};HS={len(greedy)}"
 
 def step_transfer_delete(patients: int, tgds: int, paths: Dict[str, Path]) -> str:
     mover = a8.TransferAndDelete(
         main_db=str(paths["fs"]),
         fo_db=str(paths["fo"]),
-        hs_file=str(paths["hit"])
+        hs_file=str(paths["hit"]),
+        bulk=True
     )
     deleted = mover.process()   # <-- nutzt jetzt den Rückgabewert
     return f"deleted={deleted}"
+
+# Ausgabedateien pro Schritt (für <schritt>_out_mb und den Cache)
+STEP_OUTPUTS = {
+    "generate_tgds": ["rules", "rules_all", "c"],
+    "extract_to_fo": ["fs", "fo", "chase"],
+    "core_chase": ["chase"],
+    "build_graphs": ["graphs"],
+    "paths_union": ["paths", "hit"],
+    "transfer_delete": ["fs", "fo"],
+}
+
+# ---------- step cache ----------
+# Eingabedateien, Module und Konfiguration pro Schritt (bestimmen den Cache-Schlüssel)
+STEP_INPUTS = {
+    "generate_tgds": [],
+    "extract_to_fo": ["fs", "fo", "c"],
+    "core_chase": ["chase", "rules", "c"],
+    "build_graphs": ["chase", "rules", "c"],
+    "paths_union": ["graphs", "chase", "fs"],
+    "transfer_delete": ["fs", "fo", "hit"],
+}
+STEP_MODULES = {
+    "generate_tgds": [a2, a2p, pipeline],
+    "extract_to_fo": [a3],
+    "core_chase": [a4, a2p],
+    "build_graphs": [a5],
+    "paths_union": [a6, a7],
+    "transfer_delete": [a8],
+}
+
+def step_config(step_name: str, patients: int, tgds: int) -> Dict[str, object]:
+    config: Dict[str, object] = {"version": CACHE_VERSION}
+    if step_name == "generate_tgds":
+        config.update(patients=patients, tgds=tgds, structure=TGD_STRUCTURE, prune=PRUNE_RULES)
+    elif step_name == "core_chase":
+        config.update(goal_directed=GOAL_DIRECTED_CHASE, restrict=GOAL_RESTRICT_PATIENTS, max_iter=MAX_ITER_CHASE)
+    elif step_name == "paths_union":
+        config.update(costs=TABLE_COSTS)
+    return config
+
+def cache_enabled() -> bool:
+    """Artefakt-Cache nur im Schritt-Modus mit einem Lauf pro Zelle (sonst kämen Versuche aus dem Cache)."""
+    return USE_CACHE and not (STREAM_BATCH or IN_PROCESS) and TRIALS <= 1 and TRIAL_WARMUP <= 0
+
+def cache_key(step_name: str, patients: int, tgds: int, versions: Dict[str, Optional[str]]) -> Optional[str]:
+    """Schlüssel eines Schritts; None, wenn eine Eingabe keine bekannte Version hat (Fehler davor)."""
+    inputs = {name: versions.get(name) for name in STEP_INPUTS[step_name]}
+    if any(v is None for v in inputs.values()):
+        return None
+    return bench_cache.step_key(step_name, bench_cache.source_digest(STEP_MODULES[step_name]),
+                                step_config(step_name, patients, tgds), inputs)
+
+def restore_pending(cache: bench_cache.ArtifactCache, pending: Dict[str, Tuple[str, bool]],
+                    paths: Dict[str, Path]) -> None:
+    """Übernommene Ausgaben ins Arbeitsverzeichnis kopieren (erst wenn sie gebraucht werden)."""
+    for name, (key, present) in pending.items():
+        if present:
+            cache.restore(key, name, paths[name])
+        elif paths[name].exists():
+            paths[name].unlink()
+    pending.clear()
+
+def record_checkpoint(manifest: Dict[str, object], paths: Dict[str, Path], step_name: str, runtime: float,
+                      result: str, step_cols: Dict[str, float], key: Optional[str]) -> None:
+    outputs = {n: bench_cache.file_digest(paths[n]) if paths[n].exists() else None
+               for n in STEP_OUTPUTS[step_name]}
+    manifest["steps"].append({"name": step_name, "runtime": runtime, "result": result, "metrics": step_cols,
+                              "cache_key": key, "outputs": outputs, "ts": now_iso()})
+    save_manifest(paths["dir"], manifest)
+
+def step_metrics(prefix: str, metrics: Dict[str, float], outputs: List[Path]) -> Dict[str, float]:
+    """Messwerte eines Schritts als CSV-Spalten <prefix>_<metrik>."""
+    cols = {f"{prefix}_{k}": v for k, v in metrics.items()}
+    cols[f"{prefix}_out_mb"] = bench_metrics.file_sizes(outputs) / bench_metrics.MB
+    return cols
+
+STEP_NAMES = ["generate_tgds", "extract_to_fo", "core_chase", "build_graphs", "paths_union", "transfer_delete"]
+
+def run_in_process(patients: int, tgds: int, paths: Dict[str, Path]) -> Dict[str, Optional[float]]:
+    """a2..a8 über pipeline.run; Schritte nach einem Fehler bleiben None."""
+    timings: Dict[str, Optional[float]] = {name: None for name in STEP_NAMES}
+
+    def on_stage(name: str, runtime: float, result: str) -> None:
+        timings[name] = runtime
+        print(f"✅ {name} p={patients}, t={tgds} → {result} (runtime {runtime:.2f}s, in-process)")
+
+    sinks = None
+    if IN_PROCESS_ARTIFACTS:
+        sinks = {key: str(paths[key]) for key in ("rules", "c", "graphs", "paths", "hit")}
+    try:
+        pipeline.run(str(paths["fs"]), str(paths["fo"]), str(paths["chase"]), tgds, 124 + patients + tgds,
+                     structure=TGD_STRUCTURE, prune=PRUNE_RULES, goal_directed=GOAL_DIRECTED_CHASE,
+                     restrict_patients=GOAL_RESTRICT_PATIENTS,
+                     costs=a7.CostModel(TABLE_COSTS) if TABLE_COSTS else None,
+                     max_iter=MAX_ITER_CHASE, sinks=sinks, on_stage=on_stage)
+    except Exception as e:
+        print(f"❌ ERROR in-process (p={patients}, t={tgds}) → {e}\n{traceback.format_exc()}")
+    return timings
+def stream_progress(paths: Dict[str, Path]) -> Path:
+    return paths["dir"] / "fo_progress.db"
+
+def stream_resumable(paths: Dict[str, Path], fingerprint: str) -> bool:
+    """Gehört fo_progress.db zu dieser Zelle (gleicher Fingerabdruck) und sind die Arbeitsdateien da?"""
+    progress_db = stream_progress(paths)
+    if not all(p.exists() for p in (progress_db, paths["fs"], paths["fo"], paths["fs_copy"])):
+        return False
+    try:
+        conn = sqlite3.connect(f"file:{progress_db}?mode=ro", uri=True)
+        try:
+            row = conn.execute("SELECT value FROM stream_meta WHERE key = 'cell'").fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return False
+    return row is not None and row[0] == fingerprint
+
+def mark_stream(paths: Dict[str, Path], fingerprint: str) -> None:
+    """Fingerabdruck der Zelle in stream_meta (neben dem Regel-/Wurzel-Digest von run_streaming)."""
+    conn = sqlite3.connect(stream_progress(paths))
+    try:
+        conn.execute("CREATE TABLE IF NOT EXISTS stream_meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.execute("INSERT OR REPLACE INTO stream_meta VALUES ('cell', ?)", (fingerprint,))
+        conn.commit()
+    finally:
+        conn.close()
+
+def run_streamed(patients: int, tgds: int, paths: Dict[str, Path],
+                 fingerprint: Optional[str] = None) -> Dict[str, Optional[float]]:
+    """
+    generate_tgds wie gewohnt, danach a3..a8 in Patienten-Batches; Zeiten pro Schritt summiert.
+    Mit fingerprint (RESUME) wird er in fo_progress.db vermerkt; ein Neustart mit gleichem Wert setzt
+    nach dem letzten fertigen Batch fort (run_cell behält dann fs/fo/fo_progress.db).
+    """
+    timings: Dict[str, Optional[float]] = {name: None for name in STEP_NAMES}
+    t = timeit()
+    try:
+        result = step_generate_tgds(patients, tgds, paths)
+        timings["generate_tgds"] = t()
+        print(f"✅ generate_tgds p={patients}, t={tgds} → {result} (runtime {timings['generate_tgds']:.2f}s)")
+        progress_db = stream_progress(paths)
+        if fingerprint:
+            mark_stream(paths, fingerprint)
+
+        def on_batch(batch: int, summary: Dict[str, int]) -> None:
+            print(f"   batch {batch}: " + ";".join(f"{k}={v}" for k, v in summary.items()))
+
+        res = pipeline.run_streaming(
+            str(paths["fs"]), str(paths["fo"]), str(paths["chase"]),
+            a4.load_lines(str(paths["rules"])), a2p.load_roots(str(paths["c"])),
+            batch_size=STREAM_BATCH, goal_directed=GOAL_DIRECTED_CHASE,
+            costs=a7.CostModel(TABLE_COSTS) if TABLE_COSTS else None,
+            max_iter=MAX_ITER_CHASE, progress_db=str(progress_db), on_batch=on_batch)
+        timings.update(res["timings"])
+        a7.PathCombinator.save_union(str(paths["hit"]), list(pipeline.iter_stream_union(str(progress_db))))
+        print(f"✅ streamed p={patients}, t={tgds} → batches={res['batches']};moved={res['moved']};"
+              f"graphs={res['graphs']};HS={res['union_nodes']};deleted={res['deleted']}")
+    except Exception as e:
+        print(f"❌ ERROR streamed (p={patients}, t={tgds}) → {e}\n{traceback.format_exc()}")
+    return timings
+
+# ---------- checkpoints ----------
+MANIFEST = "manifest.json"
+
+def cell_fingerprint(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> str:
+    """Code, Konfiguration und Basis-DBs einer Zelle; ein Manifest gilt nur bei gleichem Wert."""
+    fp = {
+        "steps": {name: [bench_cache.source_digest(STEP_MODULES[name]), step_config(name, patients, tgds)]
+                  for name in STEP_NAMES},
+        "base": [bench_cache.file_digest(fs_base), bench_cache.file_digest(fo_base)],
+        "mode": [IN_PROCESS, STREAM_BATCH, TRIALS, TRIAL_CACHE],
+    }
+    return hashlib.sha256(json.dumps(fp, sort_keys=True, default=repr).encode()).hexdigest()
+
+def load_manifest(run_dir: Path, fingerprint: str) -> Optional[Dict[str, object]]:
+    """Manifest der Zelle oder None (fehlt, unlesbar oder zu anderem Code/Konfiguration/Basis)."""
+    try:
+        manifest = json.loads((run_dir / MANIFEST).read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get("fingerprint") == fingerprint else None
+
+def save_manifest(run_dir: Path, manifest: Dict[str, object]) -> None:
+    tmp = run_dir / (MANIFEST + ".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, run_dir / MANIFEST)
+
+def recover_files(paths: Dict[str, Path], expected: Dict[str, Optional[str]], extra: List[Path]) -> bool:
+    """
+    Stellt den im Manifest erwarteten Stand her. Eine Datei mit falschem Inhalt (z.B. vom
+    abgebrochenen Schritt halb geändert) wird aus einer anderen Datei gleichen Hashs kopiert
+    (etwa chase.db aus fs.db oder fs.db aus der Basis). False, wenn das nicht gelingt.
+    """
+    def digest(p: Path) -> Optional[str]:
+        return bench_cache.file_digest(p) if p.exists() else None
+
+    for name, want in expected.items():
+        target = paths[name]
+        # Journal/WAL des abgebrochenen Schritts verwerfen: Checkpoints beschreiben die Datei allein
+        # (Schritte schließen ihre Verbindungen), sonst spielt SQLite die Reste beim Öffnen ein
+        for suffix in ("-journal", "-wal", "-shm"):
+            side = Path(f"{target}{suffix}")
+            if side.exists():
+                side.unlink()
+        if want is None:
+            if target.exists():
+                target.unlink()
+            continue
+        if digest(target) == want:
+            continue
+        sources = [paths[n] for n in expected if n != name] + extra
+        source = next((p for p in sources if p.exists() and digest(p) == want), None)
+        if source is None:
+            print(f"   ⚠ {target.name}: content differs from checkpoint and cannot be recovered")
+            return False
+        fastcopy.clone_file(source, target)
+        print(f"   ↺ {target.name} recovered from {source.name}")
+    return True
+
+def resume_cell(paths: Dict[str, Path], fingerprint: str, fs_base: Path,
+                fo_base: Path) -> Optional[Dict[str, object]]:
+    """Manifest, wenn die Arbeitsdateien dem Stand nach dem letzten fertigen Schritt entsprechen."""
+    manifest = load_manifest(paths["dir"], fingerprint)
+    if manifest is None:
+        return None
+    expected = dict(manifest["working_set"])
+    for step in manifest["steps"]:
+        expected.update(step["outputs"])
+    if not recover_files(paths, expected, [fs_base, fo_base]):
+        return None
+    return manifest
+
+def cell_written(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> bool:
+    manifest = load_manifest(run_paths(patients, tgds)["dir"],
+                             cell_fingerprint(patients, tgds, fs_base, fo_base))
+    return bool(manifest and manifest.get("written"))
+
+def mark_written(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> None:
+    """Nach dem Schreiben der Ergebniszeile(n): Zelle gilt beim Fortsetzen als erledigt."""
+    run_dir = run_paths(patients, tgds)["dir"]
+    fingerprint = cell_fingerprint(patients, tgds, fs_base, fo_base)
+    manifest = load_manifest(run_dir, fingerprint) or {"fingerprint": fingerprint, "working_set": {}, "steps": []}
+    manifest["written"] = now_iso()
+    save_manifest(run_dir, manifest)
+
+# ---------- dry run ----------
+def print_plan(step_name: str, plan: Dict) -> None:
+    print(f"📋 Plan {step_name}: rows={plan['rows']}, projected {plan['projected_seconds']:.2f}s")
+    for table, entry in sorted(plan["tables"].items()):
+        if "error" in entry:
+            print(f"   {table}: ❌ {entry['error']}")
+            continue
+        print(f"   {table}: rows={entry['rows']}, projected {entry['projected_seconds']:.2f}s")
+        if entry.get("indexes"):
+            print(f"      new indexes: {', '.join(entry['indexes'])}")
+        for name, lines in entry["query_plans"].items():
+            print(f"      {name}: {' | '.join(lines)}")
+
+def plan_cell(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> None:
+    """
+    Plant extract_to_fo und transfer_delete direkt auf den Basis-DBs (alles wird zurückgerollt).
+    SecurityExtractor mit plan_only: kein WAL, kein Checkpoint, die Basis bleibt Byte für Byte gleich
+    (Cache-Schlüssel, RESUME-Fingerabdruck, fs_copy-Hardlinks). Regeln und C.txt des Plans landen
+    in einem temporären Verzeichnis, die Dateien eines früheren Laufs bleiben unberührt.
+    transfer_delete wird nur geplant, wenn aus einem früheren Lauf schon eine Union vorliegt.
+    """
+    paths = run_paths(patients, tgds)
+    with tempfile.TemporaryDirectory(prefix=".plan-", dir=paths["dir"]) as tmp:
+        plan_paths = dict(paths, **{k: Path(tmp) / paths[k].name for k in ("rules", "rules_all", "c")})
+        step_generate_tgds(patients, tgds, plan_paths)
+
+        extractor = a3.SecurityExtractor(str(fs_base), str(fo_base), str(plan_paths["c"]), plan_only=True)
+        try:
+            print_plan("extract_to_fo", extractor.plan())
+        finally:
+            extractor.close()
+
+    if paths["hit"].exists():
+        mover = a8.TransferAndDelete(str(fs_base), str(fo_base), str(paths["hit"]), bulk=True)
+        print_plan("transfer_delete", mover.plan())
+    else:
+        print(f"📋 Plan transfer_delete: no union from an earlier run in {paths['dir']}")
+
+def report_profile(files: List[Path]) -> None:
+    for f in files:
+        print(f"   🔬 {f}")
+
+# ---------- grid ----------
+def run_cell(patients: int, tgds: int, fs_base: Path, fo_base: Path,
+             cache: Optional[str] = None, resume: bool = False) -> Dict[str, object]:
+    """
+    Eine Grid-Zelle: Arbeitskopien, Schritte, Union-Check. Rückgabe: CSV-Zeile.
+    cache="cold" leert vorher den Page-Cache für Basis-DBs und Kopien, "warm" lässt ihn stehen.
+    resume=True (Schritt-Modus): Checkpoints in manifest.json schreiben und, wenn die Arbeitsdateien
+    dazu passen, nach dem letzten fertigen Schritt fortsetzen statt neu zu kopieren. Mit STREAM_BATCH
+    wird stattdessen nach dem letzten fertigen Batch aus fo_progress.db fortgesetzt.
+    """
+    copy_stats = dict(fastcopy.stats)
+    t_setup = timeit()
+    checkpoint = resume and not (STREAM_BATCH or IN_PROCESS)
+    fingerprint = cell_fingerprint(patients, tgds, fs_base, fo_base) if resume else None
+    manifest = None
+    stream_resumed = False
+    if checkpoint:
+        manifest = resume_cell(run_paths(patients, tgds), fingerprint, fs_base, fo_base)
+    elif resume and STREAM_BATCH:
+        stream_resumed = stream_resumable(run_paths(patients, tgds), fingerprint)
+    if manifest is not None:
+        paths = run_paths(patients, tgds)
+        print(f"⏯ resume p={patients}, t={tgds} after {len(manifest['steps'])} checkpointed step(s)")
+    elif stream_resumed:
+        # fs/fo und fo_progress.db passen zueinander: run_streaming setzt nach dem letzten Batch fort
+        paths = run_paths(patients, tgds)
+        print(f"⏯ resume streamed p={patients}, t={tgds} from {stream_progress(paths).name}")
+    else:
+        if STREAM_BATCH:
+            # vor dem Kopieren löschen: ein Abbruch dazwischen darf alte Batches nicht frischem FS zuordnen
+            progress_db = stream_progress(run_paths(patients, tgds))
+            if progress_db.exists():
+                progress_db.unlink()
+        paths = make_working_set(patients, tgds, fs_base, fo_base)
+        if checkpoint:
+            base = {"fs": bench_cache.file_digest(fs_base), "fo": bench_cache.file_digest(fo_base)}
+            manifest = {"fingerprint": fingerprint, "steps": [],
+                        "working_set": {"fs": base["fs"], "fo": base["fo"], "fs_copy": base["fs"]}}
+            save_manifest(paths["dir"], manifest)
+        elif (paths["dir"] / MANIFEST).exists():
+            # Lauf ohne Checkpoints: altes Manifest passt nicht mehr zu den Arbeitsdateien
+            (paths["dir"] / MANIFEST).unlink()
+    done_steps = {step["name"]: step for step in manifest["steps"]} if manifest else {}
+    resumed: List[str] = []
+    setup_runtime = t_setup()
+    evict = None
+    if cache == "cold":
+        evict = bench_metrics.evict_page_cache([fs_base, fo_base, paths["fs"], paths["fo"], paths["fs_copy"]])
+    meter = bench_metrics.StepMeter(TRACE_MALLOC) if MEASURE_RESOURCES else None
+    metrics: Dict[str, float] = {}
+    profiler = None
+    if PROFILE_STEPS:
+        profiler = bench_profile.StepProfiler(paths["dir"] / "profile", PROFILER, PROFILE_TOP, PROFILE_SQL)
+    profiled: List[str] = []
+    artifacts = None
+    if cache_enabled():
+        artifacts = bench_cache.ArtifactCache(ROOT / "cache", int(CACHE_MAX_GB * 1024 ** 3))
+        versions: Dict[str, Optional[str]] = {"fs": "base:" + bench_cache.file_digest(fs_base),
+                                              "fo": "base:" + bench_cache.file_digest(fo_base)}
+        pending: Dict[str, Tuple[str, bool]] = {}
+        used_keys: List[str] = []
+    cached: List[str] = []
+
+    if STREAM_BATCH or IN_PROCESS:
+        # a2..a8 in einem Aufruf: Messwerte für den ganzen Lauf (run_<metrik>)
+        if meter:
+            meter.start()
+        if profiler:
+            profiler.start("run")
+        if STREAM_BATCH:
+            timings = run_streamed(patients, tgds, paths, fingerprint)
+            if stream_resumed:
+                # Zeiten der Batches vor dem Abbruch fehlen in den Summen
+                resumed.append("run")
+        else:
+            timings = run_in_process(patients, tgds, paths)
+        if meter:
+            outputs = [paths[k] for k in ("fs", "fo", "chase", "rules", "c", "graphs", "paths", "hit")]
+            metrics = step_metrics("run", meter.stop(), outputs)
+        if profiler:
+            report_profile(profiler.stop())
+            profiled.append("run")
+        steps = []
+    else:
+        timings = {}
+        steps = [
+            ("generate_tgds", step_generate_tgds),
+            ("extract_to_fo", step_extract_to_fo),
+            ("core_chase", step_core_chase),
+            ("build_graphs", step_build_graphs),
+            ("paths_union", step_paths_and_union),
+            ("transfer_delete", step_transfer_delete),
+        ]
+    for step_name, func in steps:
+        if step_name in done_steps:
+            done = done_steps[step_name]
+            timings[step_name] = done["runtime"]
+            metrics.update(done["metrics"])
+            if artifacts:
+                for name in STEP_OUTPUTS[step_name]:
+                    versions[name] = f"{done['cache_key']}:{name}" if done["cache_key"] else None
+            resumed.append(step_name)
+            print(f"⏭ {step_name} p={patients}, t={tgds} → {done['result']} "
+                  f"(checkpoint, runtime {done['runtime']:.2f}s)")
+            continue
+        key = None
+        if artifacts:
+            key = cache_key(step_name, patients, tgds, versions)
+            entry = artifacts.lookup(key) if key else None
+            if entry:
+                timings[step_name] = entry["runtime"]
+                for name in STEP_OUTPUTS[step_name]:
+                    pending[name] = (key, name in entry["files"])
+                    versions[name] = f"{key}:{name}"
+                used_keys.append(key)
+                cached.append(step_name)
+                print(f"♻️ {step_name} p={patients}, t={tgds} → {entry['result']} "
+                      f"(cached, runtime {entry['runtime']:.2f}s)")
+                if checkpoint:
+                    # Checkpoints hashen die Ausgaben: übernommene Dateien sofort bereitstellen
+                    restore_pending(artifacts, pending, paths)
+                    record_checkpoint(manifest, paths, step_name, entry["runtime"], entry["result"], {}, key)
+                continue
+            restore_pending(artifacts, pending, paths)
+        profile_step = profiler is not None and step_name in PROFILE_STEPS
+        if meter:
+            meter.start()
+        if profile_step:
+            profiler.start(step_name)
+        t = timeit()
+        try:
+            result = func(patients, tgds, paths)
+            runtime = t()
+            timings[step_name] = runtime
+            print(f"✅ {step_name} p={patients}, t={tgds} → {result} (runtime {runtime:.2f}s)")
+        except Exception as e:
+            timings[step_name] = None
+            result = None
+            print(f"❌ ERROR in {step_name} (p={patients}, t={tgds}) → {e}\n{traceback.format_exc()}")
+        step_cols: Dict[str, float] = {}
+        if meter:
+            step_cols = step_metrics(step_name, meter.stop(), [paths[k] for k in STEP_OUTPUTS[step_name]])
+            metrics.update(step_cols)
+        if profile_step:
+            report_profile(profiler.stop())
+            profiled.append(step_name)
+        if artifacts:
+            # nach einem Fehler sind die Ausgaben unbestimmt: folgende Schritte nicht aus dem Cache
+            for name in STEP_OUTPUTS[step_name]:
+                versions[name] = f"{key}:{name}" if key and result is not None else None
+            if key and result is not None:
+                files = {n: paths[n] for n in STEP_OUTPUTS[step_name] if paths[n].exists()}
+                artifacts.store(key, files, runtime, result, step_name)
+                used_keys.append(key)
+        if checkpoint:
+            if result is None:
+                # ab einem fehlgeschlagenen Schritt keine Checkpoints: Fortsetzen beginnt dort
+                checkpoint = False
+            else:
+                record_checkpoint(manifest, paths, step_name, runtime, result, step_cols, key)
+
+        # Pause nach jedem Schritt
+        #input(f"⏸ Schritt '{step_name}' abgeschlossen. Weiter mit [Enter]...")
+
+    if artifacts:
+        restore_pending(artifacts, pending, paths)
+        evicted = artifacts.evict(protect=used_keys)
+        if evicted:
+            print(f"🧹 cache: {evicted} entries evicted (budget {CACHE_MAX_GB} GB)")
+
+    # Gesamtzeit
+    total_runtime = sum(v for v in timings.values() if v is not None)
+    timings["total_runtime"] = total_runtime
+
+    row = {
+        "patients": patients,
+        "tgds": tgds,
+        **timings,
+        **metrics,
+        "ts": now_iso()
+    }
+    if profiled:
+        # Laufzeiten profilierter Schritte enthalten den Profiler-Overhead
+        row["profiled"] = ";".join(profiled)
+    if cache:
+        row["cache"] = cache if evict is None else f"{cache}:{evict}"
+    if cache_enabled():
+        row["cached"] = ";".join(cached)
+    if resumed:
+        # Zeiten dieser Schritte stammen aus dem unterbrochenen Lauf
+        row["resumed"] = ";".join(resumed)
+    # Arbeitskopien (nicht in total_runtime) und in der Zelle tatsächlich kopierte bzw. geteilte Bytes
+    row["setup_runtime"] = setup_runtime
+    row["copied_mb"] = (fastcopy.stats["copied"] - copy_stats["copied"]) / bench_metrics.MB
+    row["shared_mb"] = (fastcopy.stats["reflinked"] + fastcopy.stats["linked"]
+                        - copy_stats["reflinked"] - copy_stats["linked"]) / bench_metrics.MB
+
+    # Union-Check
+    try:
+        styles = chk.make_styles(enable_color=True, enable_emoji=True)
+        print(f"🔎 Union-Check gestartet für p={patients}, t={tgds}")
+        chk.cmd_union(str(paths["fs"]), str(paths["fo"]), str(paths["fs_copy"]),
+                      as_set=False, only_tables=None, sample=3, styles=styles, backend=UNION_BACKEND)
+    except Exception as e:
+        print(f"❌ Union-Check Fehler: {e}")
+    return row
+
+# ---------- trials ----------
+TIMING_COLUMNS = STEP_NAMES + ["total_runtime"]
+
+def trial_modes() -> List[str]:
+    """Cache-Modus pro Versuch; bei "both" abwechselnd, damit Drift beide Modi gleich trifft."""
+    modes = ["cold", "warm"] if TRIAL_CACHE == "both" else [TRIAL_CACHE]
+    return [m for _ in range(TRIALS) for m in modes]
+
+def run_trials(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> List[Dict[str, object]]:
+    """TRIALS Läufe einer Zelle (ggf. nach TRIAL_WARMUP Aufwärmläufen); Zeilen mit Ausreißer-Markierung."""
+    if TRIALS <= 1:
+        return [run_cell(patients, tgds, fs_base, fo_base, resume=RESUME)]
+    for i in range(TRIAL_WARMUP):
+        print(f"🔥 warm-up {i + 1}/{TRIAL_WARMUP} p={patients}, t={tgds}")
+        run_cell(patients, tgds, fs_base, fo_base, cache="warm")
+    rows = []
+    per_mode: Dict[str, int] = {}
+    for mode in trial_modes():
+        per_mode[mode] = per_mode.get(mode, 0) + 1
+        print(f"🔁 trial {per_mode[mode]}/{TRIALS} ({mode}) p={patients}, t={tgds}")
+        row = run_cell(patients, tgds, fs_base, fo_base, cache=mode)
+        row["trial"] = per_mode[mode]
+        rows.append(row)
+    flag_outliers(rows)
+    return rows
+
+def _mode(row: Dict[str, object]) -> str:
+    return str(row["cache"]).split(":")[0]
+
+def flag_outliers(rows: List[Dict[str, object]]) -> None:
+    """Spalte 'outlier': Schritte, deren Zeit im Vergleich zu den Versuchen gleichen Cache-Modus auffällt."""
+    for row in rows:
+        row["outlier"] = ""
+    for mode in sorted({_mode(r) for r in rows}):
+        group = [r for r in rows if _mode(r) == mode]
+        for col in TIMING_COLUMNS:
+            flags = bench_stats.outlier_flags([r.get(col) for r in group], TRIAL_OUTLIER_K, TRIAL_OUTLIER_REL)
+            for r, flag in zip(group, flags):
+                if flag:
+                    r["outlier"] = f"{r['outlier']};{col}" if r["outlier"] else col
+
+def summarize_trials(rows: List[Dict[str, object]]) -> List[Dict[str, object]]:
+    """Eine Zeile pro Cache-Modus: <schritt>_median/_iqr/_min über die Versuche."""
+    out = []
+    for mode in sorted({_mode(r) for r in rows}):
+        group = [r for r in rows if _mode(r) == mode]
+        summary: Dict[str, object] = {"patients": group[0]["patients"], "tgds": group[0]["tgds"],
+                                      "cache": mode, "trials": len(group),
+                                      "outliers": sum(1 for r in group if r["outlier"])}
+        for col in TIMING_COLUMNS:
+            s = bench_stats.summarize([r.get(col) for r in group])
+            for key in ("median", "iqr", "min"):
+                summary[f"{col}_{key}"] = s.get(key, "")
+        summary["ts"] = now_iso()
+        out.append(summary)
+    return out
+
+def write_trials(rows: List[Dict[str, object]]) -> None:
+    for row in rows:
+        write_result(row)
+    if len(rows) > 1:
+        for summary in summarize_trials(rows):
+            write_result(summary, SUMMARY_CSV)
+            print(f"📊 p={summary['patients']}, t={summary['tgds']} ({summary['cache']}): "
+                  f"total median {summary['total_runtime_median']:.2f}s, "
+                  f"IQR {summary['total_runtime_iqr']:.2f}s, min {summary['total_runtime_min']:.2f}s"
+                  + (f", {summary['outliers']} outlier trial(s)" if summary["outliers"] else ""))
+    for row in rows:
+        if row.get("outlier"):
+            print(f"⚠ outlier p={row['patients']}, t={row['tgds']} trial {row['trial']} "
+                  f"({row['cache']}): {row['outlier']}")
+
+def write_result(row: Dict[str, object], path: Optional[Path] = None) -> None:
+    """
+    Hängt eine Zeile an bench_results.csv an. Neue Spalten werden an den vorhandenen Header
+    angefügt (Datei wird dafür über eine temporäre Datei per os.replace neu geschrieben);
+    fehlende Werte bleiben leer. Nur der Hauptprozess schreibt.
+    """
+    path = path or RESULTS_CSV
+    header: List[str] = []
+    if path.exists():
+        with path.open(newline="", encoding="utf-8") as f:
+            header = next(csv.reader(f), [])
+    missing = [k for k in row if k not in header]
+    if header and missing:
+        with path.open(newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        header = header + missing
+        tmp = path.with_name(path.name + ".tmp")
+        with tmp.open("w", newline="", encoding="utf-8") as f:
+            w = csv.DictWriter(f, fieldnames=header, quoting=csv.QUOTE_ALL, restval="")
+            w.writeheader()
+            w.writerows(rows)
+        os.replace(tmp, path)
+    with path.open("a", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=header or list(row), quoting=csv.QUOTE_ALL, restval="")
+        if not header:
+            w.writeheader()
+        w.writerow(row)
+        f.flush()
+        os.fsync(f.fileno())
+
+def probe_seconds(rows: int = 50_000) -> float:
+    """
+    Feste Messprobe (SQLite in-memory: Laden, Index, Join) für den Interferenz-Check.
+    Läuft allein vor dem Grid und in jeder Zelle; das Verhältnis zeigt, wie stark sich
+    gleichzeitige Zellen bremsen (CPU, Caches, Speicherbandbreite).
+    """
+    t = timeit()
+    conn = sqlite3.connect(":memory:")
+    try:
+        conn.execute("CREATE TABLE a (k INTEGER, v TEXT)")
+        conn.executemany("INSERT INTO a VALUES (?, ?)", ((i * 7919 % rows, f"v{i}") for i in range(rows)))
+        conn.execute("CREATE INDEX a_k ON a(k)")
+        conn.execute("SELECT COUNT(*) FROM a x JOIN a y ON y.k = x.k % 1000").fetchone()
+    finally:
+        conn.close()
+    return t()
+
+_cell_cpus = None      # Queue freier Kerne (PIN_CPUS)
+_probe_baseline = None  # Messprobe allein (INTERFERENCE_CHECK)
+
+def _init_cell_worker(cpus, baseline: Optional[float]) -> None:
+    global _cell_cpus, _probe_baseline
+    _cell_cpus = cpus
+    _probe_baseline = baseline
+
+def _cell_task(cell: Tuple[int, int, Path, Path]) -> List[Dict[str, object]]:
+    """Pool-Aufgabe: optional auf einen freien Kern pinnen, Zelle (alle Versuche) ausführen, Kern zurückgeben."""
+    patients, tgds, fs_base, fo_base = cell
+    cpu = None
+    if _cell_cpus is not None:
+        cpu = _cell_cpus.get()
+        os.sched_setaffinity(0, {cpu})
+    try:
+        probes = [probe_seconds()] if _probe_baseline else []
+        rows = run_trials(patients, tgds, fs_base, fo_base)
+        if _probe_baseline:
+            probes.append(probe_seconds())
+        for row in rows:
+            if _probe_baseline:
+                row["interference"] = sum(probes) / len(probes) / _probe_baseline
+            if cpu is not None:
+                row["cpu"] = cpu
+        return rows
+    finally:
+        if cpu is not None:
+            _cell_cpus.put(cpu)
+
+def run_grid(cells: List[Tuple[int, int, Path, Path]]) -> None:
+    """
+    Führt die Grid-Zellen in PARALLEL_CELLS Prozessen aus (jede Zelle in einem frischen Prozess,
+    eigene runs/pX/tY-Verzeichnisse). PIN_CPUS: höchstens ein Prozess pro Kern, jeder auf
+    einen eigenen Kern gepinnt. Die Zeilen schreibt der Hauptprozess in Abschlussreihenfolge.
+    """
+    processes = min(PARALLEL_CELLS, len(cells))
+    cpus = None
+    if PIN_CPUS and hasattr(os, "sched_setaffinity"):
+        available = sorted(os.sched_getaffinity(0))
+        processes = min(processes, len(available))
+        cpus = multiprocessing.Queue()
+        for cpu in available[:processes]:
+            cpus.put(cpu)
+    baseline = None
+    if INTERFERENCE_CHECK:
+        baseline = min(probe_seconds() for _ in range(3))
+        print(f"⏱ Messprobe allein: {baseline:.3f}s")
+    print(f"▶ {len(cells)} Zellen in {processes} Prozessen" + (" (gepinnt)" if cpus is not None else ""))
+    with multiprocessing.Pool(processes, initializer=_init_cell_worker, initargs=(cpus, baseline),
+                              maxtasksperchild=1) as pool:
+        bases = {(p, t): (fs_base, fo_base) for p, t, fs_base, fo_base in cells}
+        for rows in pool.imap_unordered(_cell_task, cells):
+            write_trials(rows)
+            row = rows[-1]
+            if RESUME:
+                mark_written(row["patients"], row["tgds"], *bases[(row["patients"], row["tgds"])])
+            note = ""
+            if "interference" in row:
+                note = f", interference x{row['interference']:.2f}"
+                if row["interference"] > INTERFERENCE_WARN:
+                    note += " ⚠ Zellen bremsen sich gegenseitig, PARALLEL_CELLS senken"
+            print(f"📄 p={row['patients']}, t={row['tgds']} fertig "
+                  f"(total {row['total_runtime']:.2f}s{note})")
+
+def skip_written(patients: int, tgds: int, fs_base: Path, fo_base: Path) -> bool:
+    if cell_written(patients, tgds, fs_base, fo_base):
+        print(f"⏭ p={patients}, t={tgds} already in {RESULTS_CSV} → skip")
+        return True
+    return False
+
 # ---------- main ----------
 def main():
     ensure_dir(ROOT)
+    if USE_CACHE and not cache_enabled():
+        print("ℹ USE_CACHE ignored: the artifact cache only runs in step mode with TRIALS = 1 and no warm-up")
+
+    if PARALLEL_CELLS > 1 and not DRY_RUN:
+        # Basis-DBs zuerst (seriell, ggf. selbst in Shards parallel), dann das Grid
+        cells = []
+        for patients in PATIENTS_LIST:
+            fs_base, fo_base = build_base_db(patients)
+            cells.extend((patients, tgds, fs_base, fo_base) for tgds in TGDS_LIST
+                         if not (RESUME and skip_written(patients, tgds, fs_base, fo_base)))
+        if cells:
+            run_grid(cells)
+        return
 
     for patients in PATIENTS_LIST:
         fs_base, fo_base = build_base_db(patients)
 
         for tgds in TGDS_LIST:
-            paths = make_working_set(patients, tgds, fs_base, fo_base)
-
-            timings = {}
-            for step_name, func in [
-                ("generate_tgds", step_generate_tgds),
-                ("extract_to_fo", step_extract_to_fo),
-                ("core_chase", step_core_chase),
-                ("build_graphs", step_build_graphs),
-                ("paths_union", step_paths_and_union),
-                ("transfer_delete", step_transfer_delete),
-            ]:
-                t = timeit()
-                try:
-                    result = func(patients, tgds, paths)
-                    runtime = t()
-                    timings[step_name] = runtime
-                    print(f"✅ {step_name} p={patients}, t={tgds} → {result} (runtime {runtime:.2f}s)")
-                except Exception as e:
-                    timings[step_name] = None
-                    print(f"❌ ERROR in {step_name} (p={patients}, t={tgds}) → {e}\n{traceback.format_exc()}")
-
-                # Pause nach jedem Schritt
-                #input(f"⏸ Schritt '{step_name}' abgeschlossen. Weiter mit [Enter]...")
-
-            # Gesamtzeit
-            total_runtime = sum(v for v in timings.values() if v is not None)
-            timings["total_runtime"] = total_runtime
-
-            # CSV schreiben
-            row = {
-                "patients": patients,
-                "tgds": tgds,
-                **timings,
-                "ts": now_iso()
-            }
-            write_header = not RESULTS_CSV.exists()
-            with RESULTS_CSV.open("a", newline="", encoding="utf-8") as f:
-                w = csv.DictWriter(f, fieldnames=row.keys(), quoting=csv.QUOTE_ALL)
-                if write_header:
-                    w.writeheader()
-                w.writerow(row)
-
-            # Union-Check
-            try:
-                styles = chk.make_styles(enable_color=True, enable_emoji=True)
-                print(f"🔎 Union-Check gestartet für p={patients}, t={tgds}")
-                chk.cmd_union(str(paths["fs"]), str(paths["fo"]), str(paths["fs_copy"]),
-                              as_set=False, only_tables=None, sample=3, styles=styles)
-            except Exception as e:
-                print(f"❌ Union-Check Fehler: {e}")
+            if DRY_RUN:
+                plan_cell(patients, tgds, fs_base, fo_base)
+                continue
+            if RESUME and skip_written(patients, tgds, fs_base, fo_base):
+                continue
+            write_trials(run_trials(patients, tgds, fs_base, fo_base))
+            if RESUME:
+                mark_written(patients, tgds, fs_base, fo_base)
 
 if __name__ == "__main__":
     main()
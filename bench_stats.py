@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Statistics over repeated benchmark trials (standard library only):
+- summarize(values):            n, median, q1, q3, iqr, min, max
+- outlier_flags(values, k, rel): True for values outside the Tukey fences q1 - k*IQR / q3 + k*IQR,
+                                 widened to at least rel * median around the median (tiny IQRs of
+                                 a few trials would otherwise flag every deviation)
+- bootstrap_ratio_ci(base, cand): median(cand) / median(base) with a percentile bootstrap interval
+- mann_whitney_p(base, cand):    two-sided rank test (exact up to EXACT_LIMIT splits, else normal approximation)
+- holm(p_values, alpha):        Holm-Bonferroni step-down rejection over a family of tests
+- power_law_fit(points):        least squares fit of log t = c + Σ b_i log x_i (scaling exponents b_i)
+Quantiles are linearly interpolated between order statistics (numpy's default).
+"""
+
+import itertools
+import math
+import random
+from typing import Dict, List, Optional, Sequence, Tuple
+
+EXACT_LIMIT = 200_000   # Aufteilungen, bis zu denen der Rangtest exakt rechnet
+
+
+def quantile(sorted_values: Sequence[float], q: float) -> float:
+    """q-Quantil einer sortierten, nicht leeren Folge."""
+    pos = (len(sorted_values) - 1) * q
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(values: Sequence[Optional[float]]) -> Dict[str, float]:
+    """Kennzahlen der vorhandenen Werte (None wird ignoriert); leeres dict ohne Werte."""
+    xs = sorted(v for v in values if v is not None)
+    if not xs:
+        return {}
+    q1, med, q3 = (quantile(xs, q) for q in (0.25, 0.5, 0.75))
+    return {"n": len(xs), "median": med, "q1": q1, "q3": q3, "iqr": q3 - q1, "min": xs[0], "max": xs[-1]}
+
+
+def outlier_flags(values: Sequence[Optional[float]], k: float = 1.5, rel: float = 0.05) -> List[bool]:
+    """Ausreißer-Markierung pro Wert (None → False); unter 3 Werten gibt es keine Ausreißer."""
+    s = summarize(values)
+    if not s or s["n"] < 3:
+        return [False] * len(values)
+    lo = min(s["q1"] - k * s["iqr"], s["median"] * (1 - rel))
+    hi = max(s["q3"] + k * s["iqr"], s["median"] * (1 + rel))
+    return [v is not None and not lo <= v <= hi for v in values]
+
+
+def median(values: Sequence[float]) -> float:
+    return quantile(sorted(values), 0.5)
+
+
+def bootstrap_ratio_ci(base: Sequence[float], cand: Sequence[float], b: int = 2000, alpha: float = 0.05,
+                       rng: Optional[random.Random] = None) -> Tuple[float, Optional[float], Optional[float]]:
+    """
+    (Verhältnis, untere, obere Grenze) für median(cand) / median(base); beide Stichproben werden
+    unabhängig neu gezogen. Mit je nur einem Wert gibt es kein Intervall (None, None).
+    """
+    ratio = median(cand) / median(base)
+    if len(base) < 2 and len(cand) < 2:
+        return ratio, None, None
+    rng = rng or random.Random(0)
+    ratios = sorted(median(rng.choices(cand, k=len(cand))) / median(rng.choices(base, k=len(base)))
+                    for _ in range(b))
+    return ratio, quantile(ratios, alpha / 2), quantile(ratios, 1 - alpha / 2)
+
+
+def _ranks(values: Sequence[float]) -> List[float]:
+    """Ränge 1..n, Bindungen erhalten den mittleren Rang."""
+    order = sorted(range(len(values)), key=lambda i: values[i])
+    ranks = [0.0] * len(values)
+    i = 0
+    while i < len(order):
+        j = i
+        while j + 1 < len(order) and values[order[j + 1]] == values[order[i]]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[order[k]] = (i + j) / 2 + 1
+        i = j + 1
+    return ranks
+
+
+def _tie_counts(ranks: Sequence[float]) -> List[int]:
+    counts: Dict[float, int] = {}
+    for r in ranks:
+        counts[r] = counts.get(r, 0) + 1
+    return [c for c in counts.values() if c > 1]
+
+
+def mann_whitney_p(base: Sequence[float], cand: Sequence[float]) -> float:
+    """
+    Zweiseitiger p-Wert des Mann-Whitney-U-Tests. Exakt über alle Aufteilungen der Ränge, solange es
+    höchstens EXACT_LIMIT gibt, sonst Normalapproximation mit Bindungskorrektur. Der kleinste
+    erreichbare Wert ist 2 / C(n1 + n2, n1), bei 3 gegen 3 Läufe also 0.1.
+    """
+    n1, n2 = len(base), len(cand)
+    ranks = _ranks(list(base) + list(cand))
+    mean = n1 * (n1 + n2 + 1) / 2
+    observed = abs(sum(ranks[:n1]) - mean)
+    if math.factorial(n1 + n2) // (math.factorial(n1) * math.factorial(n2)) <= EXACT_LIMIT:
+        hits = total = 0
+        for idx in itertools.combinations(range(n1 + n2), n1):
+            total += 1
+            if abs(sum(ranks[i] for i in idx) - mean) >= observed - 1e-9:
+                hits += 1
+        return hits / total
+    n = n1 + n2
+    ties = sum(c ** 3 - c for c in _tie_counts(ranks))
+    var = n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1)))
+    if var <= 0:
+        return 1.0
+    z = max(observed - 0.5, 0.0) / math.sqrt(var)
+    return math.erfc(z / math.sqrt(2))
+
+
+def holm(p_values: Sequence[Optional[float]], alpha: float = 0.05) -> List[bool]:
+    """Verworfene Hypothesen nach Holm-Bonferroni; None (kein Test) zählt nicht zur Familie."""
+    tested = sorted((p, i) for i, p in enumerate(p_values) if p is not None)
+    rejected = [False] * len(p_values)
+    for rank, (p, i) in enumerate(tested):
+        if p > alpha / (len(tested) - rank):
+            break
+        rejected[i] = True
+    return rejected
+
+
+def _solve(a: List[List[float]], y: List[float]) -> Optional[List[float]]:
+    """Gauß-Elimination mit Pivotsuche; None bei (nahezu) singulärer Matrix."""
+    n = len(y)
+    m = [row[:] + [y[i]] for i, row in enumerate(a)]
+    for col in range(n):
+        piv = max(range(col, n), key=lambda r: abs(m[r][col]))
+        if abs(m[piv][col]) < 1e-12:
+            return None
+        m[col], m[piv] = m[piv], m[col]
+        for r in range(col + 1, n):
+            f = m[r][col] / m[col][col]
+            for c in range(col, n + 1):
+                m[r][c] -= f * m[col][c]
+    x = [0.0] * n
+    for r in range(n - 1, -1, -1):
+        x[r] = (m[r][n] - sum(m[r][c] * x[c] for c in range(r + 1, n))) / m[r][r]
+    return x
+
+
+def power_law_fit(points: Sequence[Tuple[Sequence[float], float]]) -> Optional[Dict[str, object]]:
+    """
+    points: ((x_1, .., x_k), t) mit x_i, t > 0. Rückgabe {"exponents": [b_1..b_k], "r2": .., "n": ..}
+    oder None, wenn es weniger Punkte als Parameter + 1 gibt oder die Faktoren nicht variieren.
+    """
+    pts = [(xs, t) for xs, t in points if t > 0 and all(x > 0 for x in xs)]
+    if not pts:
+        return None
+    k = len(pts[0][0])
+    if len(pts) < k + 2:
+        return None
+    rows = [[1.0] + [math.log(x) for x in xs] for xs, _ in pts]
+    ys = [math.log(t) for _, t in pts]
+    ata = [[sum(r[i] * r[j] for r in rows) for j in range(k + 1)] for i in range(k + 1)]
+    aty = [sum(r[i] * y for r, y in zip(rows, ys)) for i in range(k + 1)]
+    coef = _solve(ata, aty)
+    if coef is None:
+        return None
+    mean = sum(ys) / len(ys)
+    ss_tot = sum((y - mean) ** 2 for y in ys)
+    ss_res = sum((y - sum(c * v for c, v in zip(coef, r))) ** 2 for r, y in zip(rows, ys))
+    return {"exponents": coef[1:], "r2": 1 - ss_res / ss_tot if ss_tot > 0 else 1.0, "n": len(pts)}
@@ -11,15 +11,23 @@ Examples:
   # 2) Check whether DB1 ∪ DB2 == DB3 (table by table)
   python db_report.py union fs.db fo.db initial.db
   python db_report.py union fs.db fo.db initial.db --set --tables Patient,Illness --sample 10
+  python db_report.py union fs.db fo.db initial.db --backend python
+
+The union check runs in SQL by default (--backend sql): the three DBs are ATTACHed to one
+query_only connection (DB3 with mode=ro), the multiset difference is a GROUP BY over all columns with HAVING on the counts per
+side, the set difference uses EXCEPT. Sorting spills to temporary files, only the diff samples are
+fetched, so memory stays bounded. --backend python reads all rows into Counters (reference).
 
 Options:
   --no-color / --no-emoji  for neutral, plain text output
 """
 
 import argparse
+import os
 import sqlite3
 from collections import Counter
 from typing import List, Tuple
+from urllib.request import pathname2url
 
 # ---------- Pretty helpers ----------
 
@@ -60,13 +68,15 @@ def tabline(cols: List[Tuple[str,int]]):
 
 # ---------- SQLite helpers ----------
 
-def list_tables(conn):
-    cur = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")
+def list_tables(conn, schema="main"):
+    # views included (compact schema from a1), its internal cx_ tables excluded
+    cur = conn.execute(f'SELECT name FROM "{schema}".sqlite_master WHERE type IN (\'table\',\'view\') '
+                       "AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 3) != 'cx_'")
     return [r[0] for r in cur.fetchall()]
 
-def table_columns(conn, table):
+def table_columns(conn, table, schema="main"):
     try:
-        cur = conn.execute(f'PRAGMA table_info("{table}")')
+        cur = conn.execute(f'PRAGMA "{schema}".table_info("{table}")')
         rows = cur.fetchall()
         if not rows: return None
         return [r[1] for r in rows]  # physical order
@@ -89,6 +99,108 @@ def fetch_rows(conn, table, cols):
     except sqlite3.OperationalError:
         return []
 
+def attach_dbs(dbs, snapshot=None):
+    # In-Memory-Hauptdatenbank, DBs als d1, d2, ...; query_only verhindert jeden Schreibzugriff.
+    # Lesend-schreibend geöffnet, damit SQLite beim Schließen das WAL (a3 lässt fs/fo im WAL-Modus)
+    # checkpointet und -wal/-shm entfernt; nur dbs[snapshot] (fs_copy, ggf. Hardlink auf die Basis)
+    # wird mit mode=ro geöffnet.
+    conn = sqlite3.connect(":memory:", uri=True)
+    conn.execute("PRAGMA temp_store = FILE")  # GROUP BY / EXCEPT sortieren in temporären Dateien
+    for i, db in enumerate(dbs, 1):
+        mode = "ro" if i - 1 == snapshot else "rw"
+        uri = "file:" + pathname2url(os.path.abspath(db)) + "?mode=" + mode
+        conn.execute(f"ATTACH DATABASE ? AS d{i}", (uri,))
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+def sidecars(db):
+    return [f"{db}{suffix}" for suffix in ("-wal", "-shm")]
+
+def remove_empty_wal(db, existed):
+    # Eine nur lesende Verbindung kann -wal/-shm einer WAL-DB nicht entfernen; von uns angelegte,
+    # leere Dateien (nichts geschrieben) werden danach gelöscht
+    wal, shm = sidecars(db)
+    if wal in existed or shm in existed:
+        return
+    if os.path.exists(wal) and os.path.getsize(wal) > 0:
+        return
+    for path in (wal, shm):
+        if os.path.exists(path):
+            os.remove(path)
+
+def sql_order(row):
+    # Sortierschlüssel wie ORDER BY in SQLite: NULL < Zahlen < Text < BLOB
+    return tuple((0, 0) if v is None else (1, v) if isinstance(v, (int, float)) else
+                 (2, v) if isinstance(v, str) else (3, bytes(v)) for v in row)
+
+# ---------- Union backends ----------
+# Beide liefern (c1, c2, c3, left_count, right_count, missing, extra); missing/extra sind Listen
+# (row, cnt) mit höchstens max(sample, 1) Einträgen in SQLite-Sortierung – leer genau dann, wenn es
+# keine Differenz gibt.
+
+def union_diff_python(cons, schemas, present, table, cols, as_set, sample):
+    r1, r2, r3 = (fetch_rows(con, table, cols) if p else [] for con, p in zip(cons, present))
+    if as_set:
+        left_counter  = Counter(set(r1) | set(r2))
+        right_counter = Counter(set(r3))
+    else:
+        left_counter  = Counter(r1) + Counter(r2)
+        right_counter = Counter(r3)
+    missing = sorted((left_counter - right_counter).items(), key=lambda e: sql_order(e[0]))[:max(sample, 1)]
+    extra   = sorted((right_counter - left_counter).items(), key=lambda e: sql_order(e[0]))[:max(sample, 1)]
+    return (len(r1), len(r2), len(r3), sum(left_counter.values()), sum(right_counter.values()),
+            missing, extra)
+
+def union_diff_sql(cons, schemas, present, table, cols, as_set, sample):
+    con = cons[0]
+    col_list = ", ".join([f'"{c}"' for c in cols])
+    selects = []
+    for schema, p in zip(schemas, present):
+        sel = f'SELECT {col_list} FROM "{schema}"."{table}"'
+        try:
+            if p: con.execute(sel + " LIMIT 0")
+        except sqlite3.OperationalError:
+            p = False  # wie fetch_rows: nicht lesbare Tabelle zählt als leer
+        selects.append(sel if p else None)
+    counts = [con.execute(f"SELECT COUNT(*) FROM ({sel})").fetchone()[0] if sel else 0 for sel in selects]
+    left = [sel for sel in selects[:2] if sel]
+    right = selects[2]
+    limit = max(sample, 1)
+    order = ", ".join(str(i) for i in range(1, len(cols) + 1))
+
+    if as_set:
+        # UNION entfernt Duplikate erst ab zwei Quellen
+        left_sql = " UNION ".join(left) if len(left) > 1 else f"SELECT DISTINCT * FROM ({left[0]})" if left else None
+        left_count = con.execute(f"SELECT COUNT(*) FROM ({left_sql})").fetchone()[0] if left else 0
+        right_count = con.execute(f"SELECT COUNT(*) FROM (SELECT DISTINCT {col_list} FROM "
+                                  f"({right}))").fetchone()[0] if right else 0
+
+        def diff(a, b):
+            if not a: return []
+            sql = f"SELECT * FROM ({a}) EXCEPT SELECT * FROM ({b})" if b else a
+            return [(tuple(row), 1) for row in con.execute(f"SELECT * FROM ({sql}) ORDER BY {order} LIMIT {limit}")]
+
+        missing = diff(left_sql, right)
+        extra   = diff(right, left_sql)
+        return counts[0], counts[1], counts[2], left_count, right_count, missing, extra
+
+    # Multimenge: Häufigkeit pro Zeile links (DB1 + DB2) und rechts (DB3); GROUP BY behandelt NULL als gleich
+    parts = [f"SELECT {col_list}, 1 AS _l, 0 AS _r FROM ({sel})" for sel in left]
+    if right:
+        parts.append(f"SELECT {col_list}, 0 AS _l, 1 AS _r FROM ({right})")
+    missing, extra = [], []
+    if parts:
+        cur = con.execute(f"SELECT {col_list}, SUM(_l) - SUM(_r) AS _d FROM ({' UNION ALL '.join(parts)}) "
+                          f"GROUP BY {col_list} HAVING _d != 0 ORDER BY {order}")
+        for *row, d in cur:
+            target = missing if d > 0 else extra
+            if len(target) < limit:
+                target.append((tuple(row), abs(d)))
+            if len(missing) >= limit and len(extra) >= limit:
+                break
+        cur.close()
+    return counts[0], counts[1], counts[2], counts[0] + counts[1], counts[2], missing, extra
+
 # ---------- Commands ----------
 
 def cmd_count(db_path, only_tables, styles):
@@ -123,14 +235,20 @@ def cmd_count(db_path, only_tables, styles):
     finally:
         con.close()
 
-def cmd_union(db1, db2, db3, as_set, only_tables, sample, styles):
-    import os
+def cmd_union(db1, db2, db3, as_set, only_tables, sample, styles, backend="sql"):
     S = styles
-    con1 = sqlite3.connect(db1)
-    con2 = sqlite3.connect(db2)
-    con3 = sqlite3.connect(db3)
+    existed = {p for p in sidecars(db3) if os.path.exists(p)}
+    if backend == "sql":
+        con = attach_dbs([db1, db2, db3], snapshot=2)
+        cons, schemas = (con, con, con), ("d1", "d2", "d3")
+        union_diff = union_diff_sql
+    elif backend == "python":
+        cons, schemas = tuple(sqlite3.connect(db) for db in (db1, db2, db3)), ("main", "main", "main")
+        union_diff = union_diff_python
+    else:
+        raise ValueError(f"unknown union backend {backend!r} (sql|python)")
     try:
-        t1, t2, t3 = set(list_tables(con1)), set(list_tables(con2)), set(list_tables(con3))
+        t1, t2, t3 = (set(list_tables(con, schema)) for con, schema in zip(cons, schemas))
         if only_tables:
             want = {t.strip() for t in only_tables.split(",") if t.strip()}
             targets = sorted(want)
@@ -163,44 +281,26 @@ def cmd_union(db1, db2, db3, as_set, only_tables, sample, styles):
         for table in targets:
             # Referenzspalten wählen (bevorzugt DB3)
             cols = None
-            if table in t3: cols = table_columns(con3, table)
-            if cols is None and table in t1: cols = table_columns(con1, table)
-            if cols is None and table in t2: cols = table_columns(con2, table)
+            if table in t3: cols = table_columns(cons[2], table, schemas[2])
+            if cols is None and table in t1: cols = table_columns(cons[0], table, schemas[0])
+            if cols is None and table in t2: cols = table_columns(cons[1], table, schemas[1])
 
             if cols is None:
                 ok_all = False
                 print(tabline([(table, 28), ("-",12), ("-",12), ("-",12), (S.r("NO SCHEMA"),14)]))
                 continue
 
-            # Zeilen lesen
-            r1 = fetch_rows(con1, table, cols) if table in t1 else []
-            r2 = fetch_rows(con2, table, cols) if table in t2 else []
-            r3 = fetch_rows(con3, table, cols) if table in t3 else []
-
-            # Summen für die Anzeige
-            c1, c2, c3 = len(r1), len(r2), len(r3)
+            # Vergleich links vs rechts (Zählungen für die Anzeige, Beispiele der Differenz)
+            present = (table in t1, table in t2, table in t3)
+            c1, c2, c3, left_count, right_count, missing, extra = union_diff(
+                cons, schemas, present, table, cols, as_set, sample)
             total_db1 += c1
             total_db2 += c2
             total_db3 += c3
 
-            # Vergleich links vs rechts
-            if as_set:
-                left_counter  = Counter(set(r1) | set(r2))
-                right_counter = Counter(set(r3))
-                left_count = len(left_counter)
-                right_count = len(right_counter)
-            else:
-                left_counter  = Counter(r1) + Counter(r2)
-                right_counter = Counter(r3)
-                left_count = sum(left_counter.values())
-                right_count = sum(right_counter.values())
-
             total_left  += left_count
             total_right += right_count
 
-            missing = left_counter - right_counter
-            extra   = right_counter - left_counter
-
             if not missing and not extra:
                 res = S.g("MATCH")
                 print(tabline([(table, 28), (str(c1),12), (str(c2),12), (str(c3),12), (res,14)]))
@@ -210,13 +310,11 @@ def cmd_union(db1, db2, db3, as_set, only_tables, sample, styles):
                 print(tabline([(table, 28), (str(c1),12), (str(c2),12), (str(c3),12), (res,14)]))
                 if missing:
                     print("   → missing in DB3 (up to {}):".format(sample))
-                    for i, (row, cnt) in enumerate(missing.items()):
-                        if i >= sample: break
+                    for row, cnt in missing[:sample]:
                         print(f"      {row} ×{cnt}")
                 if extra:
                     print("   → extra in DB3 (up to {}):".format(sample))
-                    for i, (row, cnt) in enumerate(extra.items()):
-                        if i >= sample: break
+                    for row, cnt in extra[:sample]:
                         print(f"      {row} ×{cnt}")
 
         # Footer mit Totals
@@ -236,7 +334,9 @@ def cmd_union(db1, db2, db3, as_set, only_tables, sample, styles):
 
         print()
     finally:
-        con1.close(); con2.close(); con3.close()
+        for con in set(cons): con.close()
+        if backend == "sql":
+            remove_empty_wal(db3, existed)
 
 # ---------- CLI ----------
 
@@ -257,6 +357,8 @@ def main():
     p_union.add_argument("--set", action="store_true", help="use set equality instead of multiset")
     p_union.add_argument("--tables", help="comma-separated subset of tables")
     p_union.add_argument("--sample", type=int, default=5, help="examples shown when differences")
+    p_union.add_argument("--backend", choices=("sql", "python"), default="sql",
+                         help="sql: diff in SQLite over ATTACHed DBs (bounded memory); python: Counters in memory")
 
     args = ap.parse_args()
     styles = make_styles(enable_color=not args.no_color, enable_emoji=not args.no_emoji)
@@ -264,7 +366,7 @@ def main():
     if args.cmd == "count":
         cmd_count(args.db, args.tables, styles)
     elif args.cmd == "union":
-        cmd_union(args.db1, args.db2, args.db3, args.set, args.tables, args.sample, styles)
+        cmd_union(args.db1, args.db2, args.db3, args.set, args.tables, args.sample, styles, args.backend)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+In-process pipeline a2..a8: every stage hands typed in-memory objects to the next one.
+- rules:  List[str]                      (TGD lines, as in rules.txt)
+- roots:  List[Tuple[str, str]]          ((Table, Const), as in C.txt)
+- graphs: List[Dict[str, List[str]]]     (node -> parents, as in graphs.txt)
+- groups: Iterator[List[List[str]]]      (paths per graph, as in paths.txt)
+- union:  List[str]                      ('Table:key:const', as in greedy_union.txt)
+File artifacts are optional sinks (sinks={'rules': ..., 'c': ..., 'graphs': ..., 'paths': ..., 'hit': ...});
+no stage reads them back.
+run_streaming() pushes patient batches through a3..a8 instead, committing per batch.
+"""
+
+import hashlib
+import json
+import os
+import random
+import sqlite3
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import a2_1_sensitive_tgd_information as a2
+import a2_2_prune_rules as a2p
+import a3_0_move_to_fo as a3
+import a4_core_chase as a4
+import a5_graph as a5
+import a6_0_traversal as a6
+import a7_minimal_union as a7
+import a8_fragmentation as a8
+import fastcopy
+
+Atom = Tuple[str, str]
+Graph = Dict[str, List[str]]
+
+
+# ---------- stages ----------
+def select_roots(heads: Iterable[Atom], num_rules: int, seed: int) -> List[Atom]:
+    """Roots for C.txt: a reproducible sample of 10% of the rule count from the heads."""
+    heads_sorted = sorted(heads)
+    random.seed(seed)
+    k = max(1, num_rules // 10)
+    return random.sample(heads_sorted, min(k, len(heads_sorted)))
+
+
+def stage_rules(num_rules: int, seed: int, structure: Optional[Dict[str, Any]] = None,
+                rules_file: Optional[str] = None) -> Tuple[List[str], Set[Atom], Dict[str, int]]:
+    """
+    a2: generates the rules. The structured generator streams to a file (rules_file or a
+    temporary file); its lines are read back once.
+    """
+    stats: Dict[str, int] = {}
+    if structure:
+        target = rules_file
+        if target is None:
+            fd, target = tempfile.mkstemp(suffix='.txt')
+            os.close(fd)
+        try:
+            heads = a2.generate_structured_tgds(target, num_rules, seed=seed, stats=stats, **structure)
+            with open(target, 'r', encoding='utf-8') as f:
+                rules = [line.strip() for line in f if line.strip()]
+        finally:
+            if rules_file is None:
+                os.remove(target)
+        return rules, heads, stats
+    rules, heads = a2.generate_tgds(num_rules=num_rules, seed=seed, stats=stats)
+    return rules, heads, stats
+
+
+def stage_extract(fs_db: str, fo_db: str, roots: List[Atom],
+                  patients: Optional[List[str]] = None) -> int:
+    """a3: moves all rows holding a root constant from FS to FO (only these patients, if given)."""
+    extractor = a3.SecurityExtractor(fs_db, fo_db, roots=roots)
+    try:
+        return extractor.extract(patients=patients)
+    finally:
+        extractor.close()
+
+
+def stage_chase(chase_db: str, rules: List[str], roots: Optional[List[Atom]] = None,
+                restrict_patients: bool = False, max_iter: int = 100) -> Dict[str, int]:
+    """a4: chases chase_db in place; with roots only the goal-relevant rules fire."""
+    conn = sqlite3.connect(chase_db)
+    try:
+        sim = a4.TGDDslSimulator(conn, rules, roots=roots, restrict_patients=restrict_patients)
+        sim.chase(max_iter=max_iter)
+    finally:
+        conn.close()
+    return sim.goal_stats
+
+
+def stage_graphs(chase_db: str, rules: List[str], roots: List[Atom]) -> List[Graph]:
+    """a5: subgraphs of all roots."""
+    extr = a5.RootsTGDSubgraphExtractor(chase_db=chase_db, rules=rules, roots=roots)
+    try:
+        return list(extr.iter_graphs())
+    finally:
+        extr.conn.close()
+
+
+def stage_paths(graphs: Iterable[Graph], chase_db: str, fs_db: str,
+                patients: Optional[List[str]] = None) -> Iterator[List[List[str]]]:
+    """a6: path groups per graph (lazy); C and I restricted to patients, if given."""
+    C, I = a6.GraphTraversal.load_C_I(chase_db, fs_db, patients)
+    for g in graphs:
+        yield a6.GraphTraversal.traverse_graph(g, C, I)
+
+
+def stage_union(groups: Iterable[List[List[str]]],
+                costs: Optional[a7.CostModel] = None) -> Tuple[List[str], Optional[Dict[str, Any]]]:
+    """a7: greedy union, weighted if a cost model is given."""
+    if costs is not None:
+        return a7.PathCombinator.generate_weighted_greedy_union(groups, costs)
+    return a7.PathCombinator.generate_greedy_union(groups), None
+
+
+def stage_transfer(fs_db: str, fo_db: str, union: List[str],
+                   cost_summary: Optional[Dict[str, Any]] = None) -> int:
+    """a8: moves the union nodes from FS to FO."""
+    return a8.TransferAndDelete(fs_db, fo_db, bulk=True).process(union, cost_summary)
+
+
+# ---------- sinks ----------
+def write_rules(rules: List[str], filepath: str) -> None:
+    with open(filepath, 'w', encoding='utf-8', newline='\n') as f:
+        for rule in rules:
+            f.write(rule + '\n')
+
+
+def write_roots(roots: List[Atom], filepath: str) -> None:
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for rel, const in roots:
+            f.write(f"{rel}['{const}']\n")
+
+
+def tee_paths(groups: Iterable[List[List[str]]], filepath: str) -> Iterator[List[List[str]]]:
+    """Passes the groups through and writes each one as a JSON line (paths.txt format)."""
+    with open(filepath, 'w', encoding='utf-8') as f:
+        for group in groups:
+            f.write(json.dumps(group, ensure_ascii=False))
+            f.write('\n')
+            yield group
+
+
+# ---------- end to end ----------
+def run(fs_db: str, fo_db: str, chase_db: str, num_rules: int, seed: int,
+        structure: Optional[Dict[str, Any]] = None, prune: bool = False,
+        goal_directed: bool = False, restrict_patients: bool = False,
+        costs: Optional[a7.CostModel] = None, max_iter: int = 100,
+        sinks: Optional[Dict[str, str]] = None,
+        on_stage: Optional[Callable[[str, float, str], None]] = None) -> Dict[str, Any]:
+    """
+    Runs a2..a8 in one process. chase_db is overwritten with the extracted FS.
+    Returns {'timings': {stage: seconds}, 'results': {stage: summary}, 'union': [...]}.
+    on_stage(name, seconds, summary) is called after every stage.
+    Stage names match the bench_runner steps.
+    """
+    sinks = sinks or {}
+    timings: Dict[str, float] = {}
+    results: Dict[str, str] = {}
+
+    def done(name: str, start: float, summary: str) -> None:
+        timings[name] = time.perf_counter() - start
+        results[name] = summary
+        if on_stage:
+            on_stage(name, timings[name], summary)
+
+    t = time.perf_counter()
+    rules, heads, _stats = stage_rules(num_rules, seed, structure, sinks.get('rules'))
+    roots = select_roots(heads, num_rules, seed)
+    if prune:
+        rules = a2p.prune_rules(rules, roots)
+    if 'rules' in sinks and (prune or not structure):
+        write_rules(rules, sinks['rules'])
+    if 'c' in sinks:
+        write_roots(roots, sinks['c'])
+    done("generate_tgds", t, f"rules={len(rules)};C={len(roots)}")
+
+    t = time.perf_counter()
+    moved = stage_extract(fs_db, fo_db, roots)
+    fastcopy.clone_file(fs_db, chase_db)
+    done("extract_to_fo", t, f"moved={moved}")
+
+    t = time.perf_counter()
+    goal_stats = stage_chase(chase_db, rules, roots if goal_directed else None,
+                             restrict_patients, max_iter)
+    done("core_chase", t, f"rules={goal_stats['rules_used']}")
+
+    t = time.perf_counter()
+    graphs = stage_graphs(chase_db, rules, roots)
+    if 'graphs' in sinks:
+        a5.RootsTGDSubgraphExtractor.write_graphs(graphs, sinks['graphs'], fsync=False)
+    done("build_graphs", t, f"graphs={len(graphs)}")
+
+    t = time.perf_counter()
+    groups = stage_paths(graphs, chase_db, fs_db)
+    if 'paths' in sinks:
+        groups = tee_paths(groups, sinks['paths'])
+    union, summary = stage_union(groups, costs)
+    if 'hit' in sinks:
+        a7.PathCombinator.save_union(sinks['hit'], union, summary)
+    done("paths_union", t, f"groups={len(graphs)};HS={len(union)}")
+
+    t = time.perf_counter()
+    deleted = stage_transfer(fs_db, fo_db, union, summary)
+    done("transfer_delete", t, f"deleted={deleted}")
+
+    return {'timings': timings, 'results': results, 'union': union}
+
+
+# ---------- patient batches ----------
+PATIENT_TABLE = 'Patient'
+
+
+def _node_tables(conn: sqlite3.Connection) -> List[str]:
+    """Tables and views holding nodes (as in a3.list_tables)."""
+    return [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type IN ('table', 'view') "
+        "AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 3) != 'cx_' ORDER BY name")]
+
+
+def _patient_col(conn: sqlite3.Connection, table: str, schema: str = 'main') -> str:
+    """Patient key of a table: its first column (as pk in a4/a5/a6, no table declares a PK)."""
+    return conn.execute(f"PRAGMA {schema}.table_info({table})").fetchone()[1]
+
+
+def next_patients(fs_db: str, after: Optional[str], batch_size: int) -> List[str]:
+    """The next batch_size patient keys after 'after' (keyset over the Patient table)."""
+    conn = sqlite3.connect(fs_db)
+    try:
+        col = _patient_col(conn, PATIENT_TABLE)
+        if after is None:
+            rows = conn.execute(f"SELECT DISTINCT {col} FROM {PATIENT_TABLE} ORDER BY {col} LIMIT ?",
+                                (batch_size,))
+        else:
+            rows = conn.execute(f"SELECT DISTINCT {col} FROM {PATIENT_TABLE} WHERE {col} > ? "
+                                f"ORDER BY {col} LIMIT ?", (after, batch_size))
+        return [r[0] for r in rows]
+    finally:
+        conn.close()
+
+
+def create_batch_chase(fs_db: str, chase_db: str) -> sqlite3.Connection:
+    """
+    Creates chase_db with the schema of fs_db (tables, indexes, views, triggers) but no rows,
+    plus the per-column indexes a3 creates, and returns the connection.
+    """
+    if os.path.exists(chase_db):
+        os.remove(chase_db)
+    src = sqlite3.connect(fs_db)
+    try:
+        ddl = [r[0] for r in src.execute(
+            "SELECT sql FROM sqlite_master WHERE sql IS NOT NULL AND name NOT LIKE 'sqlite_%' ORDER BY rowid")]
+    finally:
+        src.close()
+    conn = sqlite3.connect(chase_db)
+    # Arbeitskopie, wird pro Lauf neu aufgebaut: a4 committet pro Einfügung
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    for sql in ddl:
+        conn.execute(sql)
+    # Indexe wie a3._ensure_index auf FS; a3 läuft hier erst nach dem Anlegen
+    for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                 "AND name NOT LIKE 'sqlite_%' AND substr(name, 1, 3) != 'cx_'").fetchall():
+        for col in [r[1] for r in conn.execute(f"PRAGMA table_info({table})")]:
+            conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{col} ON {table}({col})")
+    conn.commit()
+    conn.execute("CREATE TEMP TABLE _batch_patients (n PRIMARY KEY) WITHOUT ROWID")
+    return conn
+
+
+def load_batch_chase(conn: sqlite3.Connection, fs_db: str, patients: List[str]) -> int:
+    """
+    Replaces the rows of the batch chase DB by the current FS rows of these patients.
+    FS is only attached while loading; attached, every chase query also checks FS.
+    """
+    conn.execute("DELETE FROM temp._batch_patients")
+    conn.executemany("INSERT OR IGNORE INTO temp._batch_patients VALUES (?)", ((p,) for p in patients))
+    conn.commit()
+    conn.execute("ATTACH DATABASE ? AS src", (fs_db,))
+    try:
+        before = conn.total_changes
+        for table in _node_tables(conn):
+            conn.execute(f"DELETE FROM main.{table}")
+            conn.execute(f"INSERT INTO main.{table} SELECT * FROM src.{table} "
+                         f"WHERE {_patient_col(conn, table, 'src')} IN (SELECT n FROM temp._batch_patients)")
+        loaded = conn.total_changes - before
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE src")
+    return loaded
+
+
+def _open_progress(progress_db: str, digest: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(progress_db)
+    conn.execute("CREATE TABLE IF NOT EXISTS stream_meta (key TEXT PRIMARY KEY, value TEXT)")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS stream_batches (
+            batch INTEGER PRIMARY KEY, first_patient TEXT, last_patient TEXT, patients INTEGER,
+            moved INTEGER, graphs INTEGER, union_nodes TEXT, deleted INTEGER,
+            done INTEGER NOT NULL DEFAULT 0
+        )""")
+    row = conn.execute("SELECT value FROM stream_meta WHERE key = 'config'").fetchone()
+    if row is None:
+        conn.execute("INSERT INTO stream_meta VALUES ('config', ?)", (digest,))
+    elif row[0] != digest:
+        conn.close()
+        raise ValueError(f"{progress_db} belongs to other rules/roots; remove it to start over")
+    conn.commit()
+    return conn
+
+
+def run_streaming(fs_db: str, fo_db: str, chase_db: str, rules: List[str], roots: List[Atom],
+                  batch_size: int = 1000, goal_directed: bool = False,
+                  costs: Optional[a7.CostModel] = None, max_iter: int = 100,
+                  progress_db: Optional[str] = None,
+                  on_batch: Optional[Callable[[int, Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+    """
+    Runs a3..a8 patient batch by patient batch. Every rule concerns one patient n and every
+    graph node carries its patient, so the batches are independent and FS/FO end up as in run().
+    Per batch: a3 for the batch patients, chase_db rebuilt with only their rows and chased,
+    a5 graphs, a6 paths (C and I of the batch), a7 union, a8 transfer.
+    The batch union is stored in progress_db before a8 and the batch is marked done after it;
+    a rerun resumes after the last done batch and first repeats a8 for a pending union.
+    A crash thus loses at most the current batch. chase_db only holds the last batch.
+    on_batch(batch, summary) is called after every batch.
+    Returns {'timings': {stage: seconds}, 'batches', 'resumed_batches', 'patients', 'moved',
+    'graphs', 'union_nodes', 'deleted'}.
+    """
+    if progress_db is None:
+        progress_db = os.path.splitext(fo_db)[0] + '_progress.db'
+    digest = hashlib.sha1(('\n'.join(rules) + repr(list(roots))).encode('utf-8')).hexdigest()
+    progress = _open_progress(progress_db, digest)
+    timings: Dict[str, float] = {name: 0.0 for name in
+                                 ("extract_to_fo", "core_chase", "build_graphs", "paths_union", "transfer_delete")}
+    totals: Dict[str, int] = {'batches': 0, 'patients': 0, 'moved': 0, 'graphs': 0,
+                              'union_nodes': 0, 'deleted': 0}
+
+    chase_conn = None
+    extr = None
+    try:
+        # pending batch from an interrupted run: repeat a8 with the stored union
+        for batch_no, union_json in progress.execute(
+                "SELECT batch, union_nodes FROM stream_batches WHERE done = 0 ORDER BY batch").fetchall():
+            t = time.perf_counter()
+            deleted = stage_transfer(fs_db, fo_db, json.loads(union_json))
+            timings["transfer_delete"] += time.perf_counter() - t
+            progress.execute("UPDATE stream_batches SET deleted = ?, done = 1 WHERE batch = ?",
+                             (deleted, batch_no))
+            progress.commit()
+            totals['deleted'] += deleted
+        last, batch_no = progress.execute(
+            "SELECT (SELECT last_patient FROM stream_batches ORDER BY batch DESC LIMIT 1), "
+            "COALESCE(MAX(batch), 0) FROM stream_batches").fetchone()
+        resumed = batch_no
+
+        chase_conn = create_batch_chase(fs_db, chase_db)
+        sim = a4.TGDDslSimulator(chase_conn, rules, roots=roots if goal_directed else None)
+        extr = a5.RootsTGDSubgraphExtractor(chase_db=chase_db, rules=rules, roots=roots)
+
+        while True:
+            patients = next_patients(fs_db, last, batch_size)
+            if not patients:
+                break
+            batch_no += 1
+
+            t = time.perf_counter()
+            moved = stage_extract(fs_db, fo_db, roots, patients)
+            timings["extract_to_fo"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            load_batch_chase(chase_conn, fs_db, patients)
+            sim.chase(max_iter=max_iter)
+            timings["core_chase"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            graphs = list(extr.iter_graphs())
+            timings["build_graphs"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            union, summary = stage_union(stage_paths(graphs, chase_db, fs_db, patients), costs)
+            progress.execute(
+                "INSERT OR REPLACE INTO stream_batches "
+                "(batch, first_patient, last_patient, patients, moved, graphs, union_nodes, done) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (batch_no, patients[0], patients[-1], len(patients), moved, len(graphs), json.dumps(union))
+            )
+            progress.commit()
+            timings["paths_union"] += time.perf_counter() - t
+
+            t = time.perf_counter()
+            deleted = stage_transfer(fs_db, fo_db, union, summary)
+            progress.execute("UPDATE stream_batches SET deleted = ?, done = 1 WHERE batch = ?",
+                             (deleted, batch_no))
+            progress.commit()
+            timings["transfer_delete"] += time.perf_counter() - t
+
+            batch = {'patients': len(patients), 'moved': moved, 'graphs': len(graphs),
+                     'union_nodes': len(union), 'deleted': deleted}
+            for key, value in batch.items():
+                totals[key] += value
+            totals['batches'] += 1
+            last = patients[-1]
+            if on_batch:
+                on_batch(batch_no, batch)
+    finally:
+        if extr is not None:
+            extr.conn.close()
+        if chase_conn is not None:
+            chase_conn.close()
+        progress.close()
+
+    return {'timings': timings, 'resumed_batches': resumed, **totals}
+
+
+def iter_stream_union(progress_db: str) -> Iterator[str]:
+    """The union nodes of all done batches, batch by batch."""
+    conn = sqlite3.connect(progress_db)
+    try:
+        for (union_json,) in conn.execute(
+                "SELECT union_nodes FROM stream_batches WHERE done = 1 ORDER BY batch"):
+            yield from json.loads(union_json)
+    finally:
+        conn.close()